@@ -1,3 +1,8 @@
+import time
+
+# Mốc thời gian bắt đầu để đo thời gian khởi động
+STARTUP_TIME = time.perf_counter()
+
 import sys
 import os
 import subprocess
@@ -10,13 +15,31 @@ from datetime import datetime
 from PySide6.QtWidgets import (
     QApplication, QWidget, QLabel, QVBoxLayout, QPushButton,
     QTextEdit, QCheckBox, QComboBox, QRadioButton,
-    QHBoxLayout, QButtonGroup, QMessageBox, QProgressBar, QListWidget, QListWidgetItem,
-    QFileDialog, QMenuBar, QMenu, QDialog
+    QHBoxLayout, QButtonGroup, QMessageBox, QProgressBar, QListView,
+    QFileDialog, QMenuBar, QMenu, QDialog, QSpinBox, QLineEdit
+)
+from PySide6.QtCore import (
+    Qt, QThread, Signal, QSettings, QTimer, QObject, QAbstractListModel, QModelIndex
 )
-from PySide6.QtCore import Qt, QThread, Signal, QSettings, QTimer
 from PySide6.QtGui import QScreen, QAction, QIcon
 import shutil
-import zipfile
+from collections import deque
+from bandwidth import BandwidthBudget, parse_schedule
+from download_scheduler import DEFAULT_MAX_CONCURRENT
+from download_engine import BatchDownloader, JOURNAL_OPTIONS
+from job_journal import JobJournal
+from format_policy import DEFAULT_FORMAT_POLICY, FORMAT_POLICY_LABELS
+from fragment_tuner import FragmentTuner, MAX_FRAGMENTS
+from settings_store import SettingsStore, SETTINGS_SAVE_DELAY_MS
+from url_store import UrlStore
+from update_core import (
+    CHECK_CACHED, CHECK_NOT_MODIFIED, InstallStopped, UPDATE_CHECK_INTERVAL, UPDATE_CONNECTIONS,
+    UPDATE_ZIP_PATTERN, UpdateCheckError, check_update_info, download_file, install_delta,
+    install_zip, remove_old_files
+)
+from url_utils import unique_urls
+from ytdlp_engine import YtDlpEngine, is_available as ytdlp_module_available
+from tool_discovery import discover_tools
 
 # Thiết lập logging
 
@@ -67,6 +90,8 @@ logger = setup_logging()
 APP_VERSION = "1.1.0"
 # URL để kiểm tra phiên bản mới
 UPDATE_CHECK_URL = "https://raw.githubusercontent.com/huynhtrancntt/auto_update/main/update.json"
+# Ô nhập URL có nhiều dòng hơn thì tự chuyển vào danh sách (UrlStore)
+URL_INPUT_MAX_LINES = 200
 
 
 class DownloadUpdateWorker(QThread):
@@ -75,18 +100,30 @@ class DownloadUpdateWorker(QThread):
     message_signal = Signal(str)
     finished_signal = Signal(bool, str)  # success, message
 
-    def __init__(self, download_url, version):
+    def __init__(self, download_url, version, manifest_url=None, sha256=None):
         super().__init__()
         self.download_url = download_url
         self.version = version
+        # SHA-256 của file zip trong update.json, None = không kiểm tra
+        self.sha256 = sha256
+        # Có manifest thì chỉ tải các file đã thay đổi, lỗi thì tải cả file zip
+        self.manifest_url = manifest_url
         self.stop_flag = False
 
     def run(self):
         """Thực hiện download và extract"""
         try:
+            if self.manifest_url and self._install_delta():
+                self.message_signal.emit("✅ Cập nhật hoàn tất!")
+                self.progress_signal.emit(100)
+                self.finished_signal.emit(
+                    True, f"Cập nhật thành công! Ứng dụng sẽ khởi động lại.")
+                return
+            if self.stop_flag:
+                return
+
             # Tạo tên file
             output_file = f"update_v{self.version}.zip"
-            extract_to = "temp_update"
 
             # Bước 1: Download file
             self.message_signal.emit("⬇️ Đang tải file cập nhật...")
@@ -94,7 +131,7 @@ class DownloadUpdateWorker(QThread):
                 return
 
             if self.stop_flag:
-                self._cleanup(output_file, extract_to)
+                # Giữ lại file zip để giải nén sau khi restart
                 return
 
             # Bước 2: Hoàn thành download (không giải nén ngay)
@@ -107,105 +144,89 @@ class DownloadUpdateWorker(QThread):
         except Exception as e:
             self.finished_signal.emit(False, f"Lỗi cập nhật: {str(e)}")
 
-    def _download_with_progress(self, url, output_file):
-        """Tải file với thanh tiến trình"""
+    def _install_delta(self):
+        """Chỉ tải các file khác với manifest (update_core.install_delta)"""
+        reported = [-1]
+
+        def on_progress(done, total):
+            percent = int(done * 100 / total) if total else 100
+            if percent != reported[0]:
+                reported[0] = percent
+                self.progress_signal.emit(percent)
+                self.message_signal.emit(
+                    f"⬇️ Đang tải: {done / (1024 * 1024):.1f}/{total / (1024 * 1024):.1f} MB "
+                    f"({percent}%)")
+
         try:
-            response = requests.get(url, stream=True, timeout=30)
-            response.raise_for_status()
-
-            total_size = int(response.headers.get('content-length', 0))
-            total_mb = total_size / (1024 * 1024)
-
-            downloaded = 0
-            chunk_size = 1024 * 1024  # 1MB
-
-            with open(output_file, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=chunk_size):
-                    if self.stop_flag:
-                        f.close()
-                        # Không xóa file zip khi dừng, để có thể giải nén sau
-                        # if os.path.exists(output_file):
-                        #     os.remove(output_file)
-                        self.message_signal.emit("⏹ Đã dừng tải")
-                        return False
-
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        downloaded_mb = downloaded / (1024 * 1024)
-
-                        if total_mb > 0:
-                            percent = int((downloaded_mb / total_mb) * 100)
-                            self.progress_signal.emit(percent)
-                            self.message_signal.emit(
-                                f"⬇️ Đang tải: {downloaded_mb:.1f}/{total_mb:.1f} MB ({percent}%)")
-                        else:
-                            self.message_signal.emit(
-                                f"⬇️ Đã tải: {downloaded_mb:.1f} MB")
+            self.message_signal.emit("🔍 Đang so sánh file với bản mới...")
+            result = install_delta(self.manifest_url, os.getcwd(), on_progress=on_progress,
+                                   should_stop=lambda: self.stop_flag)
+            self.message_signal.emit(result.describe())
+            try:
+                with open("version.txt", 'w', encoding='utf-8') as f:
+                    f.write(self.version)
+            except OSError as e:
+                self.message_signal.emit(f"⚠️ Không thể lưu phiên bản: {e}")
+            return True
+        except InstallStopped:
+            self.message_signal.emit("⏹ Đã dừng tải")
+            return False
+        except Exception as e:
+            self.message_signal.emit(f"⚠️ Không cập nhật từng file được ({e}), tải cả gói...")
+            return False
+
+    def _download_with_progress(self, url, output_file):
+        """
+        Tải file với thanh tiến trình (update_core.download_file): tải tiếp
+        file .part của lần trước, kiểm tra SHA-256 trước khi thành file zip
+        """
+        reported = [-1]
 
+        def on_progress(done, total):
+            done_mb = done / (1024 * 1024)
+            if total:
+                percent = int(done * 100 / total)
+                if percent == reported[0]:
+                    return
+                reported[0] = percent
+                self.progress_signal.emit(percent)
+                self.message_signal.emit(
+                    f"⬇️ Đang tải: {done_mb:.1f}/{total / (1024 * 1024):.1f} MB ({percent}%)")
+            elif int(done_mb) != reported[0]:
+                reported[0] = int(done_mb)
+                self.message_signal.emit(f"⬇️ Đã tải: {done_mb:.1f} MB")
+
+        try:
+            download_file(url, output_file, sha256=self.sha256, on_progress=on_progress,
+                          connections=UPDATE_CONNECTIONS,
+                          should_stop=lambda: self.stop_flag)
             self.message_signal.emit("✅ Tải xuống hoàn tất!")
             return True
 
+        except InstallStopped:
+            # Giữ file .part để tải tiếp ở lần sau
+            self.message_signal.emit("⏹ Đã dừng tải")
+            return False
         except Exception as e:
             self.message_signal.emit(f"❌ Lỗi tải xuống: {str(e)}")
-            # Không xóa file zip khi có lỗi, để có thể thử lại
-            # if os.path.exists(output_file):
-            #     os.remove(output_file)
             return False
 
-    def _extract_and_install(self, zip_file, extract_to):
-        """Giải nén và cài đặt cập nhật"""
+    def _extract_and_install(self, zip_file):
+        """Cài các file trong zip vào thư mục ứng dụng (update_core.install_zip)"""
+        reported = [-1]
+
+        def on_progress(done, total):
+            percent = int(done * 100 / total) if total else 100
+            if percent != reported[0]:
+                reported[0] = percent
+                self.progress_signal.emit(percent)
+
         try:
-            # Xóa thư mục tạm cũ nếu có
-            if os.path.exists(extract_to):
-                shutil.rmtree(extract_to)
-            os.makedirs(extract_to)
-
-            # Giải nén
-            with zipfile.ZipFile(zip_file, 'r') as zip_ref:
-                file_list = zip_ref.namelist()
-                total_files = len(file_list)
-
-                for i, file_name in enumerate(file_list):
-                    if self.stop_flag:
-                        # Chỉ xóa thư mục extract, giữ lại file zip
-                        if os.path.exists(extract_to):
-                            shutil.rmtree(extract_to)
-                        return False
-
-                    zip_ref.extract(file_name, extract_to)
-                    # 50% cho extract
-                    percent = int((i + 1) / total_files * 50)
-                    self.progress_signal.emit(percent)
-                    self.message_signal.emit(f"📦 Giải nén: {file_name}")
-
-            # Copy files
-            self.message_signal.emit("📋 Đang cập nhật files...")
+            self.message_signal.emit("📦 Đang cập nhật files...")
+            result = install_zip(zip_file, os.getcwd(), on_progress=on_progress,
+                                 should_stop=lambda: self.stop_flag)
             current_dir = os.getcwd()
 
-            copied_files = []
-            for root, dirs, files in os.walk(extract_to):
-                for file in files:
-                    if self.stop_flag:
-                        # Chỉ xóa thư mục extract, giữ lại file zip
-                        if os.path.exists(extract_to):
-                            shutil.rmtree(extract_to)
-                        return False
-
-                    src_file = os.path.join(root, file)
-                    rel_path = os.path.relpath(src_file, extract_to)
-                    dst_file = os.path.join(current_dir, rel_path)
-
-                    # Tạo thư mục đích nếu chưa có
-                    dst_dir = os.path.dirname(dst_file)
-                    if dst_dir and not os.path.exists(dst_dir):
-                        os.makedirs(dst_dir)
-
-                    # Copy file
-                    shutil.copy2(src_file, dst_file)
-                    copied_files.append(rel_path)
-                    self.message_signal.emit(f"📋 Cập nhật: {rel_path}")
-
             # Lưu phiên bản mới vào file
             try:
                 version_file = os.path.join(current_dir, "version.txt")
@@ -216,37 +237,22 @@ class DownloadUpdateWorker(QThread):
             except Exception as e:
                 self.message_signal.emit(f"⚠️ Không thể lưu phiên bản: {e}")
 
-            # Dọn dẹp
-            self.message_signal.emit("🧹 Đang dọn dẹp...")
-            # Xóa thư mục extract và file zip sau khi đã copy xong
-            if os.path.exists(extract_to):
-                shutil.rmtree(extract_to)
+            # Xóa file zip sau khi đã cài xong
             if os.path.exists(zip_file):
                 os.remove(zip_file)
 
             self.progress_signal.emit(100)
-            self.message_signal.emit(
-                f"✅ Đã cập nhật {len(copied_files)} files")
+            self.message_signal.emit(result.describe())
             self.message_signal.emit("🎉 Cập nhật hoàn tất! Ứng dụng sẽ khởi động lại...")
             return True
 
+        except InstallStopped:
+            # Giữ lại file zip để cài lại sau
+            return False
         except Exception as e:
             self.message_signal.emit(f"❌ Lỗi giải nén: {str(e)}")
-            # Chỉ xóa thư mục extract, giữ lại file zip
-            if os.path.exists(extract_to):
-                shutil.rmtree(extract_to)
             return False
 
-    def _cleanup(self, zip_file, extract_to):
-        """Dọn dẹp files tạm"""
-        try:
-            # Giữ lại file zip để giải nén sau khi restart
-            # os.remove(zip_file)  # Không xóa file zip
-            if os.path.exists(extract_to):
-                shutil.rmtree(extract_to)
-        except:
-            pass
-
     def stop(self):
         """Dừng quá trình download"""
         self.stop_flag = True
@@ -258,55 +264,62 @@ class UpdateChecker(QThread):
     no_update = Signal()
     error_occurred = Signal(str)
 
-    def __init__(self):
+    def __init__(self, force=False, interval=UPDATE_CHECK_INTERVAL):
         super().__init__()
+        # force: bỏ qua khoảng kiểm tra (kiểm tra thủ công)
+        self.force = force
+        self.interval = interval
 
     def run(self):
         """Kiểm tra phiên bản mới"""
         try:
             debug_print("🔍 Đang kiểm tra phiên bản mới...")
 
-            # Gửi request để lấy thông tin release mới nhất
-            response = requests.get(UPDATE_CHECK_URL, timeout=10)
-
-            if response.status_code == 200:
-                release_data = response.json()
-                latest_version = release_data.get(
-                    'tag_name', '').replace('v', '')
-                release_name = release_data.get('name', '')
-                release_notes = release_data.get('body', '')
-                # Lấy download URL từ JSON response
-                download_url = release_data.get('download_url', '')
+            # Lấy thông tin release mới nhất (304 / trong khoảng kiểm tra thì dùng bản đã lưu)
+            release_data, source = check_update_info(
+                UPDATE_CHECK_URL, interval=self.interval, force=self.force)
+            if source == CHECK_CACHED:
+                debug_print("📦 Dùng kết quả kiểm tra gần nhất, không gửi request")
+            elif source == CHECK_NOT_MODIFIED:
+                debug_print("📦 update.json không đổi (304)")
+
+            latest_version = release_data.get(
+                'tag_name', '').replace('v', '')
+            release_name = release_data.get('name', '')
+            release_notes = release_data.get('body', '')
+            # Lấy download URL từ JSON response
+            download_url = release_data.get('download_url', '')
+            if not download_url:
+                # Fallback nếu không có download_url, có thể thử các key khác
+                download_url = release_data.get('html_url', '')
                 if not download_url:
-                    # Fallback nếu không có download_url, có thể thử các key khác
-                    download_url = release_data.get('html_url', '')
-                    if not download_url:
-                        download_url = release_data.get('zipball_url', '')
-                
-                # Kiểm tra tính hợp lệ của download URL
-                if not download_url or not download_url.startswith(('http://', 'https://')):
-                    self.error_occurred.emit("Không tìm thấy URL download hợp lệ trong response")
-                    return
-                
-                published_at = release_data.get('published_at', '')
-                debug_print(f"📥 Download URL từ JSON: {download_url}")
-                
-                # So sánh phiên bản
-                if self._is_newer_version(latest_version, APP_VERSION):
-                    update_info = {
-                        'version': latest_version,
-                        'name': release_name,
-                        'notes': release_notes,
-                        'download_url': download_url,
-                        'published_at': published_at
-                    }
-                    self.update_available.emit(update_info)
-                else:
-                    self.no_update.emit()
+                    download_url = release_data.get('zipball_url', '')
+            
+            # Kiểm tra tính hợp lệ của download URL
+            if not download_url or not download_url.startswith(('http://', 'https://')):
+                self.error_occurred.emit("Không tìm thấy URL download hợp lệ trong response")
+                return
+            
+            published_at = release_data.get('published_at', '')
+            debug_print(f"📥 Download URL từ JSON: {download_url}")
+            
+            # So sánh phiên bản
+            if self._is_newer_version(latest_version, APP_VERSION):
+                update_info = {
+                    'version': latest_version,
+                    'name': release_name,
+                    'notes': release_notes,
+                    'download_url': download_url,
+                    'manifest_url': release_data.get('manifest_url', ''),
+                    'sha256': release_data.get('sha256'),
+                    'published_at': published_at
+                }
+                self.update_available.emit(update_info)
             else:
-                self.error_occurred.emit(
-                    f"HTTP {response.status_code}: Không thể kết nối đến server")
+                self.no_update.emit()
 
+        except UpdateCheckError as e:
+            self.error_occurred.emit(str(e))
         except requests.exceptions.Timeout:
             self.error_occurred.emit(
                 "Timeout: Không thể kết nối đến server trong thời gian quy định")
@@ -533,7 +546,9 @@ class UpdateDialog(QDialog):
 
         # # Tạo và chạy worker
         # self.download_worker = DownloadUpdateWorker(
-        #     self.update_info['download_url'], self.update_info['version'])
+        #     self.update_info['download_url'], self.update_info['version'],
+        #     manifest_url=self.update_info.get('manifest_url'),
+        #     sha256=self.update_info.get('sha256'))
         # self.download_worker.progress_signal.connect(self.update_progress)
         # self.download_worker.message_signal.connect(self.add_log)
         # self.download_worker.finished_signal.connect(self.on_download_finished)
@@ -725,377 +740,278 @@ def resource_path(relative_path):
     return os.path.join(os.path.abspath("."), relative_path)
 
 
-# Thiết lập đường dẫn ffmpeg và kiểm tra
+# Thiết lập đường dẫn ffmpeg
 ffmpeg_path = resource_path(os.path.join("ffmpeg", "ffmpeg.exe"))
 
-# Gọi thử ffmpeg
-try:
-    result = subprocess.run([ffmpeg_path, "-version"],
-                            capture_output=True, text=True)
-    debug_print("✅ FFmpeg đã sẵn sàng:")
-    debug_print(result.stdout.split('\n')[0])  # Chỉ hiển thị dòng đầu tiên
-except Exception as e:
-    debug_print("⚠️ Lỗi khi chạy ffmpeg:", e)
-    debug_print("📁 Đang tìm ffmpeg trong thư mục ffmpeg/")
+# Thông tin công cụ, được điền bởi ToolDiscoveryWorker sau khi cửa sổ hiện lên
+ytdlp_executable, ytdlp_version = None, None
+ffmpeg_version = None
+aria2c_path = None
+tools_discovered = False
 
-# Kiểm tra phiên bản yt-dlp
 
+def _discover_tools():
+    """discover_tools() không ném lỗi: lỗi thì coi như không tìm thấy công cụ"""
+    try:
+        return discover_tools(ffmpeg_path, log=debug_print)
+    except Exception as e:
+        debug_print(f"⚠️ Lỗi khi dò công cụ: {e}")
+        return {
+            "ffmpeg": {"path": None, "version": None, "cached": False},
+            "yt-dlp": {"path": None, "version": None, "cached": False},
+            "aria2c": {"path": None, "version": None, "cached": False},
+            "elapsed_ms": 0.0,
+        }
 
-def check_ytdlp_version():
-    """Kiểm tra phiên bản yt-dlp"""
-    possible_paths = [
-        "yt-dlp.exe",  # Trong thư mục hiện tại
-        "yt-dlp",      # Trong PATH (Linux/Mac)
-    ]
-
-    for ytdlp_path in possible_paths:
-        try:
-            result = subprocess.run(
-                [ytdlp_path, "--version"], capture_output=True, text=True, timeout=10)
-            if result.returncode == 0:
-                version = result.stdout.strip()
-                debug_print("✅ yt-dlp đã sẵn sàng:")
-                debug_print(f"📦 Phiên bản: {version}")
-                debug_print(f"📍 Đường dẫn: {ytdlp_path}")
-                return ytdlp_path, version
-        except subprocess.TimeoutExpired:
-            debug_print(f"⏱️ Timeout khi kiểm tra {ytdlp_path}")
-        except FileNotFoundError:
-            debug_print(f"❌ Không tìm thấy {ytdlp_path}")
-        except Exception as e:
-            debug_print(f"⚠️ Lỗi khi kiểm tra {ytdlp_path}: {e}")
 
-    debug_print("❌ Không tìm thấy yt-dlp!")
-    debug_print("💡 Hướng dẫn cài đặt:")
-    debug_print(
-        "   1. Tải yt-dlp.exe từ: https://github.com/yt-dlp/yt-dlp/releases")
-    debug_print("   2. Đặt file yt-dlp.exe vào thư mục chứa App.py")
-    debug_print("   3. Hoặc cài đặt qua pip: pip install yt-dlp")
-    return None, None
+class ToolDiscoveryWorker(QThread):
+    """Worker thread dò ffmpeg/yt-dlp (có cache) để không chặn lúc khởi động"""
+    finished_signal = Signal(dict)
 
+    def __init__(self):
+        super().__init__()
+        self.result = None  # Kết quả dò, có trước khi finished_signal được phát
 
-# Gọi kiểm tra yt-dlp
-ytdlp_executable, ytdlp_version = check_ytdlp_version()
+    def run(self):
+        """Dò công cụ trên thread riêng"""
+        self.result = _discover_tools()
+        self.finished_signal.emit(self.result)
 
 
 class DownloadWorker(QThread):
-    """Worker thread để xử lý download video"""
+    """Worker thread để xử lý download video (chạy BatchDownloader)"""
     message = Signal(str)
+    # Dòng trạng thái thay thế tại chỗ trong log: (key, text)
+    status_message = Signal(str, str)
     progress_signal = Signal(int)
     finished = Signal(str)
 
     def __init__(self, urls, video_mode, audio_only, sub_mode, sub_lang,
-                 convert_srt, include_thumb, subtitle_only, custom_folder_name=""):
+                 convert_srt, include_thumb, subtitle_only, custom_folder_name="",
+                 max_concurrent=DEFAULT_MAX_CONCURRENT, engine=None,
+                 use_archive=False, link_existing=False, resolve_metadata=False,
+                 journal=None, resume=False, concurrent_fragments=0,
+                 fragment_tuner=None, use_aria2c=False, keep_original_audio=False,
+                 format_policy=DEFAULT_FORMAT_POLICY, bandwidth=None, url_store=None):
         super().__init__()
-        self.urls = urls
-        self.video_mode = video_mode
-        self.audio_only = audio_only
-        self.sub_mode = sub_mode
-        self.sub_lang = sub_lang
-        self.convert_srt = convert_srt
-        self.include_thumb = include_thumb
-        self.subtitle_only = subtitle_only
-        self.custom_folder_name = custom_folder_name.strip()
-        self.stop_flag = False
-        self.process = None
+        # Link tải xong (hoặc lỗi, đã ghi vào failed_links.txt) được gỡ khỏi
+        # danh sách để lượt tải sau không tải lại
+        self.url_store = url_store
+        self.downloader = BatchDownloader(
+            urls, video_mode, audio_only, sub_mode, sub_lang,
+            convert_srt, include_thumb, subtitle_only, custom_folder_name,
+            max_concurrent=max_concurrent, engine=engine,
+            use_archive=use_archive, link_existing=link_existing,
+            resolve_metadata=resolve_metadata,
+            ytdlp_path=ytdlp_executable, ffmpeg_path=ffmpeg_path,
+            journal=journal, resume=resume,
+            concurrent_fragments=concurrent_fragments, fragment_tuner=fragment_tuner,
+            external_downloader=aria2c_path if use_aria2c else None,
+            keep_original_audio=keep_original_audio,
+            format_policy=format_policy,
+            bandwidth=bandwidth,
+            on_message=self.message.emit,
+            on_status=self.status_message.emit,
+            on_progress=self.progress_signal.emit,
+            on_job_finished=self._on_job_finished)
+
+    def _on_job_finished(self, job, success):
+        """Gỡ link đã xong khỏi danh sách (giữ lại link bị dừng giữa chừng)"""
+        if self.url_store is not None and (success or not self.downloader.stop_flag):
+            self.url_store.remove([job.url])
 
     def stop(self):
         """Dừng quá trình download"""
-        self.stop_flag = True
-        if self.process:
-            self.process.terminate()
-            self.message.emit("⏹ Dừng tải...")
+        self.downloader.stop()
 
     def run(self):
         """Chạy quá trình download"""
-        try:
-            download_folder = self._create_download_folder()
-            download_folder = download_folder.replace('\\', '/')
-            for i, url in enumerate(self.urls, 1):
-                if self.stop_flag:
-                    self.message.emit("⏹ Đã dừng tải.")
-                    break
-
-                self.message.emit(f"🔗 [{i}] Đang tải: {url}")
-
-                if self._download_single_url(url, download_folder, i):
-                    self.message.emit(f"✅ Hoàn thành link URL: {url}")
-                else:
-                    self.message.emit(f"❌ Lỗi khi tải link: {url}")
-
-                self.progress_signal.emit(int(i / len(self.urls) * 100))
-
+        download_folder = self.downloader.run()
+        if download_folder:
             self.finished.emit(f"📂 Video được lưu tại: {download_folder}")
 
-        except Exception as e:
-            self.message.emit(f"❌ Lỗi: {e}")
-
-    def _create_download_folder(self):
-        """Tạo thư mục download với cấu trúc đơn giản"""
-        base_folder = "Video"
-        os.makedirs(base_folder, exist_ok=True)
-        
-        if self.custom_folder_name:
-            # Nếu có tên thư mục tùy chọn
-            if os.path.isabs(self.custom_folder_name):
-                # Đường dẫn đầy đủ
-                date_folder = self.custom_folder_name
-            else:
-                # Tên thư mục - tạo trong thư mục Video
-                date_folder = os.path.join(base_folder, self.custom_folder_name)
-        else:
-            # Không có tên tùy chọn - tạo theo ngày
-            date_str = datetime.now().strftime("%Y-%m-%d")
-            date_folder = os.path.join(base_folder, date_str)
-        
-        # Tạo thư mục con với số thứ tự (01, 02, 03...)
-        download_folder = self._create_numbered_subfolder(date_folder)
-        
-        os.makedirs(download_folder, exist_ok=True)
-        return download_folder
-    
-    def _create_numbered_subfolder(self, date_folder):
-        """Tạo thư mục con với số thứ tự (01, 02, 03...)"""
-        if not os.path.exists(date_folder):
-            os.makedirs(date_folder, exist_ok=True)
-        
-        # Tìm số thứ tự cao nhất trong thư mục ngày
-        max_number = 0
-        for item in os.listdir(date_folder):
-            item_path = os.path.join(date_folder, item)
-            if os.path.isdir(item_path) and item.isdigit():
-                max_number = max(max_number, int(item))
-        
-        # Tạo thư mục con mới với số tiếp theo (format 2 chữ số)
-        next_number = max_number + 1
-        subfolder_name = f"{next_number:02d}"
-        download_folder = os.path.join(date_folder, subfolder_name)
-        
-        return download_folder
-
-    def _download_single_url(self, url, download_folder, index):
-        """Download một URL đơn"""
-        cmd = self._build_command(url, download_folder, index)
 
-        # Thiết lập creation flags để ẩn console window trên Windows
-        creation_flags = 0
-        if sys.platform == "win32":
-            creation_flags = subprocess.CREATE_NO_WINDOW
+class LogListModel(QAbstractListModel):
+    """Model log dạng ring buffer: giữ tối đa max_lines dòng cuối cùng"""
 
-        self.process = subprocess.Popen(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-            text=True, bufsize=1, creationflags=creation_flags
-        )
-
-        for line in self.process.stdout:
-            if self.stop_flag:
-                self.process.terminate()
-                self.message.emit("⏹ Đang dừng...")
-                break
+    def __init__(self, max_lines=5000, parent=None):
+        super().__init__(parent)
+        self.max_lines = max_lines
+        self._lines = deque()
+        self._first_seq = 0  # Số thứ tự của dòng đầu tiên còn giữ
+        self._keyed = {}  # key -> số thứ tự của dòng trạng thái
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._lines)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        return self._lines[index.row()]
+
+    def clear(self):
+        """Xóa toàn bộ log"""
+        self.beginResetModel()
+        self._first_seq += len(self._lines)
+        self._lines.clear()
+        self._keyed.clear()
+        self.endResetModel()
+
+    def apply(self, batch):
+        """
+        Áp một loạt (key, text): key None là dòng mới, còn key đã có thì
+        thay nội dung dòng cũ thay vì thêm dòng.
+        """
+        new_lines = []
+        new_keyed = {}  # key -> vị trí trong new_lines
+        changed_rows = {}  # row hiện có -> text mới
+
+        for key, text in batch:
+            if key is not None:
+                seq = self._keyed.get(key)
+                if seq is not None and seq >= self._first_seq:
+                    changed_rows[seq - self._first_seq] = text
+                    continue
+                if key in new_keyed:
+                    new_lines[new_keyed[key]] = text
+                    continue
+                new_keyed[key] = len(new_lines)
+            new_lines.append(text)
+
+        for row, text in changed_rows.items():
+            self._lines[row] = text
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+        if new_lines:
+            start = len(self._lines)
+            next_seq = self._first_seq + start
+            self.beginInsertRows(QModelIndex(), start, start + len(new_lines) - 1)
+            self._lines.extend(new_lines)
+            for key, pos in new_keyed.items():
+                self._keyed[key] = next_seq + pos
+            self.endInsertRows()
+
+        overflow = len(self._lines) - self.max_lines
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self._lines.popleft()
+            self._first_seq += overflow
+            self.endRemoveRows()
+            # Bỏ các khóa trỏ tới dòng đã bị đẩy ra khỏi buffer
+            self._keyed = {k: seq for k, seq in self._keyed.items()
+                           if seq >= self._first_seq}
+
+
+class UrlListModel(QAbstractListModel):
+    """Model danh sách link trong UrlStore, nạp dần từng trang khi cuộn"""
+
+    def __init__(self, store, page_size=500, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.page_size = page_size
+        self._urls = []
+        self._total = store.count()
+
+    @property
+    def total(self):
+        """Tổng số link trong store (kể cả phần chưa nạp)"""
+        return self._total
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._urls)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        return f"{index.row() + 1}. {self._urls[index.row()]}"
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and len(self._urls) < self._total
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        urls = self.store.page(len(self._urls), self.page_size)
+        if not urls:
+            self._total = len(self._urls)
+            return
+        start = len(self._urls)
+        self.beginInsertRows(QModelIndex(), start, start + len(urls) - 1)
+        self._urls.extend(urls)
+        self.endInsertRows()
 
-            line = line.strip()
-            if line:
-                self.message.emit(line)
-                self._update_progress_from_line(line)
+    def reload(self):
+        """Đọc lại từ đầu sau khi store thay đổi (chỉ nạp trang đầu)"""
+        self.beginResetModel()
+        self._urls = []
+        self._total = self.store.count()
+        self.endResetModel()
 
-        self.process.wait()
-
-        if self.process.returncode == 0:
-            self._post_process_files(download_folder)
-            return True
-        return False
-
-    def _build_command(self, url, download_folder, index):
-        """Xây dựng lệnh yt-dlp"""
-        # Sử dụng yt-dlp đã được kiểm tra từ trước
-        global ytdlp_executable
-        if ytdlp_executable:
-            ytdlp_path = ytdlp_executable
-        else:
-            # Fallback - tìm lại nếu cần
-            ytdlp_path = None
-            possible_paths = [
-                "yt-dlp.exe",  # Trong PATH
-                "yt-dlp",      # Fallback cho Linux/Mac
-            ]
-
-            for path in possible_paths:
-                if os.path.exists(path):
-                    ytdlp_path = path
-                    break
-
-            if not ytdlp_path:
-                # Fallback to system yt-dlp
-                ytdlp_path = "yt-dlp"
-
-        cmd = [ytdlp_path, url, "--progress"]
-
-        # Thêm đường dẫn ffmpeg nếu tồn tại
-        if os.path.exists(ffmpeg_path):
-            cmd += ["--ffmpeg-location", ffmpeg_path]
-
-        if self.subtitle_only:
-            cmd.append("--skip-download")
-            self.message.emit("📝 Chế độ: Chỉ tải phụ đề")
-        else:
-            cmd += ["-f", "bv*+ba/b", "--merge-output-format", "mp4"]
 
+class BufferedLogSink(QObject):
+    """Gom các dòng log và đẩy vào LogListModel theo chu kỳ timer"""
 
+    def __init__(self, view, max_lines=5000, interval_ms=80, parent=None):
+        super().__init__(parent)
+        self.view = view
+        self.model = LogListModel(max_lines, self)
+        self.view.setModel(self.model)
+        self._pending = []
+        self._force_scroll = False
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.flush)
+
+    def append(self, text):
+        """Thêm một dòng log"""
+        self._pending.append((None, str(text)))
+        self._schedule()
+
+    def set_status(self, key, text):
+        """Thêm hoặc thay dòng trạng thái có khóa key (vd. tiến trình một job)"""
+        self._pending.append((key, str(text)))
+        self._schedule()
+
+    def clear(self):
+        """Xóa log đang hiển thị và log đang chờ"""
+        self._pending.clear()
+        self._timer.stop()
+        self.model.clear()
 
-        # Template output
-        if self.video_mode:
-            if index ==1:
-                output_template = f"%(title)s.%(ext)s" 
-            else:
-                output_template = f"video_{index}_%(title)s.%(ext)s" 
+    def scroll_to_bottom(self):
+        """Cuộn xuống cuối sau lần đẩy log kế tiếp"""
+        self._force_scroll = True
+        if self._pending:
+            self._schedule()
         else:
-            if index == 1:
-                output_template = f"%(autonumber)03d_%(title)s.%(ext)s"
-                cmd.append("--yes-playlist")
-            else:
-                output_template = f"playlist_{index}_%(autonumber)03d_%(title)s.%(ext)s"
-                cmd.append("--yes-playlist")
-        cmd += ["-o", os.path.join(download_folder, output_template)]
-
-        if self.audio_only and not self.subtitle_only:
-            cmd += ["--extract-audio", "--audio-format", "mp3"]
-
-        # Xử lý phụ đề
-        if self.sub_mode != "❌ Không tải":
-            self._add_subtitle_options(cmd)
-
-        if self.convert_srt:
-            cmd += ["--convert-subs", "srt"]
-        if self.include_thumb:
-            cmd.append("--write-thumbnail")
-
-        return cmd
-
-    def _add_subtitle_options(self, cmd):
-        """Thêm tùy chọn phụ đề vào lệnh"""
-        # sub_lang bây giờ là string đơn thay vì list
-        lang_string = self.sub_lang
-        lang_display = self.sub_lang
-
-        if self.sub_mode == "📄 Phụ đề chính thức":
-            cmd += ["--write-subs", "--sub-langs", lang_string]
-            self.message.emit(
-                f"🔤 Tải phụ đề chính thức cho ngôn ngữ: {lang_display}")
-        elif self.sub_mode == "🤖 Phụ đề tự động":
-            cmd += ["--write-auto-subs", "--sub-langs", lang_string]
-            self.message.emit(
-                f"🤖 Tải phụ đề tự động cho ngôn ngữ: {lang_display}")
-
-        # Thêm các tùy chọn để đảm bảo tải được phụ đề
-        cmd += [
-            "--ignore-errors",           # Bỏ qua lỗi nếu một ngôn ngữ không có
-            "--no-warnings",            # Không hiển thị cảnh báo
-            "--sub-format", "srt/best"  # Ưu tiên định dạng SRT
-        ]
-
-        # Debug: In ra lệnh phụ đề
-        self.message.emit(f"🔧 Debug: Lệnh phụ đề = --sub-langs {lang_string}")
-
-    def _update_progress_from_line(self, line):
-        """Cập nhật progress từ output line"""
-        if "%" in line:
-            try:
-                percent_str = line.split(
-                    "%", 1)[0].split()[-1].replace(".", "").strip()
-                percent = int(percent_str)
-                if 0 <= percent <= 100:
-                    self.progress_signal.emit(percent)
-            except:
-                pass
+            self.view.scrollToBottom()
 
-    def _post_process_files(self, download_folder):
-        """Xử lý files sau khi download"""
-        if self.sub_mode != "❌ Không tải":
-            # sub_lang bây giờ là string đơn
-            self.message.emit(f"🔄 Xử lý phụ đề cho ngôn ngữ: {self.sub_lang}")
-            self._rename_subtitle_files(download_folder, self.sub_lang)
-
-        self._rename_video_files(download_folder)
-
-    def _rename_subtitle_files(self, folder_path, sub_lang):
-        """Đổi tên file phụ đề theo định dạng mong muốn"""
-        try:
-            self.message.emit(f"🔧 Đang xử lý phụ đề ngôn ngữ: {sub_lang}")
-
-            # Tìm tất cả file phụ đề cho ngôn ngữ này
-            patterns = [
-                f"*.{sub_lang}.srt",
-                f"*.{sub_lang}.vtt",
-                f"*.{sub_lang}.ass"
-            ]
-
-            found_files = []
-            for pattern in patterns:
-                found_files.extend(
-                    glob.glob(os.path.join(folder_path, pattern)))
-
-            if not found_files:
-                self.message.emit(
-                    f"⚠️ Không tìm thấy file phụ đề cho ngôn ngữ: {sub_lang}")
-                return
-
-            self.message.emit(
-                f"📁 Tìm thấy {len(found_files)} file phụ đề cho {sub_lang}")
-
-            for subtitle_file in found_files:
-                filename = os.path.basename(subtitle_file)
-
-                if sub_lang == "en":
-                    # Xử lý đặc biệt cho tiếng Anh - đổi thành .srt chính
-                    if subtitle_file.endswith(".en.srt"):
-                        # print(f"🔍 Đang xử lý1 : {subtitle_file}")
-                        new_name = subtitle_file.replace(
-                            "..en.srt", ".srt").replace(".en.srt", ".srt")
-                        # print(f"🔍 Đang xử lý: {new_name}")
-                        if not os.path.exists(new_name):
-                            os.rename(subtitle_file, new_name)
-                            self.message.emit(
-                                f"📝 Đổi tên: {filename} → {os.path.basename(new_name)}")
-                        else:
-                            self.message.emit(
-                                f"⚠️ File đã tồn tại: {os.path.basename(new_name)}")
-
-                # Sửa lỗi tên file có .. (double dots)
-                if f"..{sub_lang}." in subtitle_file:
-                    ext = os.path.splitext(subtitle_file)[1]
-                    new_name = subtitle_file.replace(
-                        f"..{sub_lang}.", f".{sub_lang}.")
-                    if not os.path.exists(new_name) and new_name != subtitle_file:
-                        os.rename(subtitle_file, new_name)
-                        self.message.emit(
-                            f"📝 Sửa tên: {filename} → {os.path.basename(new_name)}")
-
-        except Exception as e:
-            self.message.emit(f"⚠️ Lỗi đổi tên phụ đề {sub_lang}: {e}")
-
-    def _rename_video_files(self, folder_path):
-        """Đổi tên file video (sửa ..mp4, ..mp3, etc. thành .mp4, .mp3)"""
-        try:
-            video_formats = ["*.mp4", "*.mp3",
-                             "*.mkv", "*.avi", "*.mov", "*.webm"]
-
-            for format_pattern in video_formats:
-                for media_file in glob.glob(os.path.join(folder_path, format_pattern)):
-                    filename = os.path.basename(media_file)
+    def flush(self):
+        """Đẩy toàn bộ log đang chờ vào model"""
+        if not self._pending:
+            return
+        scrollbar = self.view.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 2
 
-                    if ".." in filename:
-                        file_ext = os.path.splitext(filename)[1]
-                        new_filename = filename.replace(
-                            f"..{file_ext[1:]}", file_ext)
-                        new_path = os.path.join(folder_path, new_filename)
+        batch, self._pending = self._pending, []
+        self.model.apply(batch)
 
-                        if not os.path.exists(new_path):
-                            os.rename(media_file, new_path)
-                            self.message.emit(
-                                f"📝 Sửa tên: {filename} → {new_filename}")
+        # Chỉ tự cuộn khi người dùng đang xem cuối log
+        if at_bottom or self._force_scroll:
+            self._force_scroll = False
+            self.view.scrollToBottom()
 
-        except Exception as e:
-            self.message.emit(f"⚠️ Lỗi đổi tên file media: {e}")
+    def _schedule(self):
+        if not self._timer.isActive():
+            self._timer.start()
 
 
 class DownloaderApp(QWidget):
@@ -1104,8 +1020,20 @@ class DownloaderApp(QWidget):
     def __init__(self):
         super().__init__()
         self.worker = None
+        self.tool_worker = None  # Thread dò ffmpeg/yt-dlp
+        self.ytdlp_engine = None  # YtDlpEngine dùng chung giữa các lần tải
+        # Số fragment tự chọn theo tốc độ, nhớ qua các lần tải
+        self.fragment_tuner = FragmentTuner()
         self.update_checker = None  # Update checker thread
         self.settings = QSettings("HT Software", "DownloadVID")
+        # Chỉ ghi các key đã đổi, gom các thay đổi liên tiếp thành một lần ghi
+        self.settings_store = SettingsStore(self.settings)
+        self.settings_timer = QTimer(self)
+        self.settings_timer.setSingleShot(True)
+        self.settings_timer.setInterval(SETTINGS_SAVE_DELAY_MS)
+        self.settings_timer.timeout.connect(self.flush_settings)
+        # Danh sách link lớn nằm trong SQLite thay vì trong ô nhập URL
+        self.url_store = UrlStore()
         self.loading_settings = False  # Flag để tránh auto-save khi đang load
         self.is_manual_check = False  # Đổi tên biến để tránh xung đột với tên hàm
         self.init_ui()
@@ -1115,13 +1043,14 @@ class DownloaderApp(QWidget):
         # Hiển thị thông tin phiên bản khi khởi động
         self._show_startup_info()
 
+        # Dò ffmpeg/yt-dlp trên thread riêng, cửa sổ hiện ngay không cần chờ
+        self._start_tool_discovery()
+
         # Kiểm tra update tự động khi khởi động (sau 3 giây)
         QTimer.singleShot(3000, self.auto_check_update)
 
     def _show_startup_info(self):
         """Hiển thị thông tin phiên bản khi khởi động"""
-        global ytdlp_executable, ytdlp_version
-
         # Kiểm tra xem có vừa cập nhật không
         self._check_recent_update()
 
@@ -1131,31 +1060,74 @@ class DownloaderApp(QWidget):
         debug_print(app_info)
 
         # Hiển thị thông tin trong log output của ứng dụng
-        self.output_list.addItem("=" * 50)
-        self.output_list.addItem(f"🎬 HT DownloadVID v{APP_VERSION}")
-        self.output_list.addItem("=" * 50)
+        self.log_sink.append("=" * 50)
+        self.log_sink.append(f"🎬 HT DownloadVID v{APP_VERSION}")
+        self.log_sink.append("=" * 50)
+        self.log_sink.set_status("tools", "🔍 Đang kiểm tra yt-dlp và ffmpeg...")
+
+        # Cuộn xuống cuối
+        self.scroll_to_bottom()
+
+    def _start_tool_discovery(self):
+        """Bắt đầu dò ffmpeg/yt-dlp trên thread riêng"""
+        self.tool_worker = ToolDiscoveryWorker()
+        self.tool_worker.finished_signal.connect(self._on_tools_discovered)
+        self.tool_worker.start()
+
+    def _on_tools_discovered(self, result):
+        """Nhận kết quả dò công cụ và hiển thị thông tin"""
+        global ytdlp_executable, ytdlp_version, ffmpeg_version, tools_discovered, aria2c_path
+        if tools_discovered:
+            # Đã nhận qua _wait_for_tools(), tín hiệu của worker tới sau
+            return
+
+        ytdlp_executable = result["yt-dlp"]["path"]
+        ytdlp_version = result["yt-dlp"]["version"]
+        ffmpeg_version = result["ffmpeg"]["version"]
+        aria2c_path = result["aria2c"]["path"]
+        tools_discovered = True
+
+        cached = result["yt-dlp"]["cached"] and result["ffmpeg"]["cached"]
+        debug_print(f"🔧 Dò công cụ: {result['elapsed_ms']:.0f} ms"
+                    f"{' (từ cache)' if cached else ''}")
 
         # Thông tin yt-dlp
         if ytdlp_executable and ytdlp_version:
-            self.output_list.addItem(f"✅ yt-dlp: {ytdlp_version}")
-            self.output_list.addItem(f"📍 Đường dẫn: {ytdlp_executable}")
+            self.log_sink.set_status("tools", f"✅ yt-dlp: {ytdlp_version}")
+            self.log_sink.append(f"📍 Đường dẫn: {ytdlp_executable}")
         else:
-            self.output_list.addItem("❌ yt-dlp: Không tìm thấy!")
-            self.output_list.addItem("⚠️ Ứng dụng có thể không hoạt động đúng")
+            self.log_sink.set_status("tools", "❌ yt-dlp: Không tìm thấy!")
+            self.log_sink.append("⚠️ Ứng dụng có thể không hoạt động đúng")
 
         # Thông tin ffmpeg
-        if os.path.exists(ffmpeg_path):
-            self.output_list.addItem("✅ ffmpeg: Đã sẵn sàng")
-            self.output_list.addItem(f"📍 Đường dẫn: {ffmpeg_path}")
+        if ffmpeg_version:
+            self.log_sink.append("✅ ffmpeg: Đã sẵn sàng")
+            self.log_sink.append(f"📍 Đường dẫn: {ffmpeg_path}")
         else:
-            self.output_list.addItem("⚠️ ffmpeg: Không tìm thấy")
+            self.log_sink.append("⚠️ ffmpeg: Không tìm thấy")
 
-        self.output_list.addItem("=" * 50)
-        self.output_list.addItem("💡 Sẵn sàng tải video!")
+        # aria2c (tùy chọn) để tải file lớn bằng nhiều kết nối
+        if aria2c_path:
+            self.log_sink.append(f"✅ aria2c: {result['aria2c']['version']}")
+            self.use_aria2c.setEnabled(True)
+            self.use_aria2c.setToolTip("")
+
+        self.log_sink.append(
+            f"⏱️ Dò công cụ: {result['elapsed_ms']:.0f} ms{' (cache)' if cached else ''}")
+        self.log_sink.append("=" * 50)
+        self.log_sink.append("💡 Sẵn sàng tải video!")
 
         # Cuộn xuống cuối
         self.scroll_to_bottom()
 
+        self._offer_resume()
+
+    def report_startup_time(self):
+        """Ghi lại thời gian từ lúc chạy tới khi cửa sổ hiện lên"""
+        elapsed_ms = (time.perf_counter() - STARTUP_TIME) * 1000
+        debug_print(f"⏱️ Thời gian khởi động: {elapsed_ms:.0f} ms")
+        self.log_sink.append(f"⏱️ Khởi động: {elapsed_ms:.0f} ms")
+
     def _check_recent_update(self):
         """Kiểm tra xem có vừa cập nhật không"""
         global APP_VERSION
@@ -1306,8 +1278,40 @@ class DownloaderApp(QWidget):
         self.url_input.setPlaceholderText(
             "Mỗi dòng 1 link video hoặc playlist...")
         self.url_input.setFixedHeight(75)
+        self.url_input.textChanged.connect(self._on_url_text_changed)
         self.layout.addWidget(self.url_input)
 
+        # Danh sách link đã nhập vào store (nạp dần khi cuộn)
+        url_list_layout = QHBoxLayout()
+        self.url_count_label = QLabel()
+        url_list_layout.addWidget(self.url_count_label)
+        url_list_layout.addStretch()
+
+        self.add_urls_button = QPushButton("➕ Thêm vào danh sách")
+        self.add_urls_button.setToolTip(
+            "Chuyển các link trong ô trên vào danh sách (bỏ link trùng)")
+        self.add_urls_button.clicked.connect(self.absorb_url_input)
+        url_list_layout.addWidget(self.add_urls_button)
+
+        self.import_urls_button = QPushButton("📄 Nhập file")
+        self.import_urls_button.setToolTip("Nhập link từ file .txt, mỗi dòng một link")
+        self.import_urls_button.clicked.connect(self.import_urls_from_file)
+        url_list_layout.addWidget(self.import_urls_button)
+
+        self.clear_urls_button = QPushButton("🗑️ Xóa danh sách")
+        self.clear_urls_button.clicked.connect(self.clear_url_list)
+        url_list_layout.addWidget(self.clear_urls_button)
+        self.layout.addLayout(url_list_layout)
+
+        self.url_list_model = UrlListModel(self.url_store, parent=self)
+        self.url_list_view = QListView()
+        self.url_list_view.setModel(self.url_list_model)
+        self.url_list_view.setUniformItemSizes(True)
+        self.url_list_view.setEditTriggers(QListView.EditTrigger.NoEditTriggers)
+        self.url_list_view.setFixedHeight(90)
+        self.layout.addWidget(self.url_list_view)
+        self._update_url_count()
+
         self.layout.addWidget(QLabel("📁 Tên thư mục tải (tuỳ chọn):"))
 
         # Tạo layout ngang cho ô nhập tên thư mục và nút chọn thư mục
@@ -1398,6 +1402,14 @@ class DownloaderApp(QWidget):
         self.audio_only = QCheckBox("🎵 Tải âm thanh MP3")
         row1_layout.addWidget(self.audio_only)
 
+        self.keep_original_audio = QCheckBox("📦 Giữ âm thanh gốc")
+        self.keep_original_audio.setToolTip(
+            "Giữ nguyên M4A/Opus đã tải, không mã hóa lại sang MP3")
+        # Chỉ có tác dụng khi tải âm thanh
+        self.keep_original_audio.setEnabled(False)
+        self.audio_only.toggled.connect(self.keep_original_audio.setEnabled)
+        row1_layout.addWidget(self.keep_original_audio)
+
         row1_layout.addStretch()  # Thêm khoảng trống để căn trái
         self.layout.addLayout(row1_layout)
 
@@ -1410,9 +1422,99 @@ class DownloaderApp(QWidget):
         self.subtitle_only = QCheckBox("📝 Chỉ tải phụ đề")
         row2_layout.addWidget(self.subtitle_only)
 
+        row2_layout.addWidget(QLabel("🎞️ Định dạng:"))
+        self.format_policy = QComboBox()
+        for policy, label in FORMAT_POLICY_LABELS.items():
+            self.format_policy.addItem(label, policy)
+        self.format_policy.setToolTip(
+            "Chọn format ghép được bằng copy, không mã hóa lại video.\n"
+            "MP4 tương thích: H.264 + AAC; chất lượng cao nhất: VP9/AV1 dùng WebM/MKV")
+        row2_layout.addWidget(self.format_policy)
+
         row2_layout.addStretch()  # Thêm khoảng trống để căn trái
         self.layout.addLayout(row2_layout)
 
+        # Dòng 3: Số link tải song song
+        row3_layout = QHBoxLayout()
+
+        row3_layout.addWidget(QLabel("⚡ Số link tải cùng lúc:"))
+        self.max_concurrent = QSpinBox()
+        self.max_concurrent.setRange(1, 10)
+        self.max_concurrent.setValue(DEFAULT_MAX_CONCURRENT)
+        row3_layout.addWidget(self.max_concurrent)
+
+        self.python_engine = QCheckBox("🐍 Dùng yt_dlp tích hợp (nhanh hơn)")
+        if not ytdlp_module_available():
+            self.python_engine.setEnabled(False)
+            self.python_engine.setToolTip(
+                "Cần cài thư viện yt_dlp: pip install yt-dlp")
+        row3_layout.addWidget(self.python_engine)
+
+        row3_layout.addStretch()  # Thêm khoảng trống để căn trái
+        self.layout.addLayout(row3_layout)
+
+        # Dòng 4: Archive các video đã tải
+        row4_layout = QHBoxLayout()
+
+        self.use_archive = QCheckBox("⏭️ Bỏ qua video đã tải (archive)")
+        self.use_archive.setChecked(True)
+        row4_layout.addWidget(self.use_archive)
+
+        self.link_existing = QCheckBox("🔗 Hard-link file đã có")
+        self.link_existing.setToolTip(
+            "Đưa file đã tải ở lần trước vào thư mục mới bằng hard-link thay vì bỏ qua")
+        row4_layout.addWidget(self.link_existing)
+
+        self.resolve_metadata = QCheckBox("📋 Lấy thông tin trước khi tải")
+        self.resolve_metadata.setToolTip(
+            "Lấy tiêu đề, thời lượng, format của cả danh sách trước, lưu cache để tải nhanh hơn")
+        row4_layout.addWidget(self.resolve_metadata)
+
+        row4_layout.addStretch()  # Thêm khoảng trống để căn trái
+        self.layout.addLayout(row4_layout)
+
+        # Dòng 5: Tải video lớn bằng nhiều kết nối
+        row5_layout = QHBoxLayout()
+
+        row5_layout.addWidget(QLabel("🧩 Fragment song song:"))
+        self.concurrent_fragments = QSpinBox()
+        self.concurrent_fragments.setRange(0, MAX_FRAGMENTS)
+        # 0 = tự chọn theo tốc độ đo được
+        self.concurrent_fragments.setSpecialValueText("Tự động")
+        self.concurrent_fragments.setValue(0)
+        self.concurrent_fragments.setToolTip(
+            "Số fragment DASH/HLS tải cùng lúc cho mỗi video (--concurrent-fragments)")
+        row5_layout.addWidget(self.concurrent_fragments)
+
+        self.use_aria2c = QCheckBox("🚀 Dùng aria2c (nhiều kết nối)")
+        # Chỉ bật được sau khi dò thấy aria2c
+        self.use_aria2c.setEnabled(False)
+        self.use_aria2c.setToolTip("Cần aria2c.exe trong thư mục ứng dụng hoặc PATH")
+        row5_layout.addWidget(self.use_aria2c)
+
+        row5_layout.addStretch()  # Thêm khoảng trống để căn trái
+        self.layout.addLayout(row5_layout)
+
+        # Dòng 6: Giới hạn băng thông chung cho mọi link đang tải
+        row6_layout = QHBoxLayout()
+
+        row6_layout.addWidget(QLabel("🌐 Băng thông (MB/s):"))
+        self.bandwidth_limit = QSpinBox()
+        self.bandwidth_limit.setRange(0, 10000)
+        self.bandwidth_limit.setSpecialValueText("Không giới hạn")
+        self.bandwidth_limit.setValue(0)
+        self.bandwidth_limit.setToolTip(
+            "Tổng tốc độ tải của mọi link cùng lúc, chia đều cho các link đang tải")
+        row6_layout.addWidget(self.bandwidth_limit)
+
+        self.bandwidth_schedule = QLineEdit()
+        self.bandwidth_schedule.setPlaceholderText("Theo giờ: 08:00-18:00=5M, 22:00-06:00=0")
+        self.bandwidth_schedule.setToolTip(
+            "Giới hạn riêng theo khung giờ (0 = không giới hạn), ngoài các khung dùng ô bên trái")
+        row6_layout.addWidget(self.bandwidth_schedule)
+
+        self.layout.addLayout(row6_layout)
+
     def _create_control_buttons(self):
         """Tạo các nút điều khiển"""
         self.download_button = QPushButton("🚀 Bắt đầu tải")
@@ -1435,8 +1537,10 @@ class DownloaderApp(QWidget):
 
     def _create_log_section(self):
         """Tạo phần log"""
-        self.output_list = QListWidget()
+        self.output_list = QListView()
         self.output_list.setWordWrap(True)
+        self.output_list.setLayoutMode(QListView.LayoutMode.Batched)
+        self.output_list.setEditTriggers(QListView.EditTrigger.NoEditTriggers)
         self.output_list.setHorizontalScrollBarPolicy(
             Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
         self.output_list.setVerticalScrollBarPolicy(
@@ -1444,6 +1548,9 @@ class DownloaderApp(QWidget):
         self.output_list.setMinimumHeight(120)
         self.layout.addWidget(self.output_list)
 
+        # Log được gom lại và đẩy vào view mỗi 80ms, giữ tối đa 5000 dòng
+        self.log_sink = BufferedLogSink(self.output_list, parent=self)
+
     def _connect_auto_save(self):
         """Kết nối auto-save với các control"""
         # Chỉ kết nối sau khi đã load settings xong
@@ -1463,13 +1570,26 @@ class DownloaderApp(QWidget):
         # Combobox
         self.sub_mode.currentTextChanged.connect(self.auto_save_on_change)
         self.sub_lang.currentTextChanged.connect(self.auto_save_on_change)
+        self.format_policy.currentIndexChanged.connect(self.auto_save_on_change)
 
         # Checkboxes
         self.convert_srt.toggled.connect(self.auto_save_on_change)
         self.audio_only.toggled.connect(self.auto_save_on_change)
+        self.keep_original_audio.toggled.connect(self.auto_save_on_change)
         self.include_thumb.toggled.connect(self.auto_save_on_change)
         self.subtitle_only.toggled.connect(self.auto_save_on_change)
 
+        # Spinbox
+        self.max_concurrent.valueChanged.connect(self.auto_save_on_change)
+        self.python_engine.toggled.connect(self.auto_save_on_change)
+        self.use_archive.toggled.connect(self.auto_save_on_change)
+        self.link_existing.toggled.connect(self.auto_save_on_change)
+        self.resolve_metadata.toggled.connect(self.auto_save_on_change)
+        self.concurrent_fragments.valueChanged.connect(self.auto_save_on_change)
+        self.use_aria2c.toggled.connect(self.auto_save_on_change)
+        self.bandwidth_limit.valueChanged.connect(self.auto_save_on_change)
+        self.bandwidth_schedule.textChanged.connect(self.auto_save_on_change)
+
         # Language checkboxes đã được kết nối trong _create_language_checkboxes()
         # Không cần kết nối lại ở đây
 
@@ -1485,13 +1605,99 @@ class DownloaderApp(QWidget):
             window_geometry.moveCenter(center_point)
             self.move(window_geometry.topLeft())
 
+    def _update_url_count(self):
+        """Cập nhật nhãn số link trong danh sách"""
+        total = self.url_list_model.total
+        self.url_count_label.setText(f"🔗 Danh sách: {total} link")
+        self.url_list_view.setVisible(total > 0)
+        self.clear_urls_button.setEnabled(total > 0)
+
+    def _on_url_text_changed(self):
+        """Dán nhiều link vào ô nhập thì tự chuyển sang danh sách"""
+        # blockCount() rẻ hơn nhiều so với toPlainText().splitlines()
+        if self.url_input.document().blockCount() > URL_INPUT_MAX_LINES:
+            # Không sửa ô nhập ngay trong tín hiệu textChanged của chính nó
+            QTimer.singleShot(0, self.absorb_url_input)
+
+    def absorb_url_input(self):
+        """Chuyển các link trong ô nhập vào danh sách"""
+        lines = self.url_input.toPlainText().splitlines()
+        if not any(line.strip() for line in lines):
+            return
+        added, duplicates = self.url_store.add(lines)
+        self.url_input.clear()
+        self.url_list_model.reload()
+        self._update_url_count()
+        self.log_sink.append(
+            f"📋 Đã thêm {added} link vào danh sách"
+            + (f", bỏ {duplicates} link trùng" if duplicates else ""))
+
+    def import_urls_from_file(self):
+        """Nhập link từ file text vào danh sách"""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Chọn file danh sách link", os.getcwd(),
+            "Text files (*.txt *.csv *.list);;All files (*)")
+        if not path:
+            return
+        try:
+            added, duplicates = self.url_store.import_file(path)
+        except OSError as e:
+            QMessageBox.warning(self, "Lỗi", f"❌ Không đọc được file: {e}")
+            return
+        self.url_list_model.reload()
+        self._update_url_count()
+        self.log_sink.append(
+            f"📄 Nhập {os.path.basename(path)}: thêm {added} link"
+            + (f", bỏ {duplicates} link trùng" if duplicates else ""))
+
+    def clear_url_list(self):
+        """Xóa toàn bộ danh sách link"""
+        total = self.url_list_model.total
+        reply = QMessageBox.question(
+            self, "Xóa danh sách", f"Xóa {total} link khỏi danh sách?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.No)
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        self.url_store.clear()
+        self.url_list_model.reload()
+        self._update_url_count()
+        self.log_sink.append(f"🗑️ Đã xóa {total} link khỏi danh sách")
+
+    def _wait_for_tools(self):
+        """
+        Chờ dò yt-dlp/ffmpeg xong trước khi tải (bấm tải ngay sau khi mở ứng
+        dụng): lấy kết quả của worker, chưa có worker thì dò ngay trên thread này.
+        """
+        if tools_discovered:
+            return
+        self.log_sink.set_status("tools", "⏳ Đang chờ dò yt-dlp và ffmpeg xong...")
+        self.log_sink.flush()
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            if self.tool_worker is not None:
+                self.tool_worker.wait()
+                result = self.tool_worker.result
+            else:
+                result = None
+            self._on_tools_discovered(result or _discover_tools())
+        finally:
+            QApplication.restoreOverrideCursor()
+
     def start_download(self):
         """Bắt đầu quá trình download"""
-        urls = [u.strip()
-                for u in self.url_input.toPlainText().splitlines() if u.strip()]
+        # Link trong danh sách trước, rồi tới link trong ô nhập
+        lines = self.url_store.urls() + self.url_input.toPlainText().splitlines()
+        urls, duplicates = unique_urls(lines)
         if not urls:
             QMessageBox.warning(self, "Cảnh báo", "Bạn chưa nhập URL nào.")
             return
+        try:
+            bandwidth = self._bandwidth_budget()
+        except ValueError as e:
+            QMessageBox.warning(self, "Cảnh báo", f"Khung giờ băng thông không hợp lệ:\n{e}")
+            return
+        self._wait_for_tools()
 
         self._prepare_ui_for_download()
 
@@ -1499,33 +1705,55 @@ class DownloaderApp(QWidget):
         selected_lang_code = self._get_selected_language_code()
 
         # Debug: Hiển thị thông tin cấu hình chi tiết
-        self.output_list.addItem("🔧 === THÔNG TIN CẤU HÌNH ===")
-        self.output_list.addItem(f"🔗 Số URL: {len(urls)}")
-        self.output_list.addItem(
+        self.log_sink.append("🔧 === THÔNG TIN CẤU HÌNH ===")
+        self.log_sink.append(f"🔗 Số URL: {len(urls)}"
+                             + (f" (bỏ {duplicates} link trùng)" if duplicates else ""))
+        self.log_sink.append(
             f"🎬 Chế độ: {'Video đơn' if self.video_radio.isChecked() else 'Playlist'}")
-        self.output_list.addItem(f"📝 Phụ đề: {self.sub_mode.currentText()}")
-        self.output_list.addItem(
+        self.log_sink.append(f"📝 Phụ đề: {self.sub_mode.currentText()}")
+        self.log_sink.append(
             f"🌍 Ngôn ngữ phụ đề: {self.sub_lang.currentText()}")
 
         # Hiển thị các tùy chọn khác
         options = []
         if self.audio_only.isChecked():
-            options.append("🎵 Audio MP3")
+            options.append("📦 Âm thanh gốc" if self.keep_original_audio.isChecked()
+                           else "🎵 Audio MP3")
         if self.convert_srt.isChecked():
             options.append("🔁 Convert SRT")
         if self.include_thumb.isChecked():
             options.append("🖼️ Thumbnail")
         if self.subtitle_only.isChecked():
             options.append("📝 Chỉ phụ đề")
+        else:
+            options.append(f"🎞️ {self.format_policy.currentText()}")
+        if self.max_concurrent.value() > 1:
+            options.append(f"⚡ {self.max_concurrent.value()} luồng")
+        if self._use_python_engine():
+            options.append("🐍 yt_dlp tích hợp")
+        if self.use_archive.isChecked():
+            options.append("🔗 Archive + hard-link" if self.link_existing.isChecked()
+                           else "⏭️ Archive")
+        if self.resolve_metadata.isChecked():
+            options.append("📋 Lấy thông tin trước")
+        if self.concurrent_fragments.value() > 0:
+            options.append(f"🧩 {self.concurrent_fragments.value()} fragment")
+        else:
+            options.append(f"🧩 Fragment tự động ({self.fragment_tuner.suggest()})")
+        if self._use_aria2c():
+            options.append("🚀 aria2c")
+        if bandwidth.enabled:
+            options.append(f"🌐 {self.bandwidth_limit.value() or '∞'} MB/s"
+                           + (" + khung giờ" if bandwidth.schedule else ""))
 
         if options:
-            self.output_list.addItem(f"⚙️ Tùy chọn: {', '.join(options)}")
+            self.log_sink.append(f"⚙️ Tùy chọn: {', '.join(options)}")
 
         custom_folder = self.folder_name_input.toPlainText().strip()
         if custom_folder:
-            self.output_list.addItem(f"📁 Thư mục: {custom_folder}")
+            self.log_sink.append(f"📁 Thư mục: {custom_folder}")
 
-        self.output_list.addItem("🔧 ========================")
+        self.log_sink.append("🔧 ========================")
         self.scroll_to_bottom()
 
         self.worker = DownloadWorker(
@@ -1537,15 +1765,110 @@ class DownloaderApp(QWidget):
             convert_srt=self.convert_srt.isChecked(),
             include_thumb=self.include_thumb.isChecked(),
             subtitle_only=self.subtitle_only.isChecked(),
-            custom_folder_name=custom_folder
+            custom_folder_name=custom_folder,
+            max_concurrent=self.max_concurrent.value(),
+            engine=self._get_ytdlp_engine(),
+            use_archive=self.use_archive.isChecked(),
+            link_existing=self.link_existing.isChecked(),
+            resolve_metadata=self.resolve_metadata.isChecked(),
+            journal=JobJournal(),
+            concurrent_fragments=self.concurrent_fragments.value(),
+            fragment_tuner=self.fragment_tuner,
+            use_aria2c=self._use_aria2c(),
+            keep_original_audio=self.keep_original_audio.isChecked(),
+            format_policy=self._selected_format_policy(),
+            bandwidth=bandwidth,
+            url_store=self.url_store
+        )
+
+        self._connect_worker_signals()
+        self.worker.start()
+
+    def _offer_resume(self):
+        """Hỏi tải tiếp nếu lượt tải trước bị dừng/crash giữa chừng"""
+        journal = JobJournal.load()
+        if not journal:
+            return
+        unfinished = journal.unfinished()
+        if not unfinished or not journal.folder or \
+                any(name not in journal.options for name in JOURNAL_OPTIONS):
+            journal.discard()
+            return
+        if self.worker and self.worker.isRunning():
+            return
+
+        reply = QMessageBox.question(
+            self, "Tải tiếp",
+            f"Lượt tải trước còn {len(unfinished)} link chưa xong.\n"
+            f"📂 Thư mục: {journal.folder}\n\n"
+            "Tải tiếp vào thư mục cũ (giữ phần đã tải dở)?",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+        if reply == QMessageBox.Yes:
+            self.resume_download(journal)
+        else:
+            journal.discard()
+
+    def resume_download(self, journal):
+        """Tải tiếp các link chưa xong của journal vào thư mục cũ"""
+        try:
+            bandwidth = self._bandwidth_budget()
+        except ValueError as e:
+            # Khung giờ sai: chỉ dùng giới hạn chung
+            self.log_sink.append(f"⚠️ Bỏ qua khung giờ băng thông: {e}")
+            bandwidth = BandwidthBudget(self.bandwidth_limit.value() * 1024 * 1024)
+        self._wait_for_tools()
+        self._prepare_ui_for_download()
+        self.log_sink.append(f"♻️ Tải tiếp lượt tải ngày {journal.created}")
+        self.scroll_to_bottom()
+
+        self.worker = DownloadWorker(
+            urls=[],
+            **journal.options,
+            max_concurrent=self.max_concurrent.value(),
+            engine=self._get_ytdlp_engine(),
+            use_archive=self.use_archive.isChecked(),
+            link_existing=self.link_existing.isChecked(),
+            resolve_metadata=self.resolve_metadata.isChecked(),
+            journal=journal,
+            resume=True,
+            concurrent_fragments=self.concurrent_fragments.value(),
+            fragment_tuner=self.fragment_tuner,
+            use_aria2c=self._use_aria2c(),
+            bandwidth=bandwidth,
+            url_store=self.url_store
         )
 
         self._connect_worker_signals()
         self.worker.start()
 
+    def _bandwidth_budget(self):
+        """BandwidthBudget theo giới hạn và khung giờ trên giao diện (ValueError nếu sai)"""
+        return BandwidthBudget(self.bandwidth_limit.value() * 1024 * 1024,
+                               parse_schedule(self.bandwidth_schedule.text()))
+
+    def _selected_format_policy(self):
+        """Policy chọn format đang chọn trên combobox"""
+        return self.format_policy.currentData() or DEFAULT_FORMAT_POLICY
+
+    def _use_aria2c(self):
+        """Có tải file HTTP bằng aria2c không (chỉ khi đã dò thấy aria2c)"""
+        return self.use_aria2c.isEnabled() and self.use_aria2c.isChecked()
+
+    def _use_python_engine(self):
+        """Có dùng engine yt_dlp trong tiến trình không"""
+        return self.python_engine.isEnabled() and self.python_engine.isChecked()
+
+    def _get_ytdlp_engine(self):
+        """Lấy YtDlpEngine dùng chung (tạo khi cần), None nếu dùng yt-dlp.exe"""
+        if not self._use_python_engine():
+            return None
+        if self.ytdlp_engine is None:
+            self.ytdlp_engine = YtDlpEngine(max_idle=self.max_concurrent.maximum())
+        return self.ytdlp_engine
+
     def _prepare_ui_for_download(self):
         """Chuẩn bị UI cho quá trình download"""
-        self.output_list.clear()
+        self.log_sink.clear()
         self.progress.setValue(0)
         self.stop_button.setVisible(True)
         self.progress.setVisible(True)
@@ -1554,18 +1877,17 @@ class DownloaderApp(QWidget):
 
     def _connect_worker_signals(self):
         """Kết nối các signal của worker"""
-        self.worker.message.connect(self.output_list.addItem)
-        self.worker.message.connect(self.scroll_to_bottom)
+        self.worker.message.connect(self.log_sink.append)
+        self.worker.status_message.connect(self.log_sink.set_status)
         self.worker.progress_signal.connect(self.progress.setValue)
-        self.worker.finished.connect(self.output_list.addItem)
-        self.worker.finished.connect(self.scroll_to_bottom)
+        self.worker.finished.connect(self.log_sink.append)
         self.worker.finished.connect(self.on_download_finished)
 
     def stop_download(self):
         """Dừng quá trình download"""
         if self.worker and self.worker.isRunning():
             self.worker.stop()
-            self.output_list.addItem("⏹ Đang dừng tiến trình...")
+            self.log_sink.append("⏹ Đang dừng tiến trình...")
             self.scroll_to_bottom()
             self._reset_ui_after_download()
         else:
@@ -1577,8 +1899,8 @@ class DownloaderApp(QWidget):
         self._reset_ui_after_download()
         
         # Thêm tùy chọn tắt ứng dụng sau 4 giây
-        self.output_list.addItem("✅ Download hoàn tất!")
-        self.output_list.addItem("⏱️ Ứng dụng sẽ tự động tắt sau 4 giây...")
+        self.log_sink.append("✅ Download hoàn tất!")
+        self.log_sink.append("⏱️ Ứng dụng sẽ tự động tắt sau 4 giây...")
         self.scroll_to_bottom()
         
         # Tạo timer để tắt ứng dụng sau 4 giây
@@ -1590,7 +1912,7 @@ class DownloaderApp(QWidget):
     def _delayed_close_application(self):
         """Tắt ứng dụng sau delay"""
         try:
-            self.output_list.addItem("🛑 Đang tắt ứng dụng...")
+            self.log_sink.append("🛑 Đang tắt ứng dụng...")
             self.scroll_to_bottom()
             
             # Thực hiện copy thư mục nếu cần
@@ -1600,7 +1922,7 @@ class DownloaderApp(QWidget):
             QApplication.instance().quit()
             
         except Exception as e:
-            self.output_list.addItem(f"❌ Lỗi khi tắt ứng dụng: {str(e)}")
+            self.log_sink.append(f"❌ Lỗi khi tắt ứng dụng: {str(e)}")
             QApplication.instance().quit()
 
     def _copy_update_files(self):
@@ -1610,7 +1932,7 @@ class DownloaderApp(QWidget):
             temp_update_dir = os.path.join(current_dir, "temp_update")
             
             if os.path.exists(temp_update_dir):
-                self.output_list.addItem("📁 Đang copy files cập nhật từ thư mục tạm...")
+                self.log_sink.append("📁 Đang copy files cập nhật từ thư mục tạm...")
                 
                 # Copy tất cả files từ temp_update về thư mục chính
                 for root, dirs, files in os.walk(temp_update_dir):
@@ -1626,25 +1948,28 @@ class DownloaderApp(QWidget):
                         
                         # Copy file
                         shutil.copy2(src_file, dst_file)
-                        self.output_list.addItem(f"📋 Copy: {rel_path}")
+                        self.log_sink.append(f"📋 Copy: {rel_path}")
                 
                 # Xóa thư mục temp
                 shutil.rmtree(temp_update_dir)
-                self.output_list.addItem("🧹 Đã xóa thư mục tạm")
+                self.log_sink.append("🧹 Đã xóa thư mục tạm")
                 
         except Exception as e:
-            self.output_list.addItem(f"⚠️ Lỗi khi copy files: {str(e)}")
+            self.log_sink.append(f"⚠️ Lỗi khi copy files: {str(e)}")
 
     def _reset_ui_after_download(self):
         """Reset UI sau khi download xong hoặc dừng"""
         self.stop_button.setVisible(False)
         self.progress.setVisible(False)
         self.download_button.setEnabled(True)
+        # Lượt tải đã gỡ các link xong khỏi danh sách
+        self.url_list_model.reload()
+        self._update_url_count()
         # self.output_list.setMinimumHeight(120)
 
     def scroll_to_bottom(self):
         """Cuộn xuống cuối danh sách"""
-        self.output_list.scrollToBottom()
+        self.log_sink.scroll_to_bottom()
 
     def apply_styles(self):
         """Áp dụng stylesheet"""
@@ -1687,7 +2012,7 @@ class DownloaderApp(QWidget):
                 background-color: #28a745;
                 border-radius: 4px;
             }
-            QListWidget {
+            QListView {
                 background-color: #2d3748;
                 color: #e2e8f0;
                 border: 2px solid #4a5568;
@@ -1698,16 +2023,16 @@ class DownloaderApp(QWidget):
                 selection-background-color: #4299e1;
                 outline: none;
             }
-            QListWidget::item {
+            QListView::item {
                 padding: 6px 8px;
                 border-bottom: 1px solid #4a5568;
                 min-height: 20px;
                 word-wrap: break-word;
             }
-            QListWidget::item:hover {
+            QListView::item:hover {
                 background-color: #4a5568;
             }
-            QListWidget::item:selected {
+            QListView::item:selected {
                 background-color: #4299e1;
                 color: #ffffff;
             }
@@ -1838,25 +2163,22 @@ class DownloaderApp(QWidget):
             # Lưu đường dẫn đầy đủ vào input field
             self.folder_name_input.setText(folder_path)
             # Tự động lưu ngay khi chọn thư mục
-            self.auto_save_on_change()
+            self.flush_settings()
 
     def save_settings(self):
         """Lưu settings vào registry (với thông báo)"""
         try:
-            # Gọi auto_save_on_change để lưu tất cả
-            self.auto_save_on_change()
-
             # Lưu thêm thông tin thống kê
-            self.settings.setValue("last_saved", datetime.now().isoformat())
+            self.settings_store.set("last_saved", datetime.now().isoformat())
 
             usage_count = self.settings.value("usage_count", 0, int)
-            self.settings.setValue("usage_count", usage_count + 1)
+            self.settings_store.set("usage_count", usage_count + 1)
 
             # Lưu vị trí cửa sổ
-            self.settings.setValue("geometry", self.saveGeometry())
+            self.settings_store.set("geometry", self.saveGeometry())
 
-            # Đồng bộ
-            self.settings.sync()
+            # Ghi ngay tất cả thay đổi đang chờ
+            self.flush_settings()
 
             QMessageBox.information(
                 self, "Thành công", "✅ Đã lưu settings thành công!")
@@ -1927,10 +2249,34 @@ class DownloaderApp(QWidget):
                 self.settings.value("convert_srt", True, bool))
             self.audio_only.setChecked(
                 self.settings.value("audio_only", False, bool))
+            self.keep_original_audio.setChecked(
+                self.settings.value("keep_original_audio", False, bool))
             self.include_thumb.setChecked(
                 self.settings.value("include_thumb", False, bool))
             self.subtitle_only.setChecked(
                 self.settings.value("subtitle_only", False, bool))
+            index = self.format_policy.findData(
+                self.settings.value("format_policy", DEFAULT_FORMAT_POLICY))
+            if index >= 0:
+                self.format_policy.setCurrentIndex(index)
+            self.max_concurrent.setValue(
+                self.settings.value("max_concurrent", DEFAULT_MAX_CONCURRENT, int))
+            self.python_engine.setChecked(
+                self.settings.value("python_engine", False, bool))
+            self.use_archive.setChecked(
+                self.settings.value("use_archive", True, bool))
+            self.link_existing.setChecked(
+                self.settings.value("link_existing", False, bool))
+            self.resolve_metadata.setChecked(
+                self.settings.value("resolve_metadata", False, bool))
+            self.concurrent_fragments.setValue(
+                self.settings.value("concurrent_fragments", 0, int))
+            self.use_aria2c.setChecked(
+                self.settings.value("use_aria2c", False, bool))
+            self.bandwidth_limit.setValue(
+                self.settings.value("bandwidth_limit", 0, int))
+            self.bandwidth_schedule.setText(
+                self.settings.value("bandwidth_schedule", ""))
 
             # Tải vị trí và kích thước cửa sổ
             geometry = self.settings.value("geometry")
@@ -1952,6 +2298,8 @@ class DownloaderApp(QWidget):
         except Exception as e:
             debug_print(f"⚠️ Không thể tải settings: {e}")
         finally:
+            # Giá trị vừa tải đã có trong registry, không cần ghi lại
+            self.settings_store.remember(self._collect_settings())
             self.loading_settings = False  # Bật lại auto-save
             # Kết nối auto-save sau khi load xong
             self._connect_auto_save()
@@ -1967,6 +2315,7 @@ class DownloaderApp(QWidget):
 
         if reply == QMessageBox.StandardButton.Yes:
             self.settings.clear()
+            self.settings_store.forget()
             self.load_default_settings()
             QMessageBox.information(
                 self, "Thành công", "✅ Đã reset settings về mặc định!")
@@ -1988,8 +2337,20 @@ class DownloaderApp(QWidget):
         # Tùy chọn mặc định
         self.convert_srt.setChecked(True)
         self.audio_only.setChecked(False)
+        self.keep_original_audio.setChecked(False)
         self.include_thumb.setChecked(False)
         self.subtitle_only.setChecked(False)
+        self.format_policy.setCurrentIndex(
+            self.format_policy.findData(DEFAULT_FORMAT_POLICY))
+        self.max_concurrent.setValue(DEFAULT_MAX_CONCURRENT)
+        self.python_engine.setChecked(False)
+        self.use_archive.setChecked(True)
+        self.link_existing.setChecked(False)
+        self.resolve_metadata.setChecked(False)
+        self.concurrent_fragments.setValue(0)
+        self.use_aria2c.setChecked(False)
+        self.bandwidth_limit.setValue(0)
+        self.bandwidth_schedule.clear()
 
         # Xóa tên thư mục tùy chọn
         self.folder_name_input.clear()
@@ -2000,42 +2361,52 @@ class DownloaderApp(QWidget):
         if hasattr(self, 'loading_settings') and self.loading_settings:
             return
 
+        # Chỉ hẹn giờ lưu: gõ liên tục hoặc dán nhiều dòng chỉ ghi một lần
+        # sau khi ngừng thay đổi SETTINGS_SAVE_DELAY_MS
+        self.settings_timer.start()
+
+    def _collect_settings(self):
+        """Giá trị hiện tại của các settings trên giao diện"""
+        return {
+            # URL đã nhập
+            "urls": self.url_input.toPlainText().strip(),
+            # Chế độ video và phụ đề
+            "video_mode": self.video_radio.isChecked(),
+            "subtitle_mode": self.sub_mode.currentText(),
+            "selected_language": self._get_selected_language_code(),
+            # Các tùy chọn
+            "convert_srt": self.convert_srt.isChecked(),
+            "audio_only": self.audio_only.isChecked(),
+            "keep_original_audio": self.keep_original_audio.isChecked(),
+            "include_thumb": self.include_thumb.isChecked(),
+            "subtitle_only": self.subtitle_only.isChecked(),
+            "format_policy": self._selected_format_policy(),
+            "max_concurrent": self.max_concurrent.value(),
+            "python_engine": self.python_engine.isChecked(),
+            "use_archive": self.use_archive.isChecked(),
+            "link_existing": self.link_existing.isChecked(),
+            "resolve_metadata": self.resolve_metadata.isChecked(),
+            "concurrent_fragments": self.concurrent_fragments.value(),
+            "use_aria2c": self.use_aria2c.isChecked(),
+            "bandwidth_limit": self.bandwidth_limit.value(),
+            "bandwidth_schedule": self.bandwidth_schedule.text().strip(),
+            # Tên thư mục tùy chọn
+            "custom_folder": self.folder_name_input.toPlainText().strip(),
+        }
+
+    def flush_settings(self):
+        """Ghi các settings đã thay đổi xuống registry"""
+        self.settings_timer.stop()
+        if self.loading_settings:
+            return
         try:
-            # Lưu URL đã nhập
-            urls_text = self.url_input.toPlainText().strip()
-            self.settings.setValue("urls", urls_text)
-
-            # Lưu chế độ video
-            self.settings.setValue("video_mode", self.video_radio.isChecked())
-
-            # Lưu chế độ phụ đề
-            self.settings.setValue(
-                "subtitle_mode", self.sub_mode.currentText())
-
-            # Lưu ngôn ngữ phụ đề đã chọn
-            # Get the current text from the combobox
-            selected_lang_code = self._get_selected_language_code()
-            # Save as a single string
-            self.settings.setValue("selected_language", selected_lang_code)
-
-            # Lưu các tùy chọn
-            self.settings.setValue("convert_srt", self.convert_srt.isChecked())
-            self.settings.setValue("audio_only", self.audio_only.isChecked())
-            self.settings.setValue(
-                "include_thumb", self.include_thumb.isChecked())
-            self.settings.setValue(
-                "subtitle_only", self.subtitle_only.isChecked())
-
-            # Lưu tên thư mục tùy chọn
-            custom_folder = self.folder_name_input.toPlainText().strip()
-            self.settings.setValue("custom_folder", custom_folder)
-
-            # Đồng bộ settings ngay lập tức
-            self.settings.sync()
+            values = self._collect_settings()
+            self.settings_store.update(values)
+            written = self.settings_store.flush()
 
             # Debug log (chỉ khi có thay đổi quan trọng)
-            if custom_folder:
-                debug_print(f"💾 Auto-save: Thư mục = {custom_folder}")
+            if "custom_folder" in written and values["custom_folder"]:
+                debug_print(f"💾 Auto-save: Thư mục = {values['custom_folder']}")
 
         except Exception as e:
             debug_print(f"⚠️ Lỗi auto-save: {e}")
@@ -2051,6 +2422,7 @@ class DownloaderApp(QWidget):
             f"🔗 URLs trong registry: {len(self.settings.value('urls', '').splitlines())} dòng")
         debug_print(
             f"🔗 URLs trong UI: {len(self.url_input.toPlainText().splitlines())} dòng")
+        debug_print(f"📋 Link trong danh sách: {self.url_list_model.total}")
         debug_print(
             f"🎬 Video mode: {self.settings.value('video_mode', 'NONE')}")
         debug_print(
@@ -2107,6 +2479,7 @@ class DownloaderApp(QWidget):
             <tr><td><b>🔢 Số lần sử dụng:</b></td><td>{usage_count}</td></tr>
             <tr><td><b>🕒 Lần lưu cuối:</b></td><td>{last_saved}</td></tr>
             <tr><td><b>🔗 Số URL đã lưu:</b></td><td>{url_count}</td></tr>
+            <tr><td><b>📋 Link trong danh sách:</b></td><td>{self.url_list_model.total}</td></tr>
             <tr><td><b>🌍 Ngôn ngữ đã chọn:</b></td><td>{lang_display}</td></tr>
             <tr><td><b>📁 Thư mục tùy chọn:</b></td><td>{folder_display}</td></tr>
             <tr><td><b>🎬 Chế độ video:</b></td><td>{"Video đơn" if self.video_radio.isChecked() else "Playlist"}</td></tr>
@@ -2117,8 +2490,18 @@ class DownloaderApp(QWidget):
             <ul>
             <li>🔁 Convert SRT: {"✅" if self.convert_srt.isChecked() else "❌"}</li>
             <li>🎵 Audio Only: {"✅" if self.audio_only.isChecked() else "❌"}</li>
+            <li>📦 Keep Original Audio: {"✅" if self.keep_original_audio.isChecked() else "❌"}</li>
             <li>🖼️ Include Thumbnail: {"✅" if self.include_thumb.isChecked() else "❌"}</li>
             <li>📝 Subtitle Only: {"✅" if self.subtitle_only.isChecked() else "❌"}</li>
+            <li>🎞️ Format Policy: {self.format_policy.currentText()}</li>
+            <li>⚡ Max Concurrent: {self.max_concurrent.value()}</li>
+            <li>🐍 Python Engine: {"✅" if self._use_python_engine() else "❌"}</li>
+            <li>⏭️ Download Archive: {"✅" if self.use_archive.isChecked() else "❌"}</li>
+            <li>🔗 Hard-link Existing: {"✅" if self.link_existing.isChecked() else "❌"}</li>
+            <li>📋 Resolve Metadata: {"✅" if self.resolve_metadata.isChecked() else "❌"}</li>
+            <li>🧩 Concurrent Fragments: {self.concurrent_fragments.value() or "Auto"}</li>
+            <li>🚀 aria2c: {"✅" if self._use_aria2c() else "❌"}</li>
+            <li>🌐 Bandwidth Limit: {self.bandwidth_limit.value() or "∞"} MB/s {self.bandwidth_schedule.text()}</li>
             </ul>
             """
 
@@ -2166,35 +2549,41 @@ class DownloaderApp(QWidget):
 
     def check_tool_versions(self):
         """Hiển thị thông tin phiên bản của các công cụ đang sử dụng"""
-        self.output_list.addItem("🔧 === THÔNG TIN PHIÊN BẢN CÔNG CỤ ===")
+        self.log_sink.append("🔧 === THÔNG TIN PHIÊN BẢN CÔNG CỤ ===")
+
+        if not tools_discovered:
+            self.log_sink.append("🔍 Đang kiểm tra công cụ, vui lòng đợi...")
+            self.log_sink.append("🔧 ========================")
+            self.scroll_to_bottom()
+            return
 
         if ytdlp_executable:
-            self.output_list.addItem(f"✅ yt-dlp: {ytdlp_version}")
-            self.output_list.addItem(f"📍 Đường dẫn: {ytdlp_executable}")
+            self.log_sink.append(f"✅ yt-dlp: {ytdlp_version}")
+            self.log_sink.append(f"📍 Đường dẫn: {ytdlp_executable}")
         else:
-            self.output_list.addItem("❌ yt-dlp: Không tìm thấy!")
-            self.output_list.addItem("💡 Hướng dẫn cài đặt:")
-            self.output_list.addItem(
+            self.log_sink.append("❌ yt-dlp: Không tìm thấy!")
+            self.log_sink.append("💡 Hướng dẫn cài đặt:")
+            self.log_sink.append(
                 "   1. Tải yt-dlp.exe từ: https://github.com/yt-dlp/yt-dlp/releases")
-            self.output_list.addItem(
+            self.log_sink.append(
                 "   2. Đặt file yt-dlp.exe vào thư mục chứa App.py")
-            self.output_list.addItem(
+            self.log_sink.append(
                 "   3. Hoặc cài đặt qua pip: pip install yt-dlp")
 
-        if os.path.exists(ffmpeg_path):
-            self.output_list.addItem("✅ ffmpeg: Đã sẵn sàng")
-            self.output_list.addItem(f"📍 Đường dẫn: {ffmpeg_path}")
+        if ffmpeg_version:
+            self.log_sink.append(f"✅ ffmpeg: {ffmpeg_version}")
+            self.log_sink.append(f"📍 Đường dẫn: {ffmpeg_path}")
         else:
-            self.output_list.addItem("⚠️ ffmpeg: Không tìm thấy")
-            self.output_list.addItem("💡 Hướng dẫn cài đặt:")
-            self.output_list.addItem(
+            self.log_sink.append("⚠️ ffmpeg: Không tìm thấy")
+            self.log_sink.append("💡 Hướng dẫn cài đặt:")
+            self.log_sink.append(
                 "   1. Tải FFmpeg từ: https://ffmpeg.org/download.html")
-            self.output_list.addItem(
+            self.log_sink.append(
                 "   2. Giải nén và đặt file ffmpeg.exe vào thư mục chứa App.py")
-            self.output_list.addItem(
+            self.log_sink.append(
                 "   3. Hoặc cài đặt qua pip: pip install ffmpeg-python")
 
-        self.output_list.addItem("🔧 ========================")
+        self.log_sink.append("🔧 ========================")
         self.scroll_to_bottom()
 
     def auto_check_update(self):
@@ -2206,8 +2595,8 @@ class DownloaderApp(QWidget):
             return
 
         # Hiển thị thông báo đang kiểm tra
-        self.output_list.addItem("=" * 50)
-        self.output_list.addItem("🔄 Đang kiểm tra phiên bản mới...")
+        self.log_sink.append("=" * 50)
+        self.log_sink.append("🔄 Đang kiểm tra phiên bản mới...")
         self.scroll_to_bottom()
         
         self._start_update_check(silent=True)  # Thay đổi thành silent=True
@@ -2215,8 +2604,8 @@ class DownloaderApp(QWidget):
     def manual_check_update(self):
         """Kiểm tra update thủ công (có thông báo)"""
         self.is_manual_check = True  # Đánh dấu đây là manual check
-        self.output_list.addItem("=" * 50)
-        self.output_list.addItem("🔄 Đang kiểm tra phiên bản mới...")
+        self.log_sink.append("=" * 50)
+        self.log_sink.append("🔄 Đang kiểm tra phiên bản mới...")
         self.scroll_to_bottom()
         self._start_update_check(silent=False)
 
@@ -2228,7 +2617,11 @@ class DownloaderApp(QWidget):
                     self, "Thông báo", "Đang kiểm tra update, vui lòng đợi...")
             return
 
-        self.update_checker = UpdateChecker()
+        # Kiểm tra tự động chỉ hỏi server sau mỗi "update_check_interval" giây,
+        # kiểm tra thủ công luôn hỏi server
+        interval = self.settings.value(
+            "update_check_interval", UPDATE_CHECK_INTERVAL, int)
+        self.update_checker = UpdateChecker(force=not silent, interval=interval)
         self.update_checker.update_available.connect(
             lambda info: self._on_update_available(info, silent))
         self.update_checker.no_update.connect(
@@ -2245,16 +2638,16 @@ class DownloaderApp(QWidget):
         debug_print(f"🎉 Phiên bản mới có sẵn: v{update_info['version']}")
 
         if not silent:
-            self.output_list.addItem(
+            self.log_sink.append(
                 f"🎉 Phiên bản mới có sẵn: v{update_info['version']}")
             self.scroll_to_bottom()
         else:
             # Khi auto-check và tìm thấy update, hiển thị thông báo đặc biệt
-            self.output_list.addItem("=" * 50)
-            self.output_list.addItem(f"🚨 PHÁT HIỆN PHIÊN BẢN MỚI!")
-            self.output_list.addItem(f"🎉 Phiên bản mới: v{update_info['version']}")
-            self.output_list.addItem(f"📱 Phiên bản hiện tại: v{APP_VERSION}")
-            self.output_list.addItem("🔄 Dialog cập nhật sẽ mở trong giây lát...")
+            self.log_sink.append("=" * 50)
+            self.log_sink.append(f"🚨 PHÁT HIỆN PHIÊN BẢN MỚI!")
+            self.log_sink.append(f"🎉 Phiên bản mới: v{update_info['version']}")
+            self.log_sink.append(f"📱 Phiên bản hiện tại: v{APP_VERSION}")
+            self.log_sink.append("🔄 Dialog cập nhật sẽ mở trong giây lát...")
             self.scroll_to_bottom()
 
         # Hiển thị dialog update
@@ -2266,7 +2659,7 @@ class DownloaderApp(QWidget):
         debug_print("✅ Bạn đang sử dụng phiên bản mới nhất")
 
         if not silent:
-            self.output_list.addItem("✅ Bạn đang sử dụng phiên bản mới nhất")
+            self.log_sink.append("✅ Bạn đang sử dụng phiên bản mới nhất")
             self.scroll_to_bottom()
             if self.is_manual_check:
                 # Chỉ hiển thị MessageBox khi check thủ công, không hiển thị khi auto-check
@@ -2276,7 +2669,7 @@ class DownloaderApp(QWidget):
             self.is_manual_check = False
         else:
             # Khi auto-check, chỉ hiển thị trong log
-            self.output_list.addItem("✅ Phiên bản hiện tại là mới nhất")
+            self.log_sink.append("✅ Phiên bản hiện tại là mới nhất")
             self.scroll_to_bottom()
 
     def _on_update_error(self, error_message, silent):
@@ -2284,29 +2677,33 @@ class DownloaderApp(QWidget):
         debug_print(f"⚠️ Lỗi kiểm tra update: {error_message}")
 
         if not silent:
-            self.output_list.addItem(
+            self.log_sink.append(
                 f"⚠️ Lỗi kiểm tra update: {error_message}")
             self.scroll_to_bottom()
             QMessageBox.warning(
                 self, "Lỗi", f"⚠️ Không thể kiểm tra update:\n{error_message}")
         else:
             # Khi auto-check gặp lỗi, chỉ hiển thị trong log (không popup)
-            self.output_list.addItem(f"⚠️ Không thể kiểm tra cập nhật: {error_message}")
-            self.output_list.addItem("💡 Bạn có thể kiểm tra thủ công qua menu Help > Check for Updates")
+            self.log_sink.append(f"⚠️ Không thể kiểm tra cập nhật: {error_message}")
+            self.log_sink.append("💡 Bạn có thể kiểm tra thủ công qua menu Help > Check for Updates")
             self.scroll_to_bottom()
 
     def closeEvent(self, event):
         """Xử lý khi đóng ứng dụng - tự động lưu settings"""
         try:
-            # Lưu settings không hiển thị thông báo
-            self.auto_save_on_change()
-
             # Lưu vị trí cửa sổ cuối cùng
-            self.settings.setValue("geometry", self.saveGeometry())
+            self.settings_store.set("geometry", self.saveGeometry())
 
             # Cập nhật thời gian đóng ứng dụng
-            from datetime import datetime
-            self.settings.setValue("last_closed", datetime.now().isoformat())
+            self.settings_store.set("last_closed", datetime.now().isoformat())
+
+            # Ghi mọi thay đổi đang chờ (kể cả khi timer chưa hết giờ)
+            self.flush_settings()
+
+            # Giải phóng các instance YoutubeDL đang giữ
+            if self.ytdlp_engine:
+                self.ytdlp_engine.close()
+            self.url_store.close()
 
         except Exception as e:
             debug_print(f"⚠️ Lỗi khi lưu settings: {e}")
@@ -2316,19 +2713,18 @@ class DownloaderApp(QWidget):
         """Kiểm tra xem có file zip update nào không"""
         try:
             current_dir = os.getcwd()
-            update_zip_pattern = "update_v*.zip"
-            update_zips = glob.glob(update_zip_pattern)
+            update_zips = glob.glob(UPDATE_ZIP_PATTERN)
             
             if update_zips:
-                self.output_list.addItem("=" * 50)
-                self.output_list.addItem("📦 PHÁT HIỆN FILE CẬP NHẬT!")
-                self.output_list.addItem(f"📦 Tìm thấy {len(update_zips)} file zip cập nhật:")
+                self.log_sink.append("=" * 50)
+                self.log_sink.append("📦 PHÁT HIỆN FILE CẬP NHẬT!")
+                self.log_sink.append(f"📦 Tìm thấy {len(update_zips)} file zip cập nhật:")
                 
                 for zip_file in update_zips:
-                    self.output_list.addItem(f"📦 - {zip_file}")
+                    self.log_sink.append(f"📦 - {zip_file}")
                 
-                self.output_list.addItem("🔄 Đang tự động giải nén...")
-                self.output_list.addItem("=" * 50)
+                self.log_sink.append("🔄 Đang tự động giải nén...")
+                self.log_sink.append("=" * 50)
                 
                 # Tự động giải nén ngay lập tức
                 self._extract_update_files_immediately()
@@ -2340,75 +2736,45 @@ class DownloaderApp(QWidget):
         """Giải nén file update ngay lập tức khi khởi động"""
         try:
             current_dir = os.getcwd()
-            update_zip_pattern = "update_v*.zip"
-            update_zips = glob.glob(update_zip_pattern)
-            
+            update_zips = glob.glob(UPDATE_ZIP_PATTERN)
+
+            removed = remove_old_files(current_dir)
+            if removed:
+                self.log_sink.append(f"🧹 Đã xóa {removed} file cũ của lần cập nhật trước")
+
             for zip_file in update_zips:
                 try:
-                    self.output_list.addItem(f"📦 Đang giải nén: {zip_file}")
-                    
-                    # Giải nén vào thư mục tạm
-                    extract_dir = os.path.join(current_dir, "temp_extract")
-                    if os.path.exists(extract_dir):
-                        shutil.rmtree(extract_dir)
-                    os.makedirs(extract_dir)
-                    
-                    with zipfile.ZipFile(zip_file, 'r') as zip_ref:
-                        file_list = zip_ref.namelist()
-                        total_files = len(file_list)
-                        
-                        self.output_list.addItem(f"📦 Tổng số files trong zip: {total_files}")
-                        
-                        for i, file_name in enumerate(file_list):
-                            zip_ref.extract(file_name, extract_dir)
-                            self.output_list.addItem(f"📦 Giải nén: {file_name}")
-                    
-                    # Copy files từ thư mục giải nén về thư mục chính
-                    copied_count = 0
-                    for root, dirs, files in os.walk(extract_dir):
-                        for file in files:
-                            src_file = os.path.join(root, file)
-                            rel_path = os.path.relpath(src_file, extract_dir)
-                            dst_file = os.path.join(current_dir, rel_path)
-                            
-                            # Tạo thư mục đích nếu chưa có
-                            dst_dir = os.path.dirname(dst_file)
-                            if dst_dir and not os.path.exists(dst_dir):
-                                os.makedirs(dst_dir)
-                            
-                            # Copy file
-                            shutil.copy2(src_file, dst_file)
-                            copied_count += 1
-                            self.output_list.addItem(f"📋 Copy: {rel_path}")
-                    
-                    # Dọn dẹp
-                    shutil.rmtree(extract_dir)
+                    self.log_sink.append(f"📦 Đang giải nén: {zip_file}")
+
+                    # Ghi thẳng từng file trong zip vào chỗ, bỏ qua file không đổi
+                    result = install_zip(zip_file, current_dir)
+
                     os.remove(zip_file)
-                    self.output_list.addItem(f"🧹 Đã xóa file zip và thư mục tạm")
-                    self.output_list.addItem(f"✅ Đã giải nén và copy {copied_count} files từ {zip_file}")
-                    
+                    self.log_sink.append(f"🧹 Đã xóa file zip")
+                    self.log_sink.append(result.describe())
+
                     # Lưu thông tin phiên bản từ tên file zip
                     try:
                         version_from_filename = zip_file.replace("update_v", "").replace(".zip", "")
                         version_file = os.path.join(current_dir, "version.txt")
                         with open(version_file, 'w', encoding='utf-8') as f:
                             f.write(version_from_filename)
-                        self.output_list.addItem(f"💾 Đã lưu phiên bản mới: {version_from_filename}")
+                        self.log_sink.append(f"💾 Đã lưu phiên bản mới: {version_from_filename}")
                     except Exception as e:
-                        self.output_list.addItem(f"⚠️ Không thể lưu phiên bản: {e}")
-                    
+                        self.log_sink.append(f"⚠️ Không thể lưu phiên bản: {e}")
+
                 except Exception as e:
-                    self.output_list.addItem(f"⚠️ Lỗi khi giải nén {zip_file}: {str(e)}")
+                    self.log_sink.append(f"⚠️ Lỗi khi giải nén {zip_file}: {str(e)}")
                     # Thử xóa file zip lỗi
                     try:
                         if os.path.exists(zip_file):
                             os.remove(zip_file)
-                            self.output_list.addItem(f"🗑️ Đã xóa file zip lỗi: {zip_file}")
+                            self.log_sink.append(f"🗑️ Đã xóa file zip lỗi: {zip_file}")
                     except:
                         pass
-                        
+
         except Exception as e:
-            self.output_list.addItem(f"⚠️ Lỗi khi giải nén files: {str(e)}")
+            self.log_sink.append(f"⚠️ Lỗi khi giải nén files: {str(e)}")
 
     def _run_extract_batch_after_close(self):
         """Chạy file batch để giải nén sau khi tắt app"""
@@ -2418,7 +2784,7 @@ class DownloaderApp(QWidget):
             
             if os.path.exists(batch_file):
                 # Thông báo sẽ chạy batch file
-                self.output_list.addItem("📦 Sẽ chạy script giải nén tự động sau khi tắt ứng dụng...")
+                self.log_sink.append("📦 Sẽ chạy script giải nén tự động sau khi tắt ứng dụng...")
                 self.scroll_to_bottom()
                 
                 # Chạy file batch trong background
@@ -2430,16 +2796,16 @@ class DownloaderApp(QWidget):
                                    stdout=subprocess.DEVNULL, 
                                    stderr=subprocess.DEVNULL)
                 
-                self.output_list.addItem("✅ Đã khởi chạy script giải nén tự động...")
-                self.output_list.addItem("🔄 Script sẽ giải nén file zip và khởi động lại ứng dụng")
+                self.log_sink.append("✅ Đã khởi chạy script giải nén tự động...")
+                self.log_sink.append("🔄 Script sẽ giải nén file zip và khởi động lại ứng dụng")
                 self.scroll_to_bottom()
             else:
-                self.output_list.addItem("⚠️ Không tìm thấy file auto_extract_after_close.bat")
-                self.output_list.addItem("💡 Vui lòng chạy extract_update.bat thủ công")
+                self.log_sink.append("⚠️ Không tìm thấy file auto_extract_after_close.bat")
+                self.log_sink.append("💡 Vui lòng chạy extract_update.bat thủ công")
                 self.scroll_to_bottom()
                 
         except Exception as e:
-            self.output_list.addItem(f"⚠️ Lỗi khi chạy script giải nén: {str(e)}")
+            self.log_sink.append(f"⚠️ Lỗi khi chạy script giải nén: {str(e)}")
             self.scroll_to_bottom()
 
 
@@ -2447,4 +2813,6 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
     win = DownloaderApp()
     win.show()
+    # Đo thời gian khởi động khi vòng lặp sự kiện bắt đầu chạy
+    QTimer.singleShot(0, win.report_startup_time)
     sys.exit(app.exec())
@@ -16,7 +16,11 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt, QThread, Signal, QSettings, QTimer
 from PySide6.QtGui import QScreen, QAction, QIcon
 import shutil
-import zipfile
+
+from update_core import (
+    CHECK_NOT_MODIFIED, InstallStopped, UPDATE_CONNECTIONS, UpdateCheckError, check_update_info,
+    download_file, install_delta, install_zip
+)
 
 os.system("taskkill /f /im DownloadVID.exe")
 # Thiết lập logging
@@ -103,51 +107,55 @@ class UpdateChecker(QThread):
             debug_print("🔍 Đang kiểm tra phiên bản mới...")
             self.progress_update.emit(30, "🔄 Đang kiểm tra...")
 
-            # Gửi request để lấy thông tin release mới nhất
-            response = requests.get(UPDATE_CHECK_URL, timeout=10)
+            # Trình cập nhật được mở để cập nhật nên luôn hỏi server, nhưng gửi
+            # kèm ETag/Last-Modified đã lưu: 304 thì dùng update.json đã lưu
+            release_data, source = check_update_info(UPDATE_CHECK_URL, force=True)
+            if source == CHECK_NOT_MODIFIED:
+                debug_print("📦 update.json không đổi (304)")
             self.progress_update.emit(60, "📥 Đang xử lý response...")
 
-            if response.status_code == 200:
-                release_data = response.json()
-                latest_version = release_data.get(
-                    'tag_name', '').replace('v', '')
-                release_name = release_data.get('name', '')
-                release_notes = release_data.get('body', '')
-                # Lấy download URL từ JSON response
-                download_url = release_data.get('download_url', '')
+            latest_version = release_data.get(
+                'tag_name', '').replace('v', '')
+            release_name = release_data.get('name', '')
+            release_notes = release_data.get('body', '')
+            # Lấy download URL từ JSON response
+            download_url = release_data.get('download_url', '')
+            if not download_url:
+                # Fallback nếu không có download_url, có thể thử các key khác
+                download_url = release_data.get('html_url', '')
                 if not download_url:
-                    # Fallback nếu không có download_url, có thể thử các key khác
-                    download_url = release_data.get('html_url', '')
-                    if not download_url:
-                        download_url = release_data.get('zipball_url', '')
-                
-                # Kiểm tra tính hợp lệ của download URL
-                if not download_url or not download_url.startswith(('http://', 'https://')):
-                    self.error_occurred.emit("Không tìm thấy URL download hợp lệ trong response")
-                    return
-                
-                published_at = release_data.get('published_at', '')
-                debug_print(f"📥 Download URL từ JSON: {download_url}")
-                self.progress_update.emit(80, "🔍 Đang so sánh phiên bản...")
-                
-                # So sánh phiên bản
-                if self._is_newer_version(latest_version, APP_VERSION):
-                    update_info = {
-                        'version': latest_version,
-                        'name': release_name,
-                        'notes': release_notes,
-                        'download_url': download_url,
-                        'published_at': published_at
-                    }
-                    self.progress_update.emit(100, "🎉 Tìm thấy phiên bản mới!")
-                    self.update_available.emit(update_info)
-                else:
-                    self.progress_update.emit(100, "✅ Phiên bản hiện tại là mới nhất")
-                    self.no_update.emit()
+                    download_url = release_data.get('zipball_url', '')
+            
+            # Kiểm tra tính hợp lệ của download URL
+            if not download_url or not download_url.startswith(('http://', 'https://')):
+                self.error_occurred.emit("Không tìm thấy URL download hợp lệ trong response")
+                return
+            
+            published_at = release_data.get('published_at', '')
+            # Manifest từng file để chỉ tải file thay đổi (không bắt buộc)
+            manifest_url = release_data.get('manifest_url', '')
+            debug_print(f"📥 Download URL từ JSON: {download_url}")
+            self.progress_update.emit(80, "🔍 Đang so sánh phiên bản...")
+            
+            # So sánh phiên bản
+            if self._is_newer_version(latest_version, APP_VERSION):
+                update_info = {
+                    'version': latest_version,
+                    'name': release_name,
+                    'notes': release_notes,
+                    'download_url': download_url,
+                    'manifest_url': manifest_url,
+                    'sha256': release_data.get('sha256'),
+                    'published_at': published_at
+                }
+                self.progress_update.emit(100, "🎉 Tìm thấy phiên bản mới!")
+                self.update_available.emit(update_info)
             else:
-                self.error_occurred.emit(
-                    f"HTTP {response.status_code}: Không thể kết nối đến server")
+                self.progress_update.emit(100, "✅ Phiên bản hiện tại là mới nhất")
+                self.no_update.emit()
 
+        except UpdateCheckError as e:
+            self.error_occurred.emit(str(e))
         except requests.exceptions.Timeout:
             self.error_occurred.emit(
                 "Timeout: Không thể kết nối đến server trong thời gian quy định")
@@ -185,18 +193,30 @@ class DownloadUpdateWorker(QThread):
     message_signal = Signal(str)
     finished_signal = Signal(bool, str)  # success, message
 
-    def __init__(self, download_url, version):
+    def __init__(self, download_url, version, manifest_url=None, sha256=None):
         super().__init__()
         self.download_url = download_url
         self.version = version
+        # SHA-256 của file zip trong update.json, None = không kiểm tra
+        self.sha256 = sha256
+        # Có manifest thì chỉ tải các file đã thay đổi, lỗi thì tải cả file zip
+        self.manifest_url = manifest_url
         self.stop_flag = False
 
     def run(self):
         """Thực hiện download và extract"""
         try:
+            if self.manifest_url and self._install_delta():
+                self.message_signal.emit("✅ Cập nhật hoàn tất!")
+                self.progress_signal.emit(100)
+                self.finished_signal.emit(
+                    True, f"Cập nhật thành công! Ứng dụng sẽ khởi động lại.")
+                return
+            if self.stop_flag:
+                return
+
             # Tạo tên file
             output_file = f"update_v{self.version}.zip"
-            extract_to = "temp_update"
 
             # Bước 1: Download file
             self.message_signal.emit("⬇️ Đang tải file cập nhật...")
@@ -204,16 +224,16 @@ class DownloadUpdateWorker(QThread):
                 return
 
             if self.stop_flag:
-                self._cleanup(output_file, extract_to)
+                self._cleanup(output_file)
                 return
 
             # Bước 2: Giải nén file
             self.message_signal.emit("📦 Đang giải nén file...")
-            if not self._extract_and_install(output_file, extract_to):
+            if not self._extract_and_install(output_file):
                 return
 
             if self.stop_flag:
-                self._cleanup(output_file, extract_to)
+                self._cleanup(output_file)
                 return
 
             # Bước 3: Hoàn thành
@@ -225,135 +245,108 @@ class DownloadUpdateWorker(QThread):
         except Exception as e:
             self.finished_signal.emit(False, f"Lỗi cập nhật: {str(e)}")
 
-    def _download_with_progress(self, url, output_file):
-        """Tải file với thanh tiến trình"""
+    def _install_delta(self):
+        """Chỉ tải các file khác với manifest (update_core.install_delta)"""
+        reported = [-1]
+
+        def on_progress(done, total):
+            percent = int(done * 100 / total) if total else 100
+            if percent != reported[0]:
+                reported[0] = percent
+                self.progress_signal.emit(percent)
+                self.message_signal.emit(
+                    f"⬇️ Đang tải: {done / (1024 * 1024):.1f}/{total / (1024 * 1024):.1f} MB "
+                    f"({percent}%)")
+
         try:
-            response = requests.get(url, stream=True, timeout=30)
-            response.raise_for_status()
-
-            total_size = int(response.headers.get('content-length', 0))
-            total_mb = total_size / (1024 * 1024)
-
-            downloaded = 0
-            chunk_size = 1024 * 1024  # 1MB
-
-            with open(output_file, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=chunk_size):
-                    if self.stop_flag:
-                        f.close()
-                        self.message_signal.emit("⏹ Đã dừng tải")
-                        return False
-
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        downloaded_mb = downloaded / (1024 * 1024)
-
-                        if total_mb > 0:
-                            percent = int((downloaded_mb / total_mb) * 50)  # 50% cho download
-                            self.progress_signal.emit(percent)
-                            self.message_signal.emit(
-                                f"⬇️ Đang tải: {downloaded_mb:.1f}/{total_mb:.1f} MB ({percent}%)")
-                        else:
-                            self.message_signal.emit(
-                                f"⬇️ Đã tải: {downloaded_mb:.1f} MB")
+            self.message_signal.emit("🔍 Đang so sánh file với bản mới...")
+            result = install_delta(self.manifest_url, os.getcwd(), on_progress=on_progress,
+                                   should_stop=lambda: self.stop_flag)
+            self.message_signal.emit(result.describe())
+            return True
+        except InstallStopped:
+            self.message_signal.emit("⏹ Đã dừng tải")
+            return False
+        except Exception as e:
+            self.message_signal.emit(f"⚠️ Không cập nhật từng file được ({e}), tải cả gói...")
+            return False
+
+    def _download_with_progress(self, url, output_file):
+        """
+        Tải file với thanh tiến trình (update_core.download_file): tải tiếp
+        file .part của lần trước, kiểm tra SHA-256 trước khi thành file zip
+        """
+        reported = [-1]
+
+        def on_progress(done, total):
+            done_mb = done / (1024 * 1024)
+            if total:
+                percent = int(done * 50 / total)  # 50% cho download
+                if percent == reported[0]:
+                    return
+                reported[0] = percent
+                self.progress_signal.emit(percent)
+                self.message_signal.emit(
+                    f"⬇️ Đang tải: {done_mb:.1f}/{total / (1024 * 1024):.1f} MB ({percent}%)")
+            elif int(done_mb) != reported[0]:
+                reported[0] = int(done_mb)
+                self.message_signal.emit(f"⬇️ Đã tải: {done_mb:.1f} MB")
 
+        try:
+            download_file(url, output_file, sha256=self.sha256, on_progress=on_progress,
+                          connections=UPDATE_CONNECTIONS,
+                          should_stop=lambda: self.stop_flag)
             self.message_signal.emit("✅ Tải xuống hoàn tất!")
             return True
 
+        except InstallStopped:
+            # Giữ file .part để tải tiếp ở lần sau
+            self.message_signal.emit("⏹ Đã dừng tải")
+            return False
         except Exception as e:
             self.message_signal.emit(f"❌ Lỗi tải xuống: {str(e)}")
             return False
 
-    def _extract_and_install(self, zip_file, extract_to):
-        """Giải nén và cài đặt cập nhật"""
+    def _extract_and_install(self, zip_file):
+        """Cài các file trong zip vào thư mục ứng dụng (update_core.install_zip)"""
+        reported = [-1]
+
+        def on_progress(done, total):
+            # 50% cho cài đặt (từ 50% đến 100%)
+            percent = 50 + (int(done * 50 / total) if total else 50)
+            if percent != reported[0]:
+                reported[0] = percent
+                self.progress_signal.emit(percent)
+
         try:
-            # Xóa thư mục tạm cũ nếu có
-            if os.path.exists(extract_to):
-                shutil.rmtree(extract_to)
-            os.makedirs(extract_to)
-
-            # Giải nén
-            with zipfile.ZipFile(zip_file, 'r') as zip_ref:
-                file_list = zip_ref.namelist()
-                total_files = len(file_list)
-
-                for i, file_name in enumerate(file_list):
-                    if self.stop_flag:
-                        # Xóa thư mục extract và file zip
-                        self._cleanup(zip_file, extract_to)
-                        return False
-
-                    zip_ref.extract(file_name, extract_to)
-                    # 50% cho extract (từ 50% đến 100%)
-                    percent = 50 + int((i + 1) / total_files * 50)
-                    self.progress_signal.emit(percent)
-                    self.message_signal.emit(f"📦 Giải nén: {file_name}")
-
-            # Copy files
-            self.message_signal.emit("📋 Đang cập nhật files...")
-            current_dir = os.getcwd()
-
-            copied_files = []
-            for root, dirs, files in os.walk(extract_to):
-                for file in files:
-                    if self.stop_flag:
-                        # Xóa thư mục extract và file zip
-                        self._cleanup(zip_file, extract_to)
-                        return False
-
-                    src_file = os.path.join(root, file)
-                    rel_path = os.path.relpath(src_file, extract_to)
-                    dst_file = os.path.join(current_dir, rel_path)
-
-                    # Tạo thư mục đích nếu chưa có
-                    dst_dir = os.path.dirname(dst_file)
-                    if dst_dir and not os.path.exists(dst_dir):
-                        os.makedirs(dst_dir)
-
-                    # Copy file
-                    shutil.copy2(src_file, dst_file)
-                    copied_files.append(rel_path)
-                    self.message_signal.emit(f"📋 Cập nhật: {rel_path}")
-
-            # Lưu phiên bản mới vào file
-            # try:
-            #     version_file = os.path.join(current_dir, "version.txt")
-            #     with open(version_file, 'w', encoding='utf-8') as f:
-            #         f.write(self.version)
-            #     self.message_signal.emit(
-            #         f"💾 Đã lưu phiên bản mới: {self.version}")
-            # except Exception as e:
-            #     self.message_signal.emit(f"⚠️ Không thể lưu phiên bản: {e}")
-
-            # Dọn dẹp - xóa file zip và thư mục extract
+            result = install_zip(zip_file, os.getcwd(), on_progress=on_progress,
+                                 should_stop=lambda: self.stop_flag)
+
+            # Dọn dẹp - xóa file zip
             self.message_signal.emit("🧹 Đang dọn dẹp...")
-            self._cleanup(zip_file, extract_to)
+            self._cleanup(zip_file)
 
             self.progress_signal.emit(100)
-            self.message_signal.emit(
-                f"✅ Đã cập nhật {len(copied_files)} files")
+            self.message_signal.emit(result.describe())
             self.message_signal.emit("🎉 Cập nhật hoàn tất! Ứng dụng sẽ khởi động lại...")
             return True
 
+        except InstallStopped:
+            self._cleanup(zip_file)
+            return False
         except Exception as e:
             self.message_signal.emit(f"❌ Lỗi giải nén: {str(e)}")
-            # Xóa file zip và thư mục extract khi có lỗi
-            self._cleanup(zip_file, extract_to)
+            # Xóa file zip khi có lỗi
+            self._cleanup(zip_file)
             return False
 
-    def _cleanup(self, zip_file, extract_to):
+    def _cleanup(self, zip_file):
         """Dọn dẹp files tạm"""
         try:
             # Xóa file zip
             if os.path.exists(zip_file):
                 os.remove(zip_file)
                 self.message_signal.emit(f"🗑️ Đã xóa file: {os.path.basename(zip_file)}")
-            
-            # Xóa thư mục extract
-            if os.path.exists(extract_to):
-                shutil.rmtree(extract_to)
-                self.message_signal.emit("🗑️ Đã xóa thư mục tạm")
         except Exception as e:
             self.message_signal.emit(f"⚠️ Lỗi khi dọn dẹp: {e}")
 
@@ -826,7 +819,8 @@ class DownloaderApp(QWidget):
         
         # Tạo và chạy download worker
         self.download_worker = DownloadUpdateWorker(
-            update_info['download_url'], update_info['version'])
+            update_info['download_url'], update_info['version'],
+            manifest_url=update_info.get('manifest_url'), sha256=update_info.get('sha256'))
         self.download_worker.progress_signal.connect(self.update_download_progress)
         self.download_worker.message_signal.connect(self.add_download_log)
         self.download_worker.finished_signal.connect(self.on_download_finished)
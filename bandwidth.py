@@ -0,0 +1,160 @@
+"""
+Giới hạn băng thông chung cho mọi link đang tải.
+
+yt-dlp chỉ có --limit-rate cho từng tiến trình, nên khi tải song song N link
+tổng băng thông là N lần giới hạn. BandwidthBudget giữ một mức trần chung
+(có thể đổi theo khung giờ) và chia cho các job đang chạy:
+
+- Job chạy bằng engine trong tiến trình (ytdlp_engine) được chia lại mỗi
+  khi có job bắt đầu/kết thúc hoặc đổi khung giờ: rate_for() được hỏi ở mỗi
+  lần progress hook và ghi thẳng vào params["ratelimit"] của YoutubeDL.
+- Job chạy yt-dlp.exe nhận --limit-rate cố định lúc khởi động: phần chia
+  đều theo số job sẽ chạy cùng lúc, không quá phần còn lại sau khi trừ các
+  job đang chạy. Tổng không vượt mức trần; phần của job đã xong được chia
+  cho các job khởi động sau.
+
+Module không phụ thuộc Qt.
+"""
+
+import re
+import threading
+from datetime import datetime
+
+
+# Không chia nhỏ hơn mức này cho một job (yt-dlp gần như đứng yên)
+MIN_JOB_RATE = 64 * 1024
+
+_RATE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmg]?)i?b?\s*$", re.IGNORECASE)
+_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+_WINDOW_RE = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*=\s*(.+)$")
+
+
+def parse_rate(text):
+    """
+    Tốc độ dạng "20M", "500K", "1.5MiB" (đơn vị 1024 giống --limit-rate của
+    yt-dlp) thành byte/giây; "", "0" = không giới hạn (0).
+    """
+    if text is None:
+        return 0
+    if isinstance(text, (int, float)):
+        return max(0, int(text))
+    text = str(text).strip()
+    if not text:
+        return 0
+    match = _RATE_RE.match(text)
+    if not match:
+        raise ValueError(f"Tốc độ không hợp lệ: {text!r}")
+    return int(float(match.group(1)) * _UNITS[match.group(2).lower()])
+
+
+def format_rate(rate):
+    """Định dạng byte/giây để hiển thị, "không giới hạn" khi rate = 0"""
+    if not rate:
+        return "không giới hạn"
+    for unit, size in (("GiB", 1024 ** 3), ("MiB", 1024 ** 2), ("KiB", 1024)):
+        if rate >= size:
+            return f"{rate / size:.1f}{unit}/s"
+    return f"{int(rate)}B/s"
+
+
+def parse_schedule(text):
+    """
+    Khung giờ dạng "08:00-18:00=5M, 22:00-06:00=0" thành danh sách
+    (phút bắt đầu, phút kết thúc, byte/giây). Khung qua nửa đêm được phép.
+    """
+    windows = []
+    for part in re.split(r"[,;\n]", text or ""):
+        if not part.strip():
+            continue
+        match = _WINDOW_RE.match(part)
+        if not match:
+            raise ValueError(f"Khung giờ không hợp lệ: {part.strip()!r} (vd. 08:00-18:00=5M)")
+        h1, m1, h2, m2 = (int(match.group(i)) for i in range(1, 5))
+        if h1 > 23 or h2 > 24 or m1 > 59 or m2 > 59:
+            raise ValueError(f"Giờ không hợp lệ: {part.strip()!r}")
+        windows.append((h1 * 60 + m1, h2 * 60 + m2, parse_rate(match.group(5))))
+    return windows
+
+
+class BandwidthBudget:
+    """Mức trần băng thông chung, chia cho các job đang tải"""
+
+    def __init__(self, limit=0, schedule=None, clock=datetime.now):
+        """
+        limit: byte/giây ngoài các khung giờ (0 = không giới hạn).
+        schedule: danh sách khung giờ của parse_schedule(), khung đầu tiên
+        chứa giờ hiện tại được dùng.
+        """
+        self.limit = max(0, int(limit or 0))
+        self.schedule = list(schedule or [])
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._fixed = {}  # key -> --limit-rate đã cấp cho tiến trình yt-dlp
+        self._adjustable = set()  # key của job chia lại được trong khi tải
+
+    @property
+    def enabled(self):
+        return bool(self.limit) or bool(self.schedule)
+
+    def current_limit(self):
+        """Mức trần của khung giờ hiện tại (0 = không giới hạn)"""
+        now = self._clock()
+        minute = now.hour * 60 + now.minute
+        for start, end, rate in self.schedule:
+            if start <= end:
+                inside = start <= minute < end
+            else:
+                inside = minute >= start or minute < end
+            if inside:
+                return rate
+        return self.limit
+
+    def start(self, key, adjustable=False, concurrency=1):
+        """
+        Đăng ký job bắt đầu tải. Trả về --limit-rate cho job chạy tiến trình
+        riêng (adjustable=False), None nếu không giới hạn. concurrency là số
+        job dự kiến chạy cùng lúc (kể cả job này) để chia đều ngay từ đầu.
+        """
+        with self._lock:
+            if adjustable:
+                self._adjustable.add(key)
+                return self._adjustable_rate()
+            limit = self.current_limit()
+            if not limit:
+                self._fixed[key] = 0
+                return None
+            count = max(concurrency, len(self._fixed) + len(self._adjustable) + 1)
+            available = limit - sum(self._fixed.values())
+            rate = max(MIN_JOB_RATE, min(limit // count, available))
+            self._fixed[key] = rate
+            return rate
+
+    def finish(self, key):
+        """Job đã tải xong, phần băng thông của nó được chia lại"""
+        with self._lock:
+            self._fixed.pop(key, None)
+            self._adjustable.discard(key)
+
+    def rate_for(self, key):
+        """Giới hạn hiện tại của job (byte/giây), None nếu không giới hạn"""
+        with self._lock:
+            if key in self._fixed:
+                return self._fixed[key] or None
+            return self._adjustable_rate()
+
+    def _adjustable_rate(self):
+        limit = self.current_limit()
+        if not limit or not self._adjustable:
+            return None
+        available = limit - sum(self._fixed.values())
+        return max(MIN_JOB_RATE, available // len(self._adjustable))
+
+    def describe(self):
+        """Một dòng mô tả cho log"""
+        text = f"🌐 Giới hạn băng thông chung: {format_rate(self.current_limit())}"
+        if self.schedule:
+            windows = ", ".join(
+                f"{s // 60:02d}:{s % 60:02d}-{e // 60:02d}:{e % 60:02d}={format_rate(r)}"
+                for s, e, r in self.schedule)
+            text += f" (khung giờ: {windows}; ngoài khung: {format_rate(self.limit)})"
+        return text
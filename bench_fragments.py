@@ -0,0 +1,108 @@
+"""
+Benchmark tải nhiều fragment song song với máy chủ cục bộ (bench_server).
+
+Tải cùng một video HLS với --concurrent-fragments 1, 2, 4, 8... (qua thư
+viện yt_dlp, giống engine trong ứng dụng), in thời gian và tốc độ so với
+tải tuần tự. Nếu có aria2c thì đo thêm tải file HTTP bằng nhiều kết nối.
+Cuối cùng cho FragmentTuner "tải" lần lượt nhiều video theo số liệu vừa đo
+để xem nó chọn mức nào.
+
+    python bench_fragments.py --size 16 --rate 1024 --levels 1,2,4,8
+    python bench_fragments.py --total-rate 4096   # máy chủ giới hạn tổng 4 MiB/s
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+
+from bench_server import BenchServer
+from fragment_tuner import FragmentTuner
+
+
+def _download(url, options):
+    """Tải url vào thư mục tạm, trả về số giây"""
+    import yt_dlp
+
+    tmp_dir = tempfile.mkdtemp(prefix="bench_frag_")
+    try:
+        ydl_opts = {
+            "outtmpl": f"{tmp_dir}/%(id)s.%(ext)s",
+            "quiet": True,
+            "noprogress": True,
+            "no_warnings": True,
+            "fixup": "never",
+            "cachedir": False,
+        }
+        ydl_opts.update(options)
+        started = time.perf_counter()
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            if ydl.download([url]) != 0:
+                raise RuntimeError(f"Tải lỗi: {url}")
+        return time.perf_counter() - started
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark --concurrent-fragments")
+    parser.add_argument("--size", type=int, default=16, help="Dung lượng video (MiB)")
+    parser.add_argument("--segments", type=int, default=64, help="Số fragment HLS")
+    parser.add_argument("--rate", type=int, default=1024, help="KiB/s mỗi kết nối")
+    parser.add_argument("--total-rate", type=int, default=0,
+                        help="KiB/s tổng của máy chủ (0 = không giới hạn)")
+    parser.add_argument("--levels", default="1,2,4,8",
+                        help="Các mức fragment song song cần đo")
+    parser.add_argument("--aria2c", default=shutil.which("aria2c"),
+                        help="Đường dẫn aria2c (mặc định: tìm trong PATH)")
+    args = parser.parse_args()
+
+    levels = [int(n) for n in args.levels.split(",")]
+    size = args.size * 1024 * 1024
+    server = BenchServer(rate=args.rate * 1024, total_rate=args.total_rate * 1024 or None,
+                         file_size=size, segments=args.segments).start()
+    print(f"Máy chủ: {args.rate} KiB/s mỗi kết nối"
+          f"{f', tổng {args.total_rate} KiB/s' if args.total_rate else ''}, "
+          f"video {args.size} MiB / {args.segments} fragment")
+
+    results = {}
+    try:
+        print(f"\n{'Cách tải':<26}{'Thời gian':>10}{'Tốc độ':>14}{'So với 1':>10}")
+        for n in levels:
+            seconds = _download(server.url("/stream.m3u8"),
+                                {"concurrent_fragment_downloads": n})
+            results[n] = seconds
+            speed = size / seconds / 1024 / 1024
+            print(f"{f'HLS, {n} fragment':<26}{seconds:>9.2f}s{speed:>9.2f} MiB/s"
+                  f"{results[levels[0]] / seconds:>9.2f}x")
+
+        if args.aria2c:
+            for n in levels:
+                seconds = _download(server.url("/video.mp4"), {
+                    "external_downloader": {"http": args.aria2c},
+                    "external_downloader_args": {"aria2c": ["-x", str(n), "-s", str(n), "-k", "1M"]},
+                })
+                speed = size / seconds / 1024 / 1024
+                print(f"{f'aria2c, {n} kết nối':<26}{seconds:>9.2f}s{speed:>9.2f} MiB/s")
+        else:
+            print("(Không có aria2c, bỏ qua phần tải file HTTP nhiều kết nối)")
+    finally:
+        server.stop()
+
+    # Cho tuner chọn mức qua nhiều video liên tiếp, dùng thời gian vừa đo
+    tuner = FragmentTuner(initial=levels[0], max_fragments=max(levels))
+    chosen = []
+    for _ in range(8):
+        n = tuner.suggest()
+        chosen.append(n)
+        seconds = results.get(n)
+        if seconds is None:
+            break
+        tuner.record(n, size, seconds)
+    print(f"\nFragmentTuner chọn lần lượt: {' → '.join(map(str, chosen))}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Máy chủ HTTP cục bộ giới hạn tốc độ mỗi kết nối, dùng cho benchmark.
+
+Mô phỏng CDN thật: mỗi kết nối chỉ được RATE byte/s, nên tải nhiều
+fragment/nhiều đoạn cùng lúc sẽ nhanh hơn, tới khi chạm giới hạn tổng
+(total_rate) nếu có. Các đường dẫn:
+    /video.mp4          một file lớn, hỗ trợ Range (cho aria2c, trình cập nhật)
+    /norange.mp4        cùng file nhưng không hỗ trợ Range
+    /stream.m3u8        playlist HLS gồm các fragment /seg/<i>.ts
+
+Chạy riêng: python bench_server.py --port 8800 --rate 1024
+"""
+
+import argparse
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _TokenBucket:
+    """Giới hạn tổng băng thông của máy chủ (dùng chung mọi kết nối)"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._allowance = rate
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._allowance = min(self.rate, self._allowance + (now - self._last) * self.rate)
+                self._last = now
+                if self._allowance >= amount:
+                    self._allowance -= amount
+                    return
+                wait = (amount - self._allowance) / self.rate
+            time.sleep(wait)
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Client đóng kết nối keep-alive giữa chừng là bình thường
+        pass
+
+
+class BenchServer:
+    """Máy chủ benchmark chạy trên một thread nền"""
+
+    def __init__(self, port=0, rate=1024 * 1024, total_rate=None,
+                 file_size=32 * 1024 * 1024, segments=64):
+        self.rate = rate
+        self.bucket = _TokenBucket(total_rate) if total_rate else None
+        pattern = bytes(range(256))
+        self.data = (pattern * (file_size // len(pattern) + 1))[:file_size]
+        self.segments = segments
+        self.segment_size = -(-file_size // segments)
+        self.httpd = _QuietHTTPServer(("127.0.0.1", port), self._make_handler())
+        self.port = self.httpd.server_address[1]
+        self._thread = None
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.port}{path}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def playlist(self):
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:4",
+                 "#EXT-X-MEDIA-SEQUENCE:0", "#EXT-X-PLAYLIST-TYPE:VOD"]
+        for i in range(self.segments):
+            lines += ["#EXTINF:4.0,", f"seg/{i}.ts"]
+        lines.append("#EXT-X-ENDLIST")
+        return ("\n".join(lines) + "\n").encode()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_HEAD(self):
+                self._serve(send_body=False)
+
+            def do_GET(self):
+                self._serve(send_body=True)
+
+            def _serve(self, send_body):
+                path = self.path.split("?")[0]
+                if path == "/stream.m3u8":
+                    self._send_bytes(server.playlist(), "application/vnd.apple.mpegurl",
+                                     send_body, throttle=False)
+                    return
+                match = re.match(r"^/seg/(\d+)\.ts$", path)
+                if match and int(match.group(1)) < server.segments:
+                    start = int(match.group(1)) * server.segment_size
+                    body = server.data[start:start + server.segment_size]
+                    self._send_bytes(body, "video/mp2t", send_body)
+                    return
+                if path == "/video.mp4":
+                    self._send_range(server.data, "video/mp4", send_body)
+                    return
+                if path == "/norange.mp4":
+                    self._send_bytes(server.data, "video/mp4", send_body)
+                    return
+                self.send_error(404)
+
+            def _send_range(self, data, content_type, send_body):
+                start, end = 0, len(data) - 1
+                match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+                if match:
+                    start = int(match.group(1))
+                    end = min(int(match.group(2)), end) if match.group(2) else end
+                    if start > end:
+                        self.send_error(416)
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                else:
+                    self.send_response(200)
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("ETag", f'"bench-{len(data)}"')
+                self._finish(data[start:end + 1], content_type, send_body, True)
+
+            def _send_bytes(self, body, content_type, send_body, throttle=True):
+                self.send_response(200)
+                self._finish(body, content_type, send_body, throttle)
+
+            def _finish(self, body, content_type, send_body, throttle):
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if not send_body:
+                    return
+                try:
+                    for pos in range(0, len(body), CHUNK_SIZE):
+                        chunk = body[pos:pos + CHUNK_SIZE]
+                        started = time.monotonic()
+                        if throttle and server.bucket:
+                            server.bucket.consume(len(chunk))
+                        self.wfile.write(chunk)
+                        if throttle:
+                            # Giới hạn tốc độ của riêng kết nối này
+                            delay = len(chunk) / server.rate - (time.monotonic() - started)
+                            if delay > 0:
+                                time.sleep(delay)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Máy chủ HTTP giới hạn tốc độ cho benchmark")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--rate", type=int, default=1024, help="KiB/s mỗi kết nối")
+    parser.add_argument("--total-rate", type=int, default=0,
+                        help="KiB/s tổng (0 = không giới hạn)")
+    parser.add_argument("--size", type=int, default=32, help="Dung lượng video (MiB)")
+    parser.add_argument("--segments", type=int, default=64, help="Số fragment HLS")
+    args = parser.parse_args()
+
+    server = BenchServer(args.port, args.rate * 1024, args.total_rate * 1024 or None,
+                         args.size * 1024 * 1024, args.segments)
+    print(f"HLS:  {server.url('/stream.m3u8')}")
+    print(f"File: {server.url('/video.mp4')}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Benchmark lưu settings: ghi lại toàn bộ mỗi lần thay đổi so với SettingsStore.
+
+Cách cũ: mỗi tín hiệu textChanged/toggled ghi lại toàn bộ key và sync().
+Cách mới: tín hiệu chỉ hẹn giờ SETTINGS_SAVE_DELAY_MS, hết giờ mới đưa giá
+trị vào SettingsStore và chỉ ghi các key đã đổi. Mô phỏng hai tình huống
+(dán danh sách URL lớn từng dòng một, gõ phím có lúc dừng) trên file INI
+trong thư mục tạm, in số lần setValue, sync() và thời gian.
+
+Mặc định backend là IniFileBackend (ghi lại cả file mỗi lần sync() như
+QSettings). --qsettings dùng QSettings thật, nhưng một số bản PySide6 lỗi
+refcount ở mỗi lần gọi setValue/sync() nên cách cũ có thể làm chết tiến
+trình sau vài nghìn lần ghi; khi đó giảm --paste.
+
+    python bench_settings.py --paste 5000 --typing 300
+    python bench_settings.py --qsettings --paste 200
+"""
+
+import argparse
+import configparser
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from settings_store import SettingsStore, SETTINGS_SAVE_DELAY_MS
+
+
+class IniFileBackend:
+    """Backend giống QSettings dạng INI: sync() ghi lại toàn bộ file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.values = {}
+
+    def setValue(self, key, value):
+        self.values[key] = value
+
+    def sync(self):
+        parser = configparser.ConfigParser(interpolation=None)
+        parser["General"] = {key: str(value) for key, value in self.values.items()}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            parser.write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class CountingBackend:
+    """Bọc backend settings để đếm số lần setValue/sync"""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.writes = 0
+        self.syncs = 0
+
+    def setValue(self, key, value):
+        self.writes += 1
+        self.settings.setValue(key, value)
+
+    def sync(self):
+        self.syncs += 1
+        self.settings.sync()
+
+
+def _base_values():
+    return {
+        "urls": "", "video_mode": True, "subtitle_mode": "🤖 Phụ đề tự động",
+        "selected_language": "vi", "convert_srt": True, "audio_only": False,
+        "include_thumb": False, "subtitle_only": False, "max_concurrent": 3,
+        "python_engine": False, "use_archive": True, "link_existing": False,
+        "resolve_metadata": True, "concurrent_fragments": 0, "use_aria2c": False,
+        "custom_folder": "",
+    }
+
+
+def paste_events(count):
+    """Dán `count` URL: mỗi dòng một lần textChanged, cách nhau 1 ms"""
+    urls = []
+    for i in range(count):
+        urls.append(f"https://www.youtube.com/watch?v=vid{i:07d}")
+        yield i * 0.001, {"urls": "\n".join(urls)}
+
+
+def typing_events(count):
+    """Gõ `count` ký tự vào ô thư mục, ~120 ms/ký tự, dừng 1 s sau mỗi 20 ký tự"""
+    now, text = 0.0, ""
+    for i in range(count):
+        text += "abcdefghij"[i % 10]
+        now += 1.0 if i and i % 20 == 0 else 0.12
+        yield now, {"custom_folder": text}
+
+
+def run_eager(backend, events):
+    """Cách cũ: ghi toàn bộ key và sync() ở mỗi thay đổi"""
+    values = _base_values()
+    for _, change in events:
+        values.update(change)
+        for key, value in values.items():
+            backend.setValue(key, value)
+        backend.sync()
+
+
+def run_debounced(backend, events):
+    """Cách mới: debounce theo thời gian mô phỏng rồi ghi qua SettingsStore"""
+    store = SettingsStore(backend)
+    values = _base_values()
+    store.remember(values)
+    delay = SETTINGS_SAVE_DELAY_MS / 1000.0
+    deadline = None
+    for at, change in events:
+        if deadline is not None and at >= deadline:
+            store.update(values)
+            store.flush()
+        values.update(change)
+        deadline = at + delay  # Mỗi thay đổi khởi động lại timer
+    store.update(values)
+    store.flush()
+
+
+def _measure(name, runner, make_events, tmp_dir, use_qsettings):
+    path = os.path.join(tmp_dir, f"{name}.ini")
+    if use_qsettings:
+        from PySide6.QtCore import QSettings
+        settings = QSettings(path, QSettings.Format.IniFormat)
+    else:
+        settings = IniFileBackend(path)
+    backend = CountingBackend(settings)
+    started = time.perf_counter()
+    runner(backend, make_events())
+    elapsed = time.perf_counter() - started
+    return backend.writes, backend.syncs, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark lưu settings")
+    parser.add_argument("--paste", type=int, default=5000, help="Số URL dán vào")
+    parser.add_argument("--typing", type=int, default=300, help="Số ký tự gõ")
+    parser.add_argument("--qsettings", action="store_true",
+                        help="Dùng QSettings thật thay cho IniFileBackend")
+    args = parser.parse_args()
+
+    scenarios = [
+        (f"Dán {args.paste} URL", lambda: paste_events(args.paste)),
+        (f"Gõ {args.typing} ký tự", lambda: typing_events(args.typing)),
+    ]
+    tmp_dir = tempfile.mkdtemp(prefix="bench_settings_")
+    try:
+        print(f"{'Tình huống':<22}{'Cách lưu':<12}{'setValue':>10}{'sync':>8}{'Thời gian':>12}")
+        for i, (title, make_events) in enumerate(scenarios):
+            for label, runner in (("Cũ", run_eager), ("Debounce", run_debounced)):
+                writes, syncs, elapsed = _measure(f"{i}_{label}", runner, make_events,
+                                                 tmp_dir, args.qsettings)
+                print(f"{title:<22}{label:<12}{writes:>10}{syncs:>8}{elapsed:>11.3f}s")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
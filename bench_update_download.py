@@ -0,0 +1,75 @@
+"""
+Benchmark tải file cập nhật bằng nhiều kết nối với máy chủ cục bộ (bench_server).
+
+Mỗi kết nối của máy chủ bị giới hạn tốc độ (giống đường truyền có độ trễ
+cao, một luồng TCP không dùng hết băng thông), nên tải song song nhiều đoạn
+Range sẽ nhanh hơn. Tải cùng một file bằng update_core.download_file với
+1, 2, 4, 8 kết nối, kiểm tra SHA-256 và in thời gian so với một luồng. Cuối
+cùng tải đường dẫn không hỗ trợ Range để xem có tự chuyển về một luồng.
+
+    python bench_update_download.py --size 16 --rate 1024 --levels 1,2,4,8
+    python bench_update_download.py --total-rate 4096   # máy chủ giới hạn tổng 4 MiB/s
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from bench_server import BenchServer
+from update_core import download_file
+
+
+def _download(url, sha256, connections):
+    """Tải url vào thư mục tạm, trả về số giây"""
+    tmp_dir = tempfile.mkdtemp(prefix="bench_update_")
+    try:
+        output_file = os.path.join(tmp_dir, "update_v0.0.0.zip")
+        started = time.perf_counter()
+        download_file(url, output_file, sha256=sha256, connections=connections)
+        return time.perf_counter() - started
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tải file cập nhật nhiều kết nối")
+    parser.add_argument("--size", type=int, default=16, help="Dung lượng file (MiB)")
+    parser.add_argument("--rate", type=int, default=1024, help="KiB/s mỗi kết nối")
+    parser.add_argument("--total-rate", type=int, default=0,
+                        help="KiB/s tổng của máy chủ (0 = không giới hạn)")
+    parser.add_argument("--levels", default="1,2,4,8", help="Các mức kết nối cần đo")
+    args = parser.parse_args()
+
+    levels = [int(n) for n in args.levels.split(",")]
+    size = args.size * 1024 * 1024
+    server = BenchServer(rate=args.rate * 1024, total_rate=args.total_rate * 1024 or None,
+                         file_size=size).start()
+    sha256 = hashlib.sha256(server.data).hexdigest()
+    print(f"Máy chủ: {args.rate} KiB/s mỗi kết nối"
+          f"{f', tổng {args.total_rate} KiB/s' if args.total_rate else ''}, file {args.size} MiB")
+
+    results = {}
+    try:
+        print(f"\n{'Cách tải':<26}{'Thời gian':>10}{'Tốc độ':>14}{'So với 1':>10}")
+        for n in levels:
+            seconds = _download(server.url("/video.mp4"), sha256, n)
+            results[n] = seconds
+            speed = size / seconds / 1024 / 1024
+            print(f"{f'Range, {n} kết nối':<26}{seconds:>9.2f}s{speed:>9.2f} MiB/s"
+                  f"{results[levels[0]] / seconds:>9.2f}x")
+
+        seconds = _download(server.url("/norange.mp4"), sha256, max(levels))
+        speed = size / seconds / 1024 / 1024
+        print(f"{f'Không Range, {max(levels)} kết nối':<26}{seconds:>9.2f}s{speed:>9.2f} MiB/s"
+              f"{results[levels[0]] / seconds:>9.2f}x  (tự về một luồng)")
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
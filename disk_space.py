@@ -0,0 +1,131 @@
+"""
+Kiểm tra dung lượng ổ đĩa trước và trong khi tải.
+
+Playlist lớn có thể làm đầy ổ đĩa giữa chừng: các link sau đều lỗi và để lại
+file .part. Trước khi tải, estimate_batch() cộng dung lượng dự kiến của các
+link từ metadata đã lấy trước (filesize/filesize_approx, xem format_policy)
+để so với chỗ trống của ổ chứa thư mục tải. Trong khi tải, DiskGuard cộng
+dồn số byte các job đang chạy đã ghi và còn phải ghi (theo tiến trình của
+yt-dlp); khi chỗ trống trừ phần còn phải ghi xuống dưới mức dự trữ thì
+BatchDownloader tạm dừng hàng đợi (không chạy link mới) cho tới khi có chỗ.
+Module không phụ thuộc Qt.
+"""
+
+import os
+import shutil
+import threading
+
+from format_policy import ACTION_COPY
+
+
+# Luôn chừa lại ít nhất chừng này chỗ trống trên ổ đĩa
+DEFAULT_MIN_FREE_BYTES = 500 * 1024 * 1024
+
+# Số giây giữa hai lần kiểm tra chỗ trống khi đang tải
+DISK_CHECK_INTERVAL = 1.0
+
+
+def free_space(path):
+    """Số byte còn trống trên ổ chứa path (path có thể chưa tồn tại)"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return shutil.disk_usage(path).free
+
+
+def peak_bytes(plan):
+    """
+    Dung lượng lớn nhất một video chiếm khi tải theo FormatPlan: lúc ghép,
+    file video/âm thanh riêng và file đã ghép cùng tồn tại.
+    """
+    if plan is None or not plan.size:
+        return None
+    if plan.action == ACTION_COPY and plan.vcodec:
+        return plan.size * 2
+    return plan.size
+
+
+class BatchEstimate:
+    """Dung lượng dự kiến của cả lô link"""
+
+    def __init__(self):
+        self.total_bytes = 0  # Tổng dung lượng các link biết được kích thước
+        self.peak_bytes = 0  # Chỗ trống lớn nhất cần cho một link (lúc ghép)
+        self.known = 0
+        self.unknown = 0  # Playlist, link lỗi, format không báo dung lượng
+
+    def add(self, size, peak=None):
+        if not size:
+            self.unknown += 1
+            return
+        self.known += 1
+        self.total_bytes += size
+        self.peak_bytes = max(self.peak_bytes, peak or size)
+
+
+def estimate_batch(plans):
+    """BatchEstimate từ danh sách FormatPlan (None = không rõ)"""
+    estimate = BatchEstimate()
+    for plan in plans:
+        estimate.add(plan.size if plan else 0, peak_bytes(plan))
+    return estimate
+
+
+class DiskGuard:
+    """Theo dõi số byte các job đang ghi so với chỗ trống của ổ đĩa"""
+
+    def __init__(self, path, min_free=DEFAULT_MIN_FREE_BYTES, free_space_func=free_space):
+        self.path = path
+        self.min_free = max(0, int(min_free))
+        self._free_space = free_space_func
+        self._lock = threading.Lock()
+        self._expected = {}  # key của job -> dung lượng dự kiến (byte)
+        self._files = {}  # key của job -> {file: [đã ghi, tổng]}
+        self.bytes_written = 0  # Tổng số byte đã ghi trong lượt tải
+
+    def expect(self, key, size):
+        """Job bắt đầu tải, size là dung lượng dự kiến (None nếu chưa biết)"""
+        with self._lock:
+            self._expected[key] = size or 0
+            self._files.setdefault(key, {})
+
+    def update(self, key, filename, downloaded, total):
+        """Cập nhật số byte đã ghi/tổng của một file đang tải"""
+        if downloaded is None:
+            return
+        with self._lock:
+            files = self._files.setdefault(key, {})
+            entry = files.setdefault(filename, [0, 0])
+            self.bytes_written += max(0, downloaded - entry[0])
+            entry[0] = downloaded
+            entry[1] = max(total or 0, downloaded)
+
+    def release(self, key):
+        """Job đã tải xong (hoặc lỗi): file đã nằm trên đĩa, không cần giữ chỗ"""
+        with self._lock:
+            self._expected.pop(key, None)
+            self._files.pop(key, None)
+
+    def pending_bytes(self):
+        """Số byte các job đang chạy còn phải ghi"""
+        with self._lock:
+            pending = 0
+            for key, files in self._files.items():
+                written = sum(entry[0] for entry in files.values())
+                remaining = sum(entry[1] - entry[0] for entry in files.values())
+                pending += max(remaining, self._expected.get(key, 0) - written)
+            return pending
+
+    def free_bytes(self):
+        """Chỗ trống hiện tại của ổ đĩa"""
+        return self._free_space(self.path)
+
+    def headroom(self):
+        """Chỗ trống còn lại sau khi các job đang chạy ghi xong, trừ mức dự trữ"""
+        return self.free_bytes() - self.pending_bytes() - self.min_free
+
+    def is_low(self):
+        return self.headroom() < 0
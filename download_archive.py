@@ -0,0 +1,171 @@
+"""
+Archive các video đã tải để lần chạy sau bỏ qua, không tải lại.
+
+Dữ liệu chính nằm trong SQLite (ARCHIVE_DB) với khóa (extractor, id, loại
+tải), kèm đường dẫn file, kích thước và SHA-256. Song song đó là file text
+tương thích --download-archive của yt-dlp (mỗi dòng "extractor id") để
+yt-dlp tự bỏ qua các video trong playlist đã có.
+
+yt-dlp ghi vào file text ngay khi tải xong, còn SQLite chỉ ghi sau khi xử lý
+file thành công, nên file text có thể có video mà SQLite không có (xử lý lỗi).
+SQLite là nguồn chính: prune_missing() ghi lại file text từ SQLite ở đầu mỗi
+lượt tải.
+"""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+from datetime import datetime
+
+
+ARCHIVE_DB = "download_archive.db"
+
+# Loại tải: cùng một video có thể được tải dạng video hoặc dạng âm thanh
+KIND_VIDEO = "video"
+KIND_AUDIO = "audio"
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Tính SHA-256 của file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_into_folder(src, folder):
+    """
+    Đưa file đã có vào thư mục tải mới bằng hard-link (không tốn dung lượng),
+    copy nếu không hard-link được (khác ổ đĩa...). Trả về (đường dẫn, đã_link).
+    """
+    dst = os.path.join(folder, os.path.basename(src))
+    if os.path.exists(dst):
+        return dst, True
+    try:
+        os.link(src, dst)
+        return dst, True
+    except OSError:
+        shutil.copy2(src, dst)
+        return dst, False
+
+
+class DownloadArchive:
+    """Archive SQLite các video đã tải, an toàn khi dùng từ nhiều thread"""
+
+    def __init__(self, db_path=ARCHIVE_DB, kind=KIND_VIDEO):
+        self.db_path = db_path
+        self.kind = kind
+        # File tương thích --download-archive của yt-dlp, riêng cho từng loại tải
+        self.ytdlp_archive = f"{os.path.splitext(db_path)[0]}_{kind}.txt"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS items (
+                extractor TEXT NOT NULL,
+                video_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                url TEXT,
+                filepath TEXT NOT NULL,
+                size INTEGER,
+                sha256 TEXT,
+                downloaded_at TEXT,
+                PRIMARY KEY (extractor, video_id, kind)
+            )
+        """)
+        self._conn.commit()
+
+    def lookup(self, extractor, video_id):
+        """Thông tin đã lưu của video (dict) hoặc None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, filepath, size, sha256, downloaded_at FROM items "
+                "WHERE extractor = ? AND video_id = ? AND kind = ?",
+                (extractor.lower(), video_id, self.kind)).fetchone()
+        if not row:
+            return None
+        return {"url": row[0], "filepath": row[1], "size": row[2],
+                "sha256": row[3], "downloaded_at": row[4]}
+
+    def find_existing(self, extractor, video_id):
+        """
+        Đường dẫn file đã tải nếu vẫn còn nguyên (cùng kích thước và cùng
+        SHA-256 nếu đã lưu), None nếu chưa tải. Mục có file đã bị xóa/sửa sẽ
+        bị gỡ khỏi archive để tải lại.
+        """
+        item = self.lookup(extractor, video_id)
+        if not item:
+            return None
+        try:
+            if os.path.getsize(item["filepath"]) == item["size"] and (
+                    not item["sha256"] or file_sha256(item["filepath"]) == item["sha256"]):
+                return item["filepath"]
+        except OSError:
+            pass
+        self.forget(extractor, video_id)
+        return None
+
+    def record(self, extractor, video_id, url, filepath, checksum=True):
+        """Ghi nhận một video đã tải xong"""
+        size = os.path.getsize(filepath)
+        sha256 = file_sha256(filepath) if checksum else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (extractor.lower(), video_id, self.kind, url,
+                 os.path.abspath(filepath), size, sha256,
+                 datetime.now().isoformat()))
+            self._conn.commit()
+        # Dòng "extractor id" trong file --download-archive do yt-dlp tự ghi
+
+    def forget(self, extractor, video_id):
+        """Gỡ video khỏi archive"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM items WHERE extractor = ? AND video_id = ? AND kind = ?",
+                (extractor.lower(), video_id, self.kind))
+            self._conn.commit()
+            self._export_ytdlp_archive()
+
+    def prune_missing(self):
+        """
+        Gỡ các mục có file đã bị xóa và ghi lại file --download-archive từ
+        SQLite, trả về số mục đã gỡ. Gọi ở đầu mỗi lượt tải.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT extractor, video_id, filepath FROM items WHERE kind = ?",
+                (self.kind,)).fetchall()
+            missing = [(ext, vid) for ext, vid, path in rows
+                       if not os.path.exists(path)]
+            if missing:
+                self._conn.executemany(
+                    "DELETE FROM items WHERE extractor = ? AND video_id = ? AND kind = ?",
+                    [(ext, vid, self.kind) for ext, vid in missing])
+                self._conn.commit()
+            # Luôn ghi lại: bỏ các dòng yt-dlp đã ghi cho video xử lý lỗi
+            self._export_ytdlp_archive()
+        return len(missing)
+
+    def count(self):
+        """Số video trong archive"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM items WHERE kind = ?", (self.kind,)).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _export_ytdlp_archive(self):
+        """Ghi lại toàn bộ file --download-archive từ SQLite"""
+        rows = self._conn.execute(
+            "SELECT extractor, video_id FROM items WHERE kind = ?",
+            (self.kind,)).fetchall()
+        tmp_file = self.ytdlp_archive + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            for extractor, video_id in rows:
+                f.write(f"{extractor} {video_id}\n")
+        os.replace(tmp_file, self.ytdlp_archive)
@@ -0,0 +1,303 @@
+"""
+Chạy tải hàng loạt không cần giao diện (không import PySide6).
+
+Ví dụ:
+    python download_cli.py https://youtu.be/xxxxxxxxxxx
+    python download_cli.py -i links.txt --audio -j 4
+    python download_cli.py --resume
+    cat links.txt | python download_cli.py --json > progress.jsonl
+
+Với --json, mỗi dòng stdout là một object JSON có trường "event":
+    message      {"text"}
+    progress     {"index", "url", "status", "percent", "downloaded_bytes",
+                  "total_bytes", "speed", "eta", "fragment_index", ...}
+    overall      {"percent"}
+    job_finished {"index", "url", "success"}
+    finished     {"folder", "succeeded", "failed"}
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+
+from download_engine import (
+    BatchDownloader, SUB_MODE_AUTO, SUB_MODE_NONE, SUB_MODE_OFFICIAL
+)
+from bandwidth import BandwidthBudget, parse_rate, parse_schedule
+from disk_space import DEFAULT_MIN_FREE_BYTES
+from error_classifier import RetryPolicy
+from download_scheduler import DEFAULT_MAX_CONCURRENT, DomainLimits
+from format_policy import DEFAULT_FORMAT_POLICY, FORMAT_POLICY_LABELS
+from job_journal import JOURNAL_FILE, JobJournal
+from post_processing import DEFAULT_POST_WORKERS
+from tool_discovery import discover_tools
+from url_utils import unique_urls
+
+
+SUB_MODES = {
+    "none": SUB_MODE_NONE,
+    "official": SUB_MODE_OFFICIAL,
+    "auto": SUB_MODE_AUTO,
+}
+
+DEFAULT_FFMPEG = os.path.join("ffmpeg", "ffmpeg.exe")
+
+
+def read_urls(sources):
+    """Đọc link từ các file (hoặc "-" = stdin), bỏ dòng trống và dòng #"""
+    urls = []
+    for source in sources:
+        if source == "-":
+            lines = sys.stdin.read().splitlines()
+        else:
+            with open(source, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        for line in lines:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                urls.append(line)
+    return urls
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Tải video hàng loạt bằng yt-dlp (không cần giao diện)")
+    parser.add_argument("urls", nargs="*", help="Link cần tải")
+    parser.add_argument("-i", "--input", action="append", default=[],
+                        metavar="FILE",
+                        help="File danh sách link, mỗi dòng một link ('-' = stdin)")
+    parser.add_argument("--playlist", action="store_true",
+                        help="Tải cả playlist (mặc định: từng video)")
+    parser.add_argument("--audio", action="store_true", help="Chỉ tải âm thanh MP3")
+    parser.add_argument("--keep-original-audio", action="store_true",
+                        help="Với --audio: giữ nguyên M4A/Opus, không mã hóa lại sang MP3")
+    parser.add_argument("--transcode-workers", type=int, default=0,
+                        help="Số ffmpeg chuyển âm thanh cùng lúc (0 = số nhân CPU)")
+    parser.add_argument("--format-policy", choices=sorted(FORMAT_POLICY_LABELS),
+                        default=DEFAULT_FORMAT_POLICY,
+                        help="Chọn format: mp4 = H.264 + AAC ghép MP4, best = chất lượng "
+                             f"cao nhất, WebM/MKV khi cần (mặc định: {DEFAULT_FORMAT_POLICY})")
+    parser.add_argument("--subs", choices=sorted(SUB_MODES), default="none",
+                        help="Tải phụ đề: none, official, auto")
+    parser.add_argument("--sub-lang", default="vi", help="Mã ngôn ngữ phụ đề (mặc định: vi)")
+    parser.add_argument("--no-convert-srt", action="store_true",
+                        help="Không chuyển phụ đề sang .srt")
+    parser.add_argument("--thumbnail", action="store_true", help="Tải ảnh thumbnail")
+    parser.add_argument("--subtitle-only", action="store_true", help="Chỉ tải phụ đề")
+    parser.add_argument("--folder", default="",
+                        help="Tên thư mục trong Video/ hoặc đường dẫn đầy đủ")
+    parser.add_argument("-j", "--max-concurrent", type=int, default=DEFAULT_MAX_CONCURRENT,
+                        help=f"Số link tải cùng lúc (mặc định: {DEFAULT_MAX_CONCURRENT})")
+    parser.add_argument("-N", "--concurrent-fragments", type=int, default=0,
+                        help="Số fragment DASH/HLS tải song song mỗi video (0 = tự động)")
+    parser.add_argument("--post-workers", type=int, default=DEFAULT_POST_WORKERS,
+                        help="Số luồng xử lý file sau tải "
+                             f"(mặc định: {DEFAULT_POST_WORKERS})")
+    parser.add_argument("--min-free", type=int, default=DEFAULT_MIN_FREE_BYTES // (1024 * 1024),
+                        metavar="MIB",
+                        help="Chỗ trống tối thiểu giữ lại trên ổ đĩa, tạm dừng hàng đợi khi "
+                             "gần chạm mức này (MiB, mặc định: %(default)s)")
+    parser.add_argument("--retries", type=int, default=RetryPolicy().max_retries,
+                        help="Số lần tải lại link bị lỗi tạm thời (429, mạng...), "
+                             "chờ tăng dần giữa các lần (mặc định: %(default)s)")
+    parser.add_argument("--limit-rate", default="0", metavar="RATE",
+                        help="Tổng băng thông cho mọi link đang tải, vd. 20M, 500K "
+                             "(mặc định: không giới hạn)")
+    parser.add_argument("--bandwidth-schedule", default="", metavar="WINDOWS",
+                        help="Giới hạn theo khung giờ, vd. \"08:00-18:00=5M,22:00-06:00=0\" "
+                             "(ngoài các khung dùng --limit-rate)")
+    parser.add_argument("--domain-limit", action="append", default=[],
+                        metavar="DOMAIN=N[:GIÂY]",
+                        help="Số link cùng lúc và số giây giữa hai lần bắt đầu link của "
+                             "một trang, vd. youtube.com=2:1.5 (lặp lại được)")
+    parser.add_argument("--aria2c", nargs="?", const="auto", metavar="PATH",
+                        help="Tải file HTTP bằng aria2c nhiều kết nối (mặc định: tự dò)")
+    parser.add_argument("--python-engine", action="store_true",
+                        help="Dùng thư viện yt_dlp trong tiến trình thay vì yt-dlp.exe")
+    parser.add_argument("--no-archive", action="store_true",
+                        help="Không bỏ qua video đã tải ở lần trước")
+    parser.add_argument("--link-existing", action="store_true",
+                        help="Hard-link file đã tải vào thư mục mới")
+    parser.add_argument("--resolve", action="store_true",
+                        help="Lấy metadata cả danh sách trước khi tải")
+    parser.add_argument("--ytdlp", help="Đường dẫn yt-dlp (mặc định: tự dò)")
+    parser.add_argument("--ffmpeg", default=DEFAULT_FFMPEG,
+                        help=f"Đường dẫn ffmpeg (mặc định: {DEFAULT_FFMPEG})")
+    parser.add_argument("--resume", action="store_true",
+                        help="Tải tiếp các link chưa xong của lượt tải trước (theo journal)")
+    parser.add_argument("--journal", default=JOURNAL_FILE,
+                        help=f"File journal để tải tiếp (mặc định: {JOURNAL_FILE})")
+    parser.add_argument("--no-journal", action="store_true",
+                        help="Không ghi journal")
+    parser.add_argument("--json", action="store_true",
+                        help="In tiến trình dạng JSON lines")
+    return parser
+
+
+class _Output:
+    """Ghi log/tiến trình ra stdout (text hoặc JSON lines), an toàn đa luồng"""
+
+    def __init__(self, json_mode):
+        self.json_mode = json_mode
+        self._lock = threading.Lock()
+
+    def _write(self, line):
+        with self._lock:
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+
+    def event(self, name, **fields):
+        if self.json_mode:
+            self._write(json.dumps({"event": name, **fields}, ensure_ascii=False))
+
+    def message(self, text):
+        if self.json_mode:
+            self.event("message", text=text)
+        else:
+            self._write(text)
+
+    def status(self, key, text):
+        # Ở chế độ JSON đã có sự kiện "progress" chi tiết hơn
+        if not self.json_mode:
+            self._write(text)
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        bandwidth = BandwidthBudget(parse_rate(args.limit_rate),
+                                    parse_schedule(args.bandwidth_schedule))
+        domain_limits = DomainLimits()
+        for spec in args.domain_limit:
+            domain, limit = DomainLimits.parse(spec)
+            domain_limits.limits[domain] = limit
+    except ValueError as e:
+        parser.error(str(e))
+
+    # Console Windows mặc định không in được emoji trong log
+    for stream in (sys.stdout, sys.stderr):
+        if hasattr(stream, "reconfigure"):
+            stream.reconfigure(encoding="utf-8", errors="replace")
+
+    journal = None
+    options = {
+        "video_mode": not args.playlist,
+        "audio_only": args.audio,
+        "sub_mode": SUB_MODES[args.subs],
+        "sub_lang": args.sub_lang,
+        "convert_srt": not args.no_convert_srt,
+        "include_thumb": args.thumbnail,
+        "subtitle_only": args.subtitle_only,
+        "custom_folder_name": args.folder,
+        "keep_original_audio": args.keep_original_audio,
+        "format_policy": args.format_policy,
+    }
+
+    if args.resume:
+        journal = JobJournal.load(args.journal)
+        if not journal or not journal.folder or not journal.unfinished():
+            print("❌ Không có lượt tải dở để tải tiếp", file=sys.stderr)
+            return 2
+        # Tải tiếp với đúng tùy chọn cũ để tên file trùng với file .part
+        options.update(journal.options)
+        urls = [entry["url"] for entry in journal.unfinished()]
+    else:
+        sources = list(args.input)
+        if not args.urls and not sources and not sys.stdin.isatty():
+            sources.append("-")
+        # Chuẩn hóa và bỏ link trùng giống danh sách link trên giao diện
+        urls, _ = unique_urls(list(args.urls) + read_urls(sources))
+        if not urls:
+            print("❌ Không có link nào để tải", file=sys.stderr)
+            return 2
+        if not args.no_journal:
+            journal = JobJournal(args.journal)
+
+    out = _Output(args.json)
+
+    ytdlp_path = args.ytdlp
+    aria2c_path = None if args.aria2c == "auto" else args.aria2c
+    if not ytdlp_path or args.aria2c == "auto":
+        tools = discover_tools(args.ffmpeg, log=lambda msg: print(msg, file=sys.stderr))
+        ytdlp_path = ytdlp_path or tools["yt-dlp"]["path"]
+        if args.aria2c == "auto":
+            aria2c_path = tools["aria2c"]["path"]
+            if not aria2c_path:
+                print("❌ Không tìm thấy aria2c", file=sys.stderr)
+                return 2
+
+    engine = None
+    if args.python_engine:
+        from ytdlp_engine import YtDlpEngine
+        engine = YtDlpEngine(max_idle=args.max_concurrent)
+
+    results = {}
+
+    def on_job_progress(job, event):
+        out.event("progress", index=job.index, url=job.url, **event.as_dict())
+
+    def on_job_finished(job, success):
+        results[job.index] = success
+        out.event("job_finished", index=job.index, url=job.url, success=success)
+
+    downloader = BatchDownloader(
+        urls,
+        **options,
+        max_concurrent=args.max_concurrent,
+        engine=engine,
+        use_archive=not args.no_archive,
+        link_existing=args.link_existing,
+        resolve_metadata=args.resolve,
+        ytdlp_path=ytdlp_path,
+        ffmpeg_path=args.ffmpeg,
+        journal=journal,
+        resume=args.resume,
+        concurrent_fragments=args.concurrent_fragments,
+        external_downloader=aria2c_path,
+        post_workers=args.post_workers,
+        transcode_workers=args.transcode_workers,
+        min_free_space=args.min_free * 1024 * 1024,
+        bandwidth=bandwidth,
+        retry_policy=RetryPolicy(max_retries=args.retries),
+        domain_limits=domain_limits,
+        on_message=out.message,
+        on_status=out.status,
+        on_progress=lambda percent: out.event("overall", percent=percent),
+        on_job_progress=on_job_progress,
+        on_job_finished=on_job_finished,
+    )
+
+    # Chạy trên thread riêng để Ctrl+C ở thread chính dừng được việc tải
+    folder_holder = []
+    thread = threading.Thread(target=lambda: folder_holder.append(downloader.run()),
+                              daemon=True)
+    thread.start()
+    try:
+        while thread.is_alive():
+            thread.join(0.2)
+    except KeyboardInterrupt:
+        downloader.stop()
+        thread.join()
+        return 130
+    finally:
+        if engine:
+            engine.close()
+
+    folder = folder_holder[0] if folder_holder else None
+    failed = sum(1 for success in results.values() if not success)
+    succeeded = len(results) - failed
+    if args.json:
+        out.event("finished", folder=folder, succeeded=succeeded, failed=failed)
+    elif folder:
+        out.message(f"📂 Video được lưu tại: {folder}")
+
+    if folder is None:
+        return 1
+    return 1 if failed or len(results) < len(urls) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1008 @@
+"""
+Engine tải video không phụ thuộc Qt.
+
+BatchDownloader chứa toàn bộ quy trình tải một danh sách link: tạo thư mục,
+dựng lệnh yt-dlp, chạy song song qua DownloadScheduler, archive, metadata và
+xử lý file sau khi tải (PostProcessPipeline, không giữ luồng tải). Kết quả được báo qua callback nên dùng được cho cả
+DownloadWorker (QThread của giao diện) lẫn download_cli.py (chạy không cần
+màn hình).
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+from bandwidth import format_rate
+from disk_space import (
+    DEFAULT_MIN_FREE_BYTES, DISK_CHECK_INTERVAL, DiskGuard, estimate_batch, peak_bytes
+)
+from error_classifier import ERR_RATE_LIMITED, REPORT_FILE, RetryPolicy, classify, write_report
+from download_archive import DownloadArchive, KIND_AUDIO, KIND_VIDEO, link_into_folder
+from format_policy import (
+    DEFAULT_FORMAT_POLICY, FORMAT_POLICY_LABELS, format_args, plan_formats, summarize_plans
+)
+from fragment_tuner import FragmentTuner
+from download_scheduler import (
+    DownloadJob, DownloadScheduler, DomainLimits, ProgressModel, DEFAULT_MAX_CONCURRENT
+)
+from job_journal import (
+    STATE_DONE, STATE_DOWNLOADING, STATE_FAILED, STATE_POST_PROCESSING, STATE_QUEUED
+)
+from post_processing import (
+    DEFAULT_POST_WORKERS, PostProcessPipeline, fixed_media_name, fixed_subtitle_name
+)
+from metadata_cache import (
+    MetadataCache, describe_info, extract_with_executable, is_single_video, resolve_all
+)
+from progress_events import (
+    FILE_ARGS, PROGRESS_ARGS, ProgressEvent, format_bytes, parse_file_line,
+    parse_progress_line, parse_text_percent
+)
+from transcode_pool import (
+    MODE_COPY, TranscodePool, TranscodeTask, plan_audio
+)
+from url_utils import video_key
+
+
+# Các tùy chọn được lưu vào journal để tải tiếp với đúng cấu hình cũ
+JOURNAL_OPTIONS = ("video_mode", "audio_only", "sub_mode", "sub_lang", "convert_srt",
+                   "include_thumb", "subtitle_only", "custom_folder_name",
+                   "keep_original_audio", "format_policy")
+
+# Các chế độ phụ đề (trùng với lựa chọn trên giao diện)
+SUB_MODE_NONE = "❌ Không tải"
+SUB_MODE_OFFICIAL = "📄 Phụ đề chính thức"
+SUB_MODE_AUTO = "🤖 Phụ đề tự động"
+
+
+def _ignore(*args):
+    pass
+
+
+class BatchDownloader:
+    """Tải một danh sách link, báo log/tiến trình qua callback"""
+
+    def __init__(self, urls, video_mode, audio_only, sub_mode, sub_lang,
+                 convert_srt, include_thumb, subtitle_only, custom_folder_name="",
+                 max_concurrent=DEFAULT_MAX_CONCURRENT, engine=None,
+                 use_archive=False, link_existing=False, resolve_metadata=False,
+                 ytdlp_path=None, ffmpeg_path=None, journal=None, resume=False,
+                 concurrent_fragments=0, fragment_tuner=None, external_downloader=None,
+                 post_workers=DEFAULT_POST_WORKERS, keep_original_audio=False,
+                 transcode_workers=0, format_policy=DEFAULT_FORMAT_POLICY,
+                 min_free_space=DEFAULT_MIN_FREE_BYTES, bandwidth=None, retry_policy=None,
+                 domain_limits=None,
+                 on_message=None, on_status=None, on_progress=None,
+                 on_job_progress=None, on_job_finished=None):
+        """
+        Callback (đều được gọi từ thread tải, không phải thread gọi run()):
+            on_message(text): một dòng log
+            on_status(key, text): dòng trạng thái thay thế tại chỗ
+            on_progress(percent): tiến trình tổng 0-100
+            on_job_progress(job, event): ProgressEvent của từng job
+            on_job_finished(job, success): một job đã xong (kể cả xử lý file)
+        """
+        self.urls = urls
+        self.video_mode = video_mode
+        self.audio_only = audio_only
+        self.sub_mode = sub_mode
+        self.sub_lang = sub_lang
+        self.convert_srt = convert_srt
+        self.include_thumb = include_thumb
+        self.subtitle_only = subtitle_only
+        self.custom_folder_name = custom_folder_name.strip()
+        self.max_concurrent = max(1, int(max_concurrent))
+        # YtDlpEngine để tải trong tiến trình, None = chạy yt-dlp.exe cho mỗi link
+        self.engine = engine
+        # Bỏ qua video đã tải ở lần trước (archive), không áp dụng khi chỉ tải phụ đề
+        self.use_archive = use_archive and not subtitle_only
+        # Hard-link file đã có vào thư mục mới thay vì chỉ bỏ qua
+        self.link_existing = link_existing
+        self.archive = None
+        # Lấy metadata cả danh sách trước khi tải (dùng cache info-json)
+        self.resolve_metadata = resolve_metadata
+        self.metadata_cache = None
+        self.metadata = {}  # url -> info dict (None nếu lỗi)
+        # Đường dẫn yt-dlp/ffmpeg đã dò được, None = tìm mặc định/không dùng
+        self.ytdlp_path = ytdlp_path
+        self.ffmpeg_path = ffmpeg_path
+        # JobJournal ghi trạng thái từng link; resume=True thì tải tiếp các
+        # link chưa xong của journal vào thư mục cũ thay vì tạo lượt tải mới
+        self.journal = journal
+        self.resume = resume and journal is not None
+        # Số fragment DASH/HLS tải song song mỗi video, 0 = tự chọn theo
+        # tốc độ đo được (FragmentTuner dùng chung giữa các lượt tải)
+        self.concurrent_fragments = max(0, int(concurrent_fragments))
+        if self.concurrent_fragments == 0 and fragment_tuner is None:
+            fragment_tuner = FragmentTuner()
+        self.fragment_tuner = fragment_tuner if self.concurrent_fragments == 0 else None
+        # Đường dẫn aria2c để tải file HTTP bằng nhiều kết nối, None = tải thường
+        self.external_downloader = external_downloader
+        # Số thread xử lý file sau tải (đổi tên, archive), tách khỏi luồng tải
+        self.post_workers = max(1, int(post_workers))
+        self.post_pipeline = None
+        # Chế độ âm thanh: yt-dlp chỉ tải luồng âm thanh, ffmpeg chuyển MP3
+        # song song trong TranscodePool (0 = theo số nhân CPU).
+        # keep_original_audio giữ nguyên M4A/Opus, không mã hóa lại
+        self.keep_original_audio = keep_original_audio
+        self.transcode_workers = max(0, int(transcode_workers))
+        self.transcode_pool = None
+        self._transcode_lock = threading.Lock()
+        self._transcoding = {}  # số thứ tự job -> [số file còn lại, tất cả thành công]
+        # Chọn format để ghép bằng stream copy (format_policy.FORMAT_POLICY_*)
+        self.format_policy = format_policy
+        self._plans = {}  # url -> FormatPlan theo metadata đã lấy trước
+        # Chỗ trống tối thiểu giữ lại trên ổ đĩa; DiskGuard tạm dừng hàng
+        # đợi khi các job đang chạy có thể ghi lấn vào phần này
+        self.min_free_space = max(0, int(min_free_space))
+        self.disk_guard = None
+        self._disk_paused = False
+        self._disk_lock = threading.Lock()
+        # BandwidthBudget chia mức trần băng thông cho các job đang tải, None = không giới hạn
+        self.bandwidth = bandwidth if bandwidth and bandwidth.enabled else None
+        # Lỗi tạm thời (429, mạng...) được tải lại ở cuối hàng đợi sau một
+        # khoảng chờ; link lỗi hẳn được ghi vào REPORT_FILE trong thư mục tải
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.failures = []  # [(url, ErrorInfo)] các link lỗi sau khi hết lượt thử
+        # Giới hạn số link cùng lúc/khoảng cách bắt đầu theo từng trang
+        # (download_scheduler.DomainLimits), None = mặc định
+        self.domain_limits = domain_limits or DomainLimits()
+        self._failures_lock = threading.Lock()
+        self._job_fragments = {}  # số thứ tự job -> số fragment đã dùng
+        self._fragmented_jobs = set()
+        self.on_message = on_message or _ignore
+        self.on_status = on_status or _ignore
+        self.on_progress = on_progress or _ignore
+        self.on_job_progress = on_job_progress or _ignore
+        self.on_job_finished = on_job_finished or _ignore
+        self.stop_flag = False
+        self.scheduler = None
+        self.progress_model = None
+        # Thời điểm ghi dòng tiến trình gần nhất của từng job (giới hạn log)
+        self._last_progress_report = {}
+
+    def stop(self):
+        """Dừng quá trình download"""
+        self.stop_flag = True
+        if self.post_pipeline:
+            # Job đã tải nhưng chưa xử lý giữ trạng thái post_processing
+            # trong journal, lần tải tiếp sẽ xử lý lại
+            self.post_pipeline.stop()
+        if self.transcode_pool:
+            self.transcode_pool.stop()
+        if self.scheduler:
+            # Kết thúc mọi tiến trình yt-dlp đang chạy
+            self.scheduler.stop()
+            self.on_message("⏹ Dừng tải...")
+
+    def run(self):
+        """Chạy quá trình download, trả về thư mục đã lưu (None nếu lỗi)"""
+        try:
+            if self.resume:
+                download_folder = self.journal.folder
+                os.makedirs(download_folder, exist_ok=True)
+                # Giữ số thứ tự cũ để tên file (và file .part) trùng với lần trước
+                jobs = [DownloadJob(entry["index"], entry["url"])
+                        for entry in self.journal.unfinished()]
+                self.urls = [job.url for job in jobs]
+                self.on_message(
+                    f"♻️ Tải tiếp {len(jobs)} link chưa xong vào: {download_folder}")
+            else:
+                download_folder = self._create_download_folder()
+                download_folder = download_folder.replace('\\', '/')
+                jobs = [DownloadJob(i, url) for i, url in enumerate(self.urls, 1)]
+                if self.journal:
+                    self.journal.start(download_folder, self.journal_options(), jobs)
+
+            if self.use_archive:
+                self.archive = DownloadArchive(
+                    kind=KIND_AUDIO if self.audio_only else KIND_VIDEO)
+                pruned = self.archive.prune_missing()
+                if pruned:
+                    self.on_message(f"🧹 Gỡ {pruned} mục có file đã bị xóa khỏi archive")
+
+            if self.resolve_metadata:
+                self._resolve_metadata(jobs)
+                if self.stop_flag:
+                    self.on_message("⏹ Đã dừng tải.")
+                    return None
+
+            self.progress_model = ProgressModel(jobs)
+            if self.audio_only and not self.subtitle_only:
+                self._start_transcode_pool()
+            elif not self.subtitle_only:
+                label = FORMAT_POLICY_LABELS.get(self.format_policy, self.format_policy)
+                self.on_message(f"🎞️ Định dạng: {label}, ghép bằng copy (không mã hóa lại)")
+            # Job tải xong được đưa sang pipeline, luồng tải nhận link tiếp theo
+            self.post_pipeline = PostProcessPipeline(
+                self._post_process_job, workers=self.post_workers,
+                on_done=self._finish_job).start()
+            self.scheduler = DownloadScheduler(
+                lambda job: self._run_job(job, download_folder),
+                max_concurrent=self.max_concurrent, domain_limits=self.domain_limits,
+                on_error=self._on_job_error)
+
+            if self.max_concurrent > 1 and len(jobs) > 1:
+                self.on_message(
+                    f"⚡ Tải song song tối đa {self.max_concurrent} link cùng lúc")
+                self._log_domains(jobs)
+            if self.bandwidth:
+                self.on_message(self.bandwidth.describe())
+
+            for job in jobs:
+                self.scheduler.submit(job)
+
+            # stop() có thể được gọi trước khi scheduler được tạo
+            if self.stop_flag:
+                self.scheduler.stop()
+
+            self._preflight_disk_space(download_folder, jobs)
+            disk_watch_done = threading.Event()
+            threading.Thread(target=self._watch_disk_space, args=(disk_watch_done,),
+                             daemon=True, name="disk-guard").start()
+            try:
+                self.scheduler.run()
+            finally:
+                disk_watch_done.set()
+
+            # Chờ xử lý nốt các file đã tải xong
+            self.post_pipeline.close()
+            self.post_pipeline.join()
+            if self.transcode_pool:
+                self.transcode_pool.close()
+                self.transcode_pool.join()
+
+            self._write_failure_report(download_folder)
+
+            if self.stop_flag:
+                self.on_message("⏹ Đã dừng tải.")
+            elif self.journal and not self.journal.unfinished():
+                # Đã tải xong hết, không còn gì để tải tiếp
+                self.journal.discard()
+
+            return download_folder
+
+        except Exception as e:
+            self.on_message(f"❌ Lỗi: {e}")
+            return None
+        finally:
+            if self.post_pipeline:
+                self.post_pipeline.stop()
+                self.post_pipeline.join()
+            if self.transcode_pool:
+                self.transcode_pool.stop()
+                self.transcode_pool.join()
+            if self.archive:
+                self.archive.close()
+                self.archive = None
+
+    def _run_job(self, job, download_folder):
+        """Tải một job (chạy trên thread của scheduler)"""
+        if self.stop_flag:
+            return False
+
+        if self.archive and self._skip_archived(job, download_folder):
+            overall = self.progress_model.finish(job)
+            self.on_progress(int(overall))
+            self._journal_state(job, STATE_DONE)
+            self.on_job_finished(job, True)
+            return True
+
+        self._journal_state(job, STATE_DOWNLOADING)
+        self.on_message(f"🔗 [{job.index}] Đang tải: {job.url}")
+
+        self.disk_guard.expect(job.index, peak_bytes(self._plans.get(job.url)))
+        self._start_bandwidth(job)
+        job.output_tail.clear()
+        try:
+            success = self._download_single_url(job, download_folder)
+        except Exception as e:
+            self.on_message(f"❌ [{job.index}] Lỗi: {e}")
+            job.output_tail.append(f"ERROR: {e}")
+            success = False
+        finally:
+            if self.bandwidth:
+                # Phần băng thông của job được chia cho các job còn lại
+                self.bandwidth.finish(job.index)
+            # File đã nằm trên đĩa; kiểm tra lại trước khi scheduler chạy link tiếp theo
+            self.disk_guard.release(job.index)
+            self._check_disk_space()
+
+        if success and not self.stop_flag:
+            # Xử lý file trên pipeline, trả luồng tải cho link tiếp theo
+            self._journal_state(job, STATE_POST_PROCESSING)
+            self.post_pipeline.submit(job)
+            return True
+
+        if not self.stop_flag and self._retry_later(job):
+            return False
+        self._finish_job(job, False)
+        return False
+
+    def _on_job_error(self, job, trace):
+        """Exception không được xử lý trong _run_job (lỗi của chương trình)"""
+        self.on_message(f"❌ [{job.index}] Lỗi không xử lý được khi tải {job.url}:\n{trace}")
+
+    def _retry_later(self, job):
+        """
+        Phân loại lỗi của job; nếu là lỗi tạm thời và còn lượt thì đưa job
+        lại cuối hàng đợi sau khoảng chờ, trả về True.
+        """
+        job.error = classify(job.output_tail)
+        if not self.retry_policy.should_retry(job.error, job.attempt):
+            return False
+        delay = self.retry_policy.delay(job.error, job.attempt)
+        self.on_message(
+            f"🔁 [{job.index}] {job.error.label}: thử lại lần {job.attempt} "
+            f"sau {delay:.0f}s (cuối hàng đợi)")
+        if job.error.category == ERR_RATE_LIMITED:
+            # Trang đã giới hạn truy cập thì các link khác của trang cũng phải
+            # chờ, các trang khác vẫn tải tiếp
+            self.scheduler.hold_domain(job.domain, delay)
+            self.on_message(f"⏳ Tạm ngưng link mới của {job.domain} trong {delay:.0f}s")
+        job.files = []
+        self._journal_state(job, STATE_QUEUED)
+        self.on_progress(int(self.progress_model.update(job, 0)))
+        self.scheduler.requeue(job, delay)
+        return True
+
+    def _log_domains(self, jobs):
+        """Log số link và giới hạn của từng trang khi lô có nhiều trang"""
+        counts = {}
+        for job in jobs:
+            counts[job.domain] = counts.get(job.domain, 0) + 1
+        if len(counts) < 2:
+            return
+        parts = []
+        for domain, count in counts.items():
+            max_jobs, interval = self.domain_limits.limit(domain)
+            limits = [f"≤{max_jobs} cùng lúc"] if max_jobs else []
+            if interval:
+                limits.append(f"cách {interval:g}s")
+            parts.append(f"{domain} {count}" + (f" ({', '.join(limits)})" if limits else ""))
+        self.on_message("🌍 Tải xen kẽ theo trang: " + "; ".join(parts))
+
+    def _write_failure_report(self, download_folder):
+        """Ghi các link lỗi vào file để chạy lại sau"""
+        with self._failures_lock:
+            failures = list(self.failures)
+        if not failures:
+            return
+        path = os.path.join(download_folder, REPORT_FILE)
+        try:
+            write_report(path, failures)
+        except OSError as e:
+            self.on_message(f"⚠️ Không ghi được danh sách link lỗi: {e}")
+            return
+        self.on_message(
+            f"📄 {len(failures)} link lỗi được ghi vào {path} "
+            "(nhập lại file này để tải lại)")
+
+    def _start_bandwidth(self, job):
+        """Cấp phần băng thông cho job sắp tải (nếu có giới hạn chung)"""
+        if not self.bandwidth:
+            return
+        # Số job sẽ chạy cùng lúc: phần chia đều cho tiến trình yt-dlp.exe
+        concurrency = min(self.max_concurrent, len(self.scheduler.active_jobs())
+                          + len(self.scheduler.pending_jobs()))
+        rate = self.bandwidth.start(job.index, adjustable=self.engine is not None,
+                                    concurrency=concurrency)
+        if rate and self.engine:
+            self.on_message(f"🌐 [{job.index}] Giới hạn tốc độ: {format_rate(rate)} "
+                            "(chia lại khi số link đang tải thay đổi)")
+        elif rate:
+            self.on_message(f"🌐 [{job.index}] Giới hạn tốc độ: {format_rate(rate)}")
+
+    def _finish_job(self, job, success):
+        """Kết thúc một job (sau khi tải lỗi hoặc sau khi xử lý file xong)"""
+        if success:
+            self.on_message(f"✅ Hoàn thành link URL: {job.url}")
+            self._journal_state(job, STATE_DONE)
+        elif not self.stop_flag:
+            if job.error:
+                self.on_message(f"❌ Lỗi khi tải link: {job.url} ({job.error.label})")
+                with self._failures_lock:
+                    self.failures.append((job.url, job.error))
+            else:
+                self.on_message(f"❌ Lỗi khi tải link: {job.url}")
+            self._journal_state(job, STATE_FAILED)
+
+        overall = self.progress_model.finish(job)
+        self.on_progress(int(overall))
+        self.on_job_finished(job, success)
+
+    def _post_process_job(self, job):
+        """
+        Xử lý file của một job đã tải xong (chạy trên thread của pipeline).
+        Trả về None nếu job được chuyển sang TranscodePool, job sẽ kết thúc
+        khi ffmpeg chuyển xong mọi file của nó.
+        """
+        try:
+            self._post_process_files(job)
+            if self.transcode_pool and self._submit_transcodes(job):
+                return None
+            self._record_archive(job)
+            return True
+        except Exception as e:
+            self.on_message(f"⚠️ [{job.index}] Lỗi xử lý file sau tải: {e}")
+            return False
+
+    def _ffmpeg_executable(self):
+        """ffmpeg để chuyển đổi âm thanh, None nếu không tìm thấy"""
+        if self.ffmpeg_path and os.path.exists(self.ffmpeg_path):
+            return self.ffmpeg_path
+        return shutil.which("ffmpeg")
+
+    def _start_transcode_pool(self):
+        """Tạo TranscodePool cho chế độ âm thanh (nếu có ffmpeg)"""
+        ffmpeg = self._ffmpeg_executable()
+        if not ffmpeg:
+            # Không có ffmpeg riêng: để yt-dlp tự --extract-audio như trước
+            return
+        self.transcode_pool = TranscodePool(
+            ffmpeg, workers=self.transcode_workers or None).start()
+        action = "Giữ âm thanh gốc" if self.keep_original_audio else "Chuyển MP3"
+        self.on_message(
+            f"🎵 {action} song song tối đa {self.transcode_pool.workers} file (ffmpeg)")
+
+    def _submit_transcodes(self, job):
+        """Đưa các file âm thanh của job vào TranscodePool, trả về False nếu không có file nào"""
+        tasks = []
+        for info in job.files:
+            for path in info["files"]:
+                steps = plan_audio(path, self.keep_original_audio)
+                if steps and os.path.exists(path):
+                    tasks.append(TranscodeTask(
+                        path, steps,
+                        on_done=lambda task, info=info: self._on_transcoded(job, info, task)))
+        if not tasks:
+            return False
+
+        with self._transcode_lock:
+            self._transcoding[job.index] = [len(tasks), True]
+        for task in tasks:
+            # Chờ khi hàng đợi ffmpeg đã đầy
+            if not self.transcode_pool.submit(task):
+                task.error = "Đã dừng"
+                self._on_transcoded(job, None, task)
+        return True
+
+    def _on_transcoded(self, job, info, task):
+        """Một file của job đã chuyển xong (chạy trên thread của TranscodePool)"""
+        if task.success:
+            info["files"] = [task.output if p == task.src else p for p in info["files"]]
+            info["filepath"] = info["files"][0]
+            label = "📦 Giữ âm thanh gốc" if task.mode == MODE_COPY else "🎵 MP3"
+            self.on_message(f"{label} [{job.index}]: {os.path.basename(task.output)}")
+        elif not self.stop_flag:
+            self.on_message(
+                f"⚠️ [{job.index}] Lỗi chuyển âm thanh {os.path.basename(task.src)}: {task.error}")
+
+        with self._transcode_lock:
+            state = self._transcoding[job.index]
+            state[0] -= 1
+            state[1] = state[1] and task.success
+            if state[0] > 0:
+                return
+            success = state[1]
+            del self._transcoding[job.index]
+
+        if success:
+            self._record_archive(job)
+        self._finish_job(job, success)
+
+    def journal_options(self):
+        """Các tùy chọn tải được lưu vào journal"""
+        return {name: getattr(self, name) for name in JOURNAL_OPTIONS}
+
+    def _journal_state(self, job, state):
+        if self.journal:
+            self.journal.set_state(job.index, state)
+
+    def _resolve_metadata(self, jobs):
+        """Lấy metadata của mọi link song song trước khi tải"""
+        self.on_message(f"📋 Đang lấy thông tin {len(self.urls)} link...")
+        self.metadata_cache = MetadataCache()
+        if self.engine:
+            extract = self.engine.extract_info
+        else:
+            ytdlp_path = self._ytdlp_path()
+            def extract(url):
+                return extract_with_executable(ytdlp_path, url)
+
+        index_of = {job.url: job.index for job in jobs}
+        plans = []
+
+        def on_result(url, info, cached, error):
+            index = index_of[url]
+            if error:
+                self.on_message(f"⚠️ [{index}] Không lấy được thông tin: {error}")
+                return
+            source = " (cache)" if cached else ""
+            self.on_message(f"[{index}] {describe_info(info)}{source}")
+            plan = self._plan_formats(info)
+            if plan:
+                plans.append(plan)
+                self._plans[url] = plan
+                self.on_message(f"[{index}] {plan.describe()}")
+
+        start = time.perf_counter()
+        self.metadata = resolve_all(
+            self.urls, self.metadata_cache, extract,
+            max_workers=max(self.max_concurrent, 4), on_result=on_result,
+            should_stop=lambda: self.stop_flag)
+        self.on_message(
+            f"📋 Đã lấy thông tin trong {time.perf_counter() - start:.1f}s")
+        summary = summarize_plans(plans)
+        if summary:
+            self.on_message(summary)
+
+    def _plan_formats(self, info):
+        """Format dự kiến và chi phí ghép/chuyển đổi của một video (None nếu không rõ)"""
+        if self.subtitle_only or not is_single_video(info):
+            return None
+        # Không có ffmpeg riêng thì yt-dlp luôn chuyển MP3 (--extract-audio)
+        keep_original = self.keep_original_audio and bool(self._ffmpeg_executable())
+        return plan_formats(info, self.format_policy, audio_only=self.audio_only,
+                            keep_original_audio=keep_original)
+
+    def _preflight_disk_space(self, download_folder, jobs):
+        """So dung lượng dự kiến của cả lô (nếu có metadata) với chỗ trống của ổ đĩa"""
+        self.disk_guard = DiskGuard(download_folder, min_free=self.min_free_space)
+        try:
+            free = self.disk_guard.free_bytes()
+        except OSError as e:
+            self.on_message(f"⚠️ Không kiểm tra được dung lượng ổ đĩa: {e}")
+            return
+        message = f"💽 Ổ đĩa còn trống {format_bytes(free)}"
+        if self.metadata:
+            estimate = estimate_batch([self._plans.get(job.url) for job in jobs])
+            if estimate.known:
+                message += (f", dự kiến cần ~{format_bytes(estimate.total_bytes)} "
+                            f"cho {estimate.known} link")
+            if estimate.unknown:
+                message += f" ({estimate.unknown} link chưa rõ dung lượng)"
+            self.on_message(message)
+            if estimate.total_bytes + self.min_free_space > free:
+                self.on_message(
+                    "⚠️ Không đủ chỗ cho cả danh sách: hàng đợi sẽ tạm dừng khi ổ đĩa gần đầy")
+        else:
+            self.on_message(message)
+        self._check_disk_space()
+
+    def _watch_disk_space(self, done):
+        """Kiểm tra chỗ trống định kỳ trong khi tải (thread riêng)"""
+        while not done.wait(DISK_CHECK_INTERVAL):
+            self._check_disk_space()
+
+    def _check_disk_space(self):
+        """
+        Tạm dừng hàng đợi khi chỗ trống (sau khi các job đang chạy ghi xong)
+        không đủ cho link tiếp theo, chạy lại khi đã có chỗ.
+        """
+        if not self.disk_guard or not self.scheduler:
+            return
+        pending = self.scheduler.pending_jobs()
+        need = 0
+        if pending:
+            need = peak_bytes(self._plans.get(pending[0].url)) or 0
+        with self._disk_lock:
+            try:
+                headroom = self.disk_guard.headroom()
+                free = format_bytes(self.disk_guard.free_bytes())
+            except OSError:
+                return
+            low = bool(pending) and headroom < need
+            if low == self._disk_paused:
+                return
+            self._disk_paused = low
+            if low:
+                self.scheduler.pause()
+            else:
+                self.scheduler.resume()
+        if low:
+            self.on_message(
+                f"⏸ Tạm dừng hàng đợi: ổ đĩa còn {free} "
+                f"(giữ lại {format_bytes(self.min_free_space)}). "
+                "Giải phóng dung lượng để tải tiếp hoặc bấm Dừng")
+        else:
+            self.on_message(f"▶️ Ổ đĩa đã đủ chỗ ({free}), tiếp tục hàng đợi")
+
+    def _cached_info_file(self, url):
+        """File .info.json đã lấy trước của link (chỉ với link một video)"""
+        info = self.metadata.get(url)
+        if not info or not is_single_video(info):
+            return None
+        return self.metadata_cache.info_file(url)
+
+    def _skip_archived(self, job, download_folder):
+        """
+        Kiểm tra archive trước khi gọi yt-dlp, trả về True nếu link đã được tải
+        ở lần trước và file vẫn còn.
+        """
+        key = video_key(job.url)
+        info = self.metadata.get(job.url)
+        if not key and info and is_single_video(info) and info.get("extractor_key"):
+            # Id lấy từ metadata đã trích xuất trước
+            key = info["extractor_key"], info["id"]
+        if not key:
+            # Playlist hoặc trang không nhận diện được id từ URL:
+            # yt-dlp tự bỏ qua nhờ --download-archive
+            return False
+
+        existing = self.archive.find_existing(*key)
+        if not existing:
+            return False
+
+        if self.link_existing:
+            try:
+                dst, linked = link_into_folder(existing, download_folder)
+                action = "Hard-link" if linked else "Sao chép"
+                self.on_message(
+                    f"🔗 [{job.index}] {action} file đã tải: {os.path.basename(dst)}")
+                return True
+            except OSError as e:
+                self.on_message(f"⚠️ [{job.index}] Không đưa được file đã có vào thư mục: {e}")
+                return False
+
+        self.on_message(f"⏭️ [{job.index}] Đã tải trước đó, bỏ qua: {existing}")
+        return True
+
+    def _create_download_folder(self):
+        """Tạo thư mục download với cấu trúc đơn giản"""
+        base_folder = "Video"
+        os.makedirs(base_folder, exist_ok=True)
+        
+        if self.custom_folder_name:
+            # Nếu có tên thư mục tùy chọn
+            if os.path.isabs(self.custom_folder_name):
+                # Đường dẫn đầy đủ
+                date_folder = self.custom_folder_name
+            else:
+                # Tên thư mục - tạo trong thư mục Video
+                date_folder = os.path.join(base_folder, self.custom_folder_name)
+        else:
+            # Không có tên tùy chọn - tạo theo ngày
+            date_str = datetime.now().strftime("%Y-%m-%d")
+            date_folder = os.path.join(base_folder, date_str)
+        
+        # Tạo thư mục con với số thứ tự (01, 02, 03...)
+        download_folder = self._create_numbered_subfolder(date_folder)
+        
+        os.makedirs(download_folder, exist_ok=True)
+        return download_folder
+    
+    def _create_numbered_subfolder(self, date_folder):
+        """Tạo thư mục con với số thứ tự (01, 02, 03...)"""
+        if not os.path.exists(date_folder):
+            os.makedirs(date_folder, exist_ok=True)
+        
+        # Tìm số thứ tự cao nhất trong thư mục ngày
+        max_number = 0
+        for item in os.listdir(date_folder):
+            item_path = os.path.join(date_folder, item)
+            if os.path.isdir(item_path) and item.isdigit():
+                max_number = max(max_number, int(item))
+        
+        # Tạo thư mục con mới với số tiếp theo (format 2 chữ số)
+        next_number = max_number + 1
+        subfolder_name = f"{next_number:02d}"
+        download_folder = os.path.join(date_folder, subfolder_name)
+        
+        return download_folder
+
+    def _download_single_url(self, job, download_folder):
+        """Download một URL đơn"""
+        if self.engine:
+            return self._download_in_process(job, download_folder)
+
+        cmd = self._build_command(job.url, download_folder, job.index)
+        info_file = self._cached_info_file(job.url)
+        if info_file:
+            # Tải từ info-json đã có thay vì gọi extractor lần nữa
+            cmd = [cmd[0], "--load-info-json", info_file] + cmd[2:]
+
+        # Thiết lập creation flags để ẩn console window trên Windows
+        creation_flags = 0
+        if sys.platform == "win32":
+            creation_flags = subprocess.CREATE_NO_WINDOW
+
+        job.process = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True, bufsize=1, creationflags=creation_flags
+        )
+
+        for line in job.process.stdout:
+            if self.stop_flag:
+                job.terminate()
+                self.on_message(f"⏹ [{job.index}] Đang dừng...")
+                break
+
+            self._handle_output_line(job, line)
+
+        job.process.wait()
+        return job.process.returncode == 0
+
+    def _download_in_process(self, job, download_folder):
+        """Download một URL bằng thư viện yt_dlp, dùng lại instance YoutubeDL"""
+        cmd = self._build_command(job.url, download_folder, job.index)
+
+        return self.engine.download(
+            cmd,
+            on_message=lambda msg: self._handle_output_line(job, msg),
+            on_progress=lambda d: self._update_progress_from_hook(job, d),
+            should_stop=lambda: self.stop_flag,
+            info_file=self._cached_info_file(job.url),
+            rate_limit=(lambda: self.bandwidth.rate_for(job.index)) if self.bandwidth else None)
+
+    def _ytdlp_path(self):
+        """Đường dẫn yt-dlp để chạy tiến trình"""
+        # Sử dụng yt-dlp đã được kiểm tra từ trước
+        if self.ytdlp_path:
+            ytdlp_path = self.ytdlp_path
+        else:
+            # Fallback - tìm lại nếu cần
+            ytdlp_path = None
+            possible_paths = [
+                "yt-dlp.exe",  # Trong PATH
+                "yt-dlp",      # Fallback cho Linux/Mac
+            ]
+
+            for path in possible_paths:
+                if os.path.exists(path):
+                    ytdlp_path = path
+                    break
+
+            if not ytdlp_path:
+                # Fallback to system yt-dlp
+                ytdlp_path = "yt-dlp"
+        return ytdlp_path
+
+    def _build_command(self, url, download_folder, index):
+        """Xây dựng lệnh yt-dlp"""
+        # --continue: tiếp tục từ file .part nếu lần trước tải dở
+        cmd = [self._ytdlp_path(), url, "--progress", "--continue"]
+
+        # Tiến trình dạng JSON, mỗi lần cập nhật một dòng
+        cmd += PROGRESS_ARGS
+
+        # Thêm đường dẫn ffmpeg nếu tồn tại
+        if self.ffmpeg_path and os.path.exists(self.ffmpeg_path):
+            cmd += ["--ffmpeg-location", self.ffmpeg_path]
+
+        if self.subtitle_only:
+            cmd.append("--skip-download")
+            self.on_message("📝 Chế độ: Chỉ tải phụ đề")
+        elif self.audio_only and self.transcode_pool:
+            # Chỉ tải luồng âm thanh gốc, TranscodePool chuyển đổi sau
+            cmd += format_args(self.format_policy, audio_only=True,
+                               keep_original_audio=self.keep_original_audio)
+        elif self.audio_only:
+            # yt-dlp tự --extract-audio sang MP3
+            cmd += format_args(self.format_policy, audio_only=True)
+        else:
+            # Video + âm thanh ghép bằng copy vào container hợp với codec
+            cmd += format_args(self.format_policy)
+
+
+
+        # Template output
+        if self.video_mode:
+            if index ==1:
+                output_template = f"%(title)s.%(ext)s" 
+            else:
+                output_template = f"video_{index}_%(title)s.%(ext)s" 
+        else:
+            if index == 1:
+                output_template = f"%(autonumber)03d_%(title)s.%(ext)s"
+                cmd.append("--yes-playlist")
+            else:
+                output_template = f"playlist_{index}_%(autonumber)03d_%(title)s.%(ext)s"
+                cmd.append("--yes-playlist")
+        cmd += ["-o", os.path.join(download_folder, output_template)]
+
+        if not self.subtitle_only:
+            self._add_fragment_options(cmd, index)
+
+        rate = self.bandwidth.rate_for(index) if self.bandwidth else None
+        if rate:
+            cmd += ["--limit-rate", str(int(rate))]
+
+        if self.audio_only and not self.subtitle_only and not self.transcode_pool:
+            cmd += ["--extract-audio", "--audio-format", "mp3"]
+
+        # Xử lý phụ đề
+        if self.sub_mode != SUB_MODE_NONE:
+            self._add_subtitle_options(cmd)
+
+        if self.convert_srt:
+            cmd += ["--convert-subs", "srt"]
+        if self.include_thumb:
+            cmd.append("--write-thumbnail")
+
+        if self.archive:
+            # yt-dlp tự bỏ qua video trong playlist đã có
+            cmd += ["--download-archive", self.archive.ytdlp_archive]
+
+        # In đường dẫn các file đã tạo: xử lý sau tải và archive chỉ dùng
+        # đúng các file này
+        cmd += FILE_ARGS
+
+        return cmd
+
+    def _add_fragment_options(self, cmd, index):
+        """Thêm tùy chọn tải nhiều fragment/nhiều kết nối cùng lúc"""
+        if self.fragment_tuner:
+            fragments = self.fragment_tuner.suggest()
+        else:
+            fragments = self.concurrent_fragments
+        self._job_fragments[index] = fragments
+        cmd += ["--concurrent-fragments", str(fragments)]
+
+        if self.external_downloader:
+            # aria2c chia file HTTP thành nhiều đoạn tải song song; DASH/HLS
+            # vẫn dùng downloader của yt-dlp với --concurrent-fragments
+            cmd += ["--downloader", f"http:{self.external_downloader}",
+                    "--downloader-args",
+                    f"aria2c:-x {fragments} -s {fragments} -k 1M --summary-interval=1"]
+
+    def _add_subtitle_options(self, cmd):
+        """Thêm tùy chọn phụ đề vào lệnh"""
+        # sub_lang bây giờ là string đơn thay vì list
+        lang_string = self.sub_lang
+        lang_display = self.sub_lang
+
+        if self.sub_mode == SUB_MODE_OFFICIAL:
+            cmd += ["--write-subs", "--sub-langs", lang_string]
+            self.on_message(
+                f"🔤 Tải phụ đề chính thức cho ngôn ngữ: {lang_display}")
+        elif self.sub_mode == SUB_MODE_AUTO:
+            cmd += ["--write-auto-subs", "--sub-langs", lang_string]
+            self.on_message(
+                f"🤖 Tải phụ đề tự động cho ngôn ngữ: {lang_display}")
+
+        # Thêm các tùy chọn để đảm bảo tải được phụ đề
+        cmd += [
+            "--ignore-errors",           # Bỏ qua lỗi nếu một ngôn ngữ không có
+            "--no-warnings",            # Không hiển thị cảnh báo
+            "--sub-format", "srt/best"  # Ưu tiên định dạng SRT
+        ]
+
+        # Debug: In ra lệnh phụ đề
+        self.on_message(f"🔧 Debug: Lệnh phụ đề = --sub-langs {lang_string}")
+
+    def _handle_output_line(self, job, line):
+        """Xử lý một dòng output của yt-dlp (stdout của tiến trình hoặc logger)"""
+        # Dòng JSON tiến trình: không đưa vào log thô
+        event = parse_progress_line(line)
+        if event:
+            self._handle_progress_event(job, event)
+            return
+
+        file_info = parse_file_line(line)
+        if file_info:
+            job.files.append(file_info)
+            for path in file_info["files"] + file_info["subtitles"]:
+                # Khi chỉ tải phụ đề, file video chỉ là tên dự kiến
+                if os.path.exists(path):
+                    self.on_message(f"[{job.index}] 💾 {os.path.basename(path)}")
+            return
+
+        line = line.strip()
+        if line:
+            job.output_tail.append(line)
+            self._update_progress_from_line(job, line)
+
+    def _record_archive(self, job):
+        """Ghi các file job đã tải xong vào archive"""
+        if not self.archive:
+            return
+        for info in job.files:
+            path = info.get("filepath")
+            if not path or not info.get("id") or not info.get("extractor_key"):
+                continue
+            if not os.path.exists(path):
+                continue
+            try:
+                self.archive.record(info["extractor_key"], info["id"],
+                                    info.get("webpage_url") or job.url, path)
+            except OSError as e:
+                self.on_message(f"⚠️ [{job.index}] Không ghi được archive: {e}")
+
+    def _update_progress_from_line(self, job, line):
+        """Ghi log và cập nhật progress từ dòng text của yt-dlp"""
+        percent = parse_text_percent(line)
+        if percent is None:
+            self.on_message(f"[{job.index}] {line}")
+            return
+
+        # Dòng tiến trình dạng text (khi yt-dlp không in JSON): thay tại chỗ
+        self.on_status(self._status_key(job), f"[{job.index}] {line}")
+        overall = self.progress_model.update(job, percent)
+        self.on_progress(int(overall))
+
+    def _update_progress_from_hook(self, job, d):
+        """Cập nhật progress từ dict của progress_hooks"""
+        self._handle_progress_event(job, ProgressEvent.from_dict(d))
+
+    def _handle_progress_event(self, job, event):
+        """Xử lý một ProgressEvent: cập nhật thanh tiến trình và log"""
+        percent = event.percent
+        if percent is not None:
+            overall = self.progress_model.update(job, percent)
+            self.on_progress(int(overall))
+        self.on_job_progress(job, event)
+
+        if self.disk_guard:
+            self.disk_guard.update(job.index, event.filename,
+                                   event.downloaded_bytes, event.total_bytes)
+        if event.fragment_count:
+            self._fragmented_jobs.add(job.index)
+        if event.status == "finished":
+            self._record_throughput(job, event)
+
+        # Dòng tiến trình của mỗi job được thay tại chỗ trong log,
+        # giới hạn 4 lần/giây để không dồn signal sang luồng giao diện
+        now = time.monotonic()
+        if event.status != "downloading" or \
+                now - self._last_progress_report.get(job.index, 0) >= 0.25:
+            self._last_progress_report[job.index] = now
+            self.on_status(
+                self._status_key(job), f"[{job.index}] {event.format_line()}")
+
+    def _record_throughput(self, job, event):
+        """Báo tốc độ của file vừa tải xong cho FragmentTuner"""
+        if not self.fragment_tuner or not event.elapsed:
+            return
+        # Chỉ video DASH/HLS (hoặc tải qua aria2c) mới chịu ảnh hưởng của số fragment
+        if job.index not in self._fragmented_jobs and not self.external_downloader:
+            return
+        fragments = self._job_fragments.get(job.index)
+        num_bytes = event.total_bytes or event.downloaded_bytes or 0
+        self.fragment_tuner.record(fragments, num_bytes, event.elapsed)
+
+    def _status_key(self, job):
+        """Khóa dòng trạng thái của job trong log"""
+        return f"job-{job.index}-{job.url}"
+
+    def _post_process_files(self, job):
+        """
+        Sửa tên các file job vừa tạo. Chỉ xử lý đúng các đường dẫn yt-dlp đã
+        báo (dòng [DLFILE]) nên không quét thư mục và không đụng file của
+        job khác trong cùng thư mục.
+        """
+        if self.sub_mode != SUB_MODE_NONE:
+            self.on_message(
+                f"🔄 [{job.index}] Xử lý phụ đề cho ngôn ngữ: {self.sub_lang}")
+            if not any(info["subtitles"] for info in job.files):
+                self.on_message(
+                    f"⚠️ [{job.index}] Không có file phụ đề cho ngôn ngữ: {self.sub_lang}")
+
+        for info in job.files:
+            if self.sub_mode != SUB_MODE_NONE:
+                info["subtitles"] = [
+                    self._rename_output(job, path, fixed_subtitle_name(path, self.sub_lang))
+                    for path in info["subtitles"]]
+            info["files"] = [self._rename_output(job, path, fixed_media_name(path))
+                             for path in info["files"]]
+            info["filepath"] = info["files"][0] if info["files"] else None
+
+    def _rename_output(self, job, path, new_path):
+        """Đổi tên path thành new_path nếu được, trả về đường dẫn hiện tại của file"""
+        if new_path == path or not os.path.exists(path):
+            return path
+        old_name, new_name = os.path.basename(path), os.path.basename(new_path)
+        if os.path.exists(new_path):
+            self.on_message(f"⚠️ [{job.index}] File đã tồn tại: {new_name}")
+            return path
+        try:
+            os.rename(path, new_path)
+        except OSError as e:
+            self.on_message(f"⚠️ [{job.index}] Không đổi tên được {old_name}: {e}")
+            return path
+        self.on_message(f"📝 [{job.index}] Sửa tên: {old_name} → {new_name}")
+        return new_path
@@ -0,0 +1,332 @@
+"""
+Bộ lập lịch tải song song cho DownloadWorker.
+
+Module này không phụ thuộc Qt: mỗi URL là một DownloadJob, DownloadScheduler
+chạy tối đa N job cùng lúc trên các thread thường, còn ProgressModel gom
+tiến trình của tất cả job thành một con số chung cho thanh tiến trình.
+
+Job được xếp hàng theo tên miền (url_utils.domain_key) và lấy lần lượt xen
+kẽ giữa các tên miền. DomainLimits giới hạn số job cùng lúc và khoảng cách
+tối thiểu giữa hai lần bắt đầu job của mỗi trang, nên một lô trộn YouTube,
+TikTok, Facebook không dồn hết luồng vào một trang (dễ bị 429) trong khi các
+trang khác ngồi chờ.
+"""
+
+import threading
+import time
+import traceback
+from collections import deque
+
+from url_utils import domain_key
+
+
+# Trạng thái của một job
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_STOPPED = "stopped"
+
+DEFAULT_MAX_CONCURRENT = 3
+
+# Tên miền -> (số job cùng lúc, số giây tối thiểu giữa hai lần bắt đầu job)
+DEFAULT_DOMAIN_LIMITS = {
+    "youtube.com": (4, 1.0),
+    "tiktok.com": (2, 2.0),
+    "facebook.com": (2, 2.0),
+    "instagram.com": (1, 3.0),
+}
+
+
+class DownloadJob:
+    """Thông tin một URL cần tải"""
+
+    def __init__(self, index, url):
+        self.index = index
+        self.url = url
+        self.state = JOB_QUEUED
+        self.percent = 0.0
+        self.process = None  # subprocess.Popen khi đang chạy yt-dlp
+        self.files = []  # Thông tin các file yt-dlp đã tải xong (dòng [DLFILE])
+        self.attempt = 0  # Số lần đã chạy (tính cả lần đang chạy)
+        self.not_before = 0.0  # time.monotonic() sớm nhất được chạy lại
+        self.output_tail = deque(maxlen=30)  # Các dòng log cuối để phân loại lỗi
+        self.error = None  # error_classifier.ErrorInfo của lần tải lỗi gần nhất
+        self.domain = domain_key(url)
+
+    def terminate(self):
+        """Dừng tiến trình con của job (nếu có)"""
+        process = self.process
+        if process and process.poll() is None:
+            try:
+                process.terminate()
+            except OSError:
+                pass
+
+    def __repr__(self):
+        return f"DownloadJob({self.index}, {self.url!r}, {self.state})"
+
+
+class ProgressModel:
+    """Tiến trình chung của cả batch, an toàn khi gọi từ nhiều thread"""
+
+    def __init__(self, jobs):
+        self._lock = threading.Lock()
+        self._jobs = list(jobs)
+
+    def update(self, job, percent):
+        """Cập nhật % của một job, trả về % chung của cả batch"""
+        with self._lock:
+            job.percent = max(0.0, min(100.0, float(percent)))
+            return self._overall()
+
+    def finish(self, job):
+        """Đánh dấu job đã xử lý xong, trả về % chung của cả batch"""
+        with self._lock:
+            job.percent = 100.0
+            return self._overall()
+
+    def overall(self):
+        """% chung của cả batch"""
+        with self._lock:
+            return self._overall()
+
+    def _overall(self):
+        if not self._jobs:
+            return 100.0
+        return sum(job.percent for job in self._jobs) / len(self._jobs)
+
+
+class DomainLimits:
+    """Giới hạn số job cùng lúc và khoảng cách bắt đầu job của từng tên miền"""
+
+    def __init__(self, limits=None, default=(None, 0.0)):
+        """
+        limits: tên miền -> (số job cùng lúc hoặc None, số giây tối thiểu),
+        mặc định DEFAULT_DOMAIN_LIMITS. default áp dụng cho tên miền khác
+        (None = chỉ theo giới hạn chung của scheduler).
+        """
+        self.limits = dict(DEFAULT_DOMAIN_LIMITS if limits is None else limits)
+        self.default = default
+
+    def limit(self, domain):
+        """(số job cùng lúc hoặc None, số giây tối thiểu) của tên miền"""
+        return self.limits.get(domain, self.default)
+
+    @staticmethod
+    def parse(spec):
+        """
+        "youtube.com=2:1.5" -> ("youtube.com", (2, 1.5)); "tiktok.com=1"
+        chỉ đặt số job cùng lúc. ValueError nếu sai định dạng.
+        """
+        domain, sep, value = spec.partition("=")
+        if not sep or not domain.strip():
+            raise ValueError(f"Giới hạn tên miền không hợp lệ: {spec!r} (vd. youtube.com=2:1.5)")
+        concurrent, _, interval = value.partition(":")
+        try:
+            limit = (max(1, int(concurrent)), max(0.0, float(interval or 0)))
+        except ValueError:
+            raise ValueError(f"Giới hạn tên miền không hợp lệ: {spec!r} (vd. youtube.com=2:1.5)")
+        return domain_key(f"https://{domain.strip()}/"), limit
+
+
+class DownloadScheduler:
+    """Chạy các DownloadJob song song với giới hạn số luồng chung và theo tên miền"""
+
+    def __init__(self, run_job, max_concurrent=DEFAULT_MAX_CONCURRENT, domain_limits=None,
+                 on_error=None):
+        """
+        run_job(job) được gọi trên thread riêng cho mỗi job và trả về True
+        nếu tải thành công. domain_limits là DomainLimits (None = mặc định).
+        run_job raise exception thì job lỗi, traceback được ghi vào
+        job.output_tail và gửi cho on_error(job, traceback) nếu có.
+        """
+        self.run_job = run_job
+        self.on_error = on_error
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.domain_limits = domain_limits or DomainLimits()
+        self.stop_flag = False
+        # Tạm dừng: không chạy job mới, các job đang chạy vẫn tiếp tục
+        self.paused = False
+        self._queues = {}  # tên miền -> deque các job đang chờ
+        self._rotation = deque()  # Thứ tự lấy xen kẽ các tên miền còn job chờ
+        self._pending_count = 0
+        self._domain_active = {}  # tên miền -> số job đang chạy
+        self._domain_ready_at = {}  # tên miền -> time.monotonic() sớm nhất được chạy job mới
+        self._active = set()
+        self._retry = set()  # Job đang chạy sẽ được đưa lại cuối hàng đợi
+        self._cond = threading.Condition()
+
+    def submit(self, job):
+        """Thêm job vào hàng đợi"""
+        with self._cond:
+            job.state = JOB_QUEUED
+            self._enqueue(job)
+            self._cond.notify_all()
+
+    def run(self):
+        """Chạy tới khi mọi job xong hoặc bị dừng (blocking)"""
+        with self._cond:
+            while True:
+                while (not self.stop_flag and not self.paused and self._pending_count
+                       and len(self._active) < self.max_concurrent):
+                    job = self._next_ready()
+                    if job is None:
+                        break
+                    self._start(job)
+
+                if not self._active and (self.stop_flag or not self._pending_count):
+                    break
+                self._cond.wait(self._wait_timeout())
+
+            # Các job chưa kịp chạy được đánh dấu là đã dừng
+            for queue in self._queues.values():
+                for job in queue:
+                    job.state = JOB_STOPPED
+            self._queues.clear()
+            self._rotation.clear()
+            self._pending_count = 0
+
+    def stop(self):
+        """Dừng tất cả: không nhận job mới và kết thúc mọi tiến trình con"""
+        with self._cond:
+            self.stop_flag = True
+            active = list(self._active)
+            self._cond.notify_all()
+
+        for job in active:
+            job.terminate()
+
+    def requeue(self, job, delay=0.0):
+        """
+        Gọi từ run_job của job đang chạy: khi run_job trả về, job được đưa
+        lại cuối hàng đợi và chỉ chạy lại sau delay giây.
+        """
+        with self._cond:
+            job.not_before = time.monotonic() + delay
+            self._retry.add(job)
+
+    def hold_domain(self, domain, delay):
+        """Không chạy job mới của tên miền trong delay giây (vd. sau khi bị 429)"""
+        with self._cond:
+            ready_at = time.monotonic() + delay
+            self._domain_ready_at[domain] = max(self._domain_ready_at.get(domain, 0.0), ready_at)
+
+    def pause(self):
+        """Không chạy thêm job mới cho tới khi resume()"""
+        with self._cond:
+            self.paused = True
+
+    def resume(self):
+        """Tiếp tục chạy các job đang chờ"""
+        with self._cond:
+            self.paused = False
+            self._cond.notify_all()
+
+    def pending_jobs(self):
+        """Danh sách job đang chờ chạy, theo thứ tự sẽ được lấy ra (gần đúng)"""
+        with self._cond:
+            return [job for domain in self._rotation for job in self._queues[domain]]
+
+    def active_jobs(self):
+        """Danh sách job đang chạy"""
+        with self._cond:
+            return list(self._active)
+
+    def _enqueue(self, job):
+        """Thêm job vào cuối hàng đợi của tên miền (gọi khi đang giữ lock)"""
+        queue = self._queues.get(job.domain)
+        if queue is None:
+            queue = self._queues[job.domain] = deque()
+            self._rotation.append(job.domain)
+        queue.append(job)
+        self._pending_count += 1
+
+    def _domain_available(self, domain, now):
+        """Tên miền còn chỗ chạy thêm job và đã qua khoảng cách tối thiểu"""
+        max_jobs, _ = self.domain_limits.limit(domain)
+        if max_jobs and self._domain_active.get(domain, 0) >= max_jobs:
+            return False
+        return self._domain_ready_at.get(domain, 0.0) <= now
+
+    def _next_ready(self):
+        """
+        Lấy job kế tiếp, xen kẽ giữa các tên miền: tên miền vừa được chạy
+        chuyển xuống cuối vòng (gọi khi đang giữ lock).
+        """
+        now = time.monotonic()
+        for _ in range(len(self._rotation)):
+            domain = self._rotation[0]
+            self._rotation.rotate(-1)
+            if not self._domain_available(domain, now):
+                continue
+            queue = self._queues[domain]
+            job = next((job for job in queue if job.not_before <= now), None)
+            if job is None:
+                continue
+            queue.remove(job)
+            self._pending_count -= 1
+            if not queue:
+                del self._queues[domain]
+                self._rotation.remove(domain)
+            return job
+        return None
+
+    def _wait_timeout(self):
+        """Thời gian chờ tới khi có tên miền/job đang chờ được chạy sớm nhất"""
+        if (self.stop_flag or self.paused or not self._pending_count
+                or len(self._active) >= self.max_concurrent):
+            return None
+        times = []
+        for domain, queue in self._queues.items():
+            max_jobs, _ = self.domain_limits.limit(domain)
+            if max_jobs and self._domain_active.get(domain, 0) >= max_jobs:
+                continue  # Chờ job của tên miền này kết thúc (có notify)
+            earliest = min(job.not_before for job in queue)
+            times.append(max(earliest, self._domain_ready_at.get(domain, 0.0)))
+        if not times:
+            return None
+        return max(0.05, min(times) - time.monotonic())
+
+    def _start(self, job):
+        """Khởi động job trên thread riêng (gọi khi đang giữ lock)"""
+        job.state = JOB_RUNNING
+        job.attempt += 1
+        self._active.add(job)
+        self._domain_active[job.domain] = self._domain_active.get(job.domain, 0) + 1
+        _, interval = self.domain_limits.limit(job.domain)
+        if interval:
+            self._domain_ready_at[job.domain] = max(
+                self._domain_ready_at.get(job.domain, 0.0), time.monotonic() + interval)
+        thread = threading.Thread(
+            target=self._run_job, args=(job,), daemon=True,
+            name=f"download-job-{job.index}")
+        thread.start()
+
+    def _run_job(self, job):
+        success = False
+        try:
+            success = self.run_job(job)
+        except Exception:
+            success = False
+            trace = traceback.format_exc()
+            job.output_tail.extend(trace.rstrip().splitlines())
+            if self.on_error:
+                try:
+                    self.on_error(job, trace)
+                except Exception:
+                    pass
+        finally:
+            with self._cond:
+                self._domain_active[job.domain] -= 1
+                if job in self._retry and not self.stop_flag:
+                    job.state = JOB_QUEUED
+                    self._enqueue(job)
+                elif self.stop_flag and not success:
+                    job.state = JOB_STOPPED
+                else:
+                    job.state = JOB_DONE if success else JOB_FAILED
+                self._retry.discard(job)
+                job.process = None
+                self._active.discard(job)
+                self._cond.notify_all()
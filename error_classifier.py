@@ -0,0 +1,157 @@
+"""
+Phân loại lỗi tải của yt-dlp và chính sách tải lại.
+
+Trước đây link lỗi chỉ được báo "❌ Lỗi khi tải link" rồi bỏ qua. Giờ các
+dòng output cuối của yt-dlp (hoặc exception) được đưa vào classify() để biết
+nguyên nhân: bị giới hạn (HTTP 429), bị chặn (403), chặn theo quốc gia,
+video riêng tư, mạng chập chờn, lỗi ffmpeg... Lỗi tạm thời được tải lại sau
+một khoảng chờ tăng dần có jitter (RetryPolicy), lỗi cố định được ghi vào
+file báo cáo để chạy lại sau. Module không phụ thuộc Qt.
+"""
+
+import os
+import random
+import re
+from datetime import datetime
+
+
+ERR_RATE_LIMITED = "rate_limited"
+ERR_FORBIDDEN = "forbidden"
+ERR_GEO_BLOCKED = "geo_blocked"
+ERR_PRIVATE = "private"
+ERR_UNAVAILABLE = "unavailable"
+ERR_NETWORK = "network"
+ERR_FFMPEG = "ffmpeg"
+ERR_DISK_FULL = "disk_full"
+ERR_UNKNOWN = "unknown"
+
+ERROR_LABELS = {
+    ERR_RATE_LIMITED: "Bị giới hạn truy cập (429)",
+    ERR_FORBIDDEN: "Bị từ chối (403)",
+    ERR_GEO_BLOCKED: "Bị chặn theo quốc gia",
+    ERR_PRIVATE: "Video riêng tư/cần đăng nhập",
+    ERR_UNAVAILABLE: "Video không tồn tại/đã bị xóa",
+    ERR_NETWORK: "Lỗi mạng",
+    ERR_FFMPEG: "Lỗi ffmpeg",
+    ERR_DISK_FULL: "Ổ đĩa đầy",
+    ERR_UNKNOWN: "Lỗi không rõ",
+}
+
+# Lỗi có thể hết khi thử lại sau một lúc. Ổ đĩa đầy không thử lại: DiskGuard
+# tạm dừng hàng đợi khi thiếu chỗ, thử lại chỉ làm hết lượt của link
+TRANSIENT_ERRORS = frozenset({
+    ERR_RATE_LIMITED, ERR_FORBIDDEN, ERR_NETWORK, ERR_UNKNOWN,
+})
+
+# Thứ tự kiểm tra: mẫu cụ thể trước (vd. "HTTP Error 404" nằm trong
+# "Unable to download webpage" cũng là lỗi mạng)
+_PATTERNS = [
+    (ERR_DISK_FULL, r"no space left on device|errno 28\b|disk full"),
+    (ERR_RATE_LIMITED, r"http error 429|too many requests|rate.?limit|not a bot"),
+    (ERR_FORBIDDEN, r"http error 403|\bforbidden\b"),
+    (ERR_GEO_BLOCKED, r"not available in your country|geo.?restrict|"
+                      r"not made this video available in your country|"
+                      r"not available from your location"),
+    (ERR_PRIVATE, r"private video|video is private|sign in to confirm your age|"
+                  r"members.only|join this channel|login required|"
+                  r"requires? (?:authentication|login)|account cookies"),
+    (ERR_UNAVAILABLE, r"video unavailable|has been removed|http error 404|"
+                      r"does not exist|unsupported url|no video formats found|"
+                      r"is not a valid url"),
+    (ERR_NETWORK, r"connection (?:reset|refused|aborted)|timed? ?out|"
+                  r"temporary failure in name resolution|name or service not known|"
+                  r"getaddrinfo failed|network is unreachable|remote end closed|"
+                  r"incompleteread|eof occurred|http error 5\d\d|"
+                  r"unable to download (?:webpage|video data)|did not get any data"),
+    # Không khớp các dòng thông tin bình thường như "[Merger] Merging formats..."
+    (ERR_FFMPEG, r"postprocessing:|ffmpeg.*(?:error|not found|not installed)|"
+                 r"ffprobe.*(?:error|not found)|conversion failed"),
+]
+_COMPILED = [(category, re.compile(pattern, re.IGNORECASE)) for category, pattern in _PATTERNS]
+
+REPORT_FILE = "failed_links.txt"
+
+
+class ErrorInfo:
+    """Nguyên nhân lỗi của một lần tải"""
+
+    def __init__(self, category, message):
+        self.category = category
+        self.message = message  # Dòng lỗi gốc (rút gọn)
+
+    @property
+    def transient(self):
+        return self.category in TRANSIENT_ERRORS
+
+    @property
+    def label(self):
+        return ERROR_LABELS.get(self.category, self.category)
+
+    def __repr__(self):
+        return f"ErrorInfo({self.category!r}, {self.message!r})"
+
+
+def _match(line):
+    for category, pattern in _COMPILED:
+        if pattern.search(line):
+            return category
+    return None
+
+
+def classify(lines):
+    """
+    ErrorInfo từ các dòng output cuối của yt-dlp (hoặc text của exception).
+    Chỉ các dòng "ERROR" được phân loại, dòng cuối cùng được xét trước; các
+    dòng thông tin khác (vd. "[Merger] Merging formats...") không quyết định
+    nguyên nhân. Không dòng nào khớp thì là ERR_UNKNOWN.
+    """
+    lines = [line.strip() for line in lines if line and line.strip()]
+    errors = [line for line in lines if "ERROR" in line]
+    for line in reversed(errors):
+        category = _match(line)
+        if category:
+            return ErrorInfo(category, line[:300])
+    message = (errors or lines or ["yt-dlp kết thúc với mã lỗi"])[-1]
+    return ErrorInfo(ERR_UNKNOWN, message[:300])
+
+
+class RetryPolicy:
+    """Số lần thử lại và thời gian chờ (tăng gấp đôi, có jitter) theo loại lỗi"""
+
+    # Bị giới hạn truy cập thì chờ lâu hơn các lỗi tạm thời khác
+    DELAY_FACTORS = {ERR_RATE_LIMITED: 6.0, ERR_FORBIDDEN: 2.0}
+
+    def __init__(self, max_retries=2, base_delay=5.0, max_delay=300.0, jitter=0.3,
+                 rng=random.random):
+        self.max_retries = max(0, int(max_retries))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self._rng = rng
+
+    def should_retry(self, error, attempt):
+        """attempt: số lần đã tải (1 = lần đầu vừa lỗi)"""
+        return error.transient and attempt <= self.max_retries
+
+    def delay(self, error, attempt):
+        """Số giây chờ trước lần tải thứ attempt + 1"""
+        delay = self.base_delay * self.DELAY_FACTORS.get(error.category, 1.0)
+        delay = min(self.max_delay, delay * 2 ** (attempt - 1))
+        # Jitter ±jitter để các link không cùng thử lại một lúc
+        return delay * (1 + self.jitter * (2 * self._rng() - 1))
+
+
+def write_report(path, failures):
+    """
+    Ghi các link lỗi vào file text: mỗi link một dòng kèm dòng chú thích "#"
+    nguyên nhân, nhập lại được bằng "Nhập file" trên giao diện hoặc
+    "download_cli.py -i <file>". failures: [(url, ErrorInfo)].
+    """
+    tmp_file = path + ".tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write(f"# Link lỗi - {datetime.now().isoformat(timespec='seconds')}\n")
+        for url, error in failures:
+            f.write(f"# {error.label}: {error.message}\n")
+            f.write(f"{url}\n")
+    os.replace(tmp_file, path)
+    return path
@@ -0,0 +1,249 @@
+"""
+Chọn format sao cho video/âm thanh được ghép bằng stream copy.
+
+Trước đây lệnh tải luôn là "-f bv*+ba/b --merge-output-format mp4": với
+YouTube, luồng tốt nhất thường là VP9/AV1 + Opus nên file MP4 tạo ra chứa
+codec mà nhiều trình phát/trình dựng không mở được. Giờ ghép luôn bằng
+-c copy (không mã hóa lại) và chọn container theo codec:
+
+    FORMAT_POLICY_MP4  ưu tiên H.264 (avc1) + AAC (mp4a) -> MP4; video không có
+                       cặp này thì dùng luồng tốt nhất và container hợp với
+                       codec (WebM cho VP9/AV1 + Opus, còn lại MKV)
+    FORMAT_POLICY_BEST luồng tốt nhất, container MP4/WebM/MKV theo codec
+
+plan_formats() mô phỏng lựa chọn đó trên metadata (info dict của yt-dlp) để
+báo trước chi phí mỗi video: copy (chỉ tốn I/O) hay phải mã hóa lại (chuyển
+MP3 ở chế độ âm thanh, tốn CPU theo thời lượng). Module không phụ thuộc Qt.
+"""
+
+from transcode_pool import MODE_COPY, plan_audio
+
+
+FORMAT_POLICY_MP4 = "mp4"
+FORMAT_POLICY_BEST = "best"
+DEFAULT_FORMAT_POLICY = FORMAT_POLICY_MP4
+
+FORMAT_POLICY_LABELS = {
+    FORMAT_POLICY_MP4: "MP4 tương thích (H.264 + AAC)",
+    FORMAT_POLICY_BEST: "Chất lượng cao nhất (MP4/WebM/MKV)",
+}
+
+# Container khi ghép, yt-dlp chọn cái đầu tiên chứa được cả hai codec
+MERGE_CONTAINERS = "mp4/webm/mkv"
+
+_SELECTORS = {
+    FORMAT_POLICY_MP4: "bv*[vcodec^=avc1]+ba[acodec^=mp4a]/bv*+ba/b",
+    FORMAT_POLICY_BEST: "bv*+ba/b",
+}
+_AUDIO_SELECTORS = {
+    FORMAT_POLICY_MP4: "ba[acodec^=mp4a]/ba/b",
+    FORMAT_POLICY_BEST: "ba/b",
+}
+
+# Tiền tố codec (phần trước dấu "." của vcodec/acodec) -> tên codec
+_CODEC_PREFIXES = {
+    "avc1": "h264", "avc3": "h264", "h264": "h264",
+    "hev1": "hevc", "hvc1": "hevc", "h265": "hevc", "hevc": "hevc",
+    "vp09": "vp9", "vp9": "vp9",
+    "vp08": "vp8", "vp8": "vp8",
+    "av01": "av1", "av1": "av1",
+    "mp4a": "aac", "aac": "aac",
+    "opus": "opus",
+    "vorbis": "vorbis",
+    "ec-3": "eac3", "eac3": "eac3",
+    "ac-3": "ac3", "ac3": "ac3",
+}
+
+# Codec mỗi container chứa được khi copy (giống get_compatible_ext của yt-dlp)
+_CONTAINER_CODECS = {
+    "mp4": {"h264", "hevc", "av1", "aac", "eac3", "ac3"},
+    "webm": {"vp9", "vp8", "av1", "opus", "vorbis"},
+}
+
+# Cách tạo file cuối cùng
+ACTION_NONE = "none"            # Một file tải về, không cần ghép
+ACTION_COPY = "copy"            # Ghép/tách luồng bằng -c copy
+ACTION_TRANSCODE = "transcode"  # Mã hóa lại (chuyển MP3)
+
+# Ước lượng thô để so sánh: copy chỉ đọc/ghi lại file,
+# libmp3lame chạy khoảng 60 lần thời gian thực trên một nhân
+COPY_BYTES_PER_SECOND = 150 * 1024 * 1024
+MP3_REALTIME_FACTOR = 60
+
+
+def format_args(policy, audio_only=False, keep_original_audio=False):
+    """Tham số -f/--merge-output-format của yt-dlp theo policy"""
+    if policy not in _SELECTORS:
+        policy = DEFAULT_FORMAT_POLICY
+    if audio_only:
+        # Khi chuyển MP3 thì codec gốc không quan trọng, lấy luồng tốt nhất
+        if keep_original_audio:
+            return ["-f", _AUDIO_SELECTORS[policy]]
+        return ["-f", "ba/b"]
+    return ["-f", _SELECTORS[policy], "--merge-output-format", MERGE_CONTAINERS]
+
+
+def codec_name(codec):
+    """
+    Tên codec rút gọn: "avc1.640028" -> "h264", "vp09.00.40.08" -> "vp9".
+    Tiền tố không có trong _CODEC_PREFIXES thì giữ nguyên (chữ thường).
+    """
+    if not codec or codec == "none":
+        return None
+    prefix = codec.split(".")[0].lower()
+    return _CODEC_PREFIXES.get(prefix, prefix)
+
+
+def merge_container(vcodec, acodec):
+    """Container chứa được vcodec + acodec khi ghép bằng copy"""
+    codecs = {codec_name(vcodec), codec_name(acodec)}
+    for container in MERGE_CONTAINERS.split("/"):
+        if container == "mkv" or _CONTAINER_CODECS[container].issuperset(codecs):
+            return container
+    return "mkv"
+
+
+class FormatPlan:
+    """Format dự kiến của một video và chi phí tạo file cuối cùng"""
+
+    def __init__(self, format_id, vcodec, acodec, container, action, size, seconds):
+        self.format_id = format_id
+        self.vcodec = vcodec
+        self.acodec = acodec
+        self.container = container
+        self.action = action
+        self.size = size  # Dung lượng dự kiến (byte), 0 nếu không rõ
+        self.seconds = seconds  # Thời gian ghép/chuyển đổi ước lượng
+
+    def describe(self):
+        """Một dòng mô tả cho log"""
+        codecs = "+".join(c for c in (self.vcodec, self.acodec) if c) or "?"
+        cost = f"≈ {_format_seconds(self.seconds)}"
+        if self.action == ACTION_TRANSCODE:
+            return f"🔁 {codecs} → {self.container}: mã hóa lại {cost} CPU"
+        if self.action == ACTION_COPY:
+            return f"📦 {codecs} → {self.container}: copy {cost}"
+        return f"📄 {codecs} ({self.container}): không cần ghép"
+
+
+def _has_video(fmt):
+    return fmt.get("vcodec") not in (None, "none")
+
+
+def _has_audio(fmt):
+    return fmt.get("acodec") not in (None, "none")
+
+
+def _is_audio_only(fmt):
+    return _has_audio(fmt) and fmt.get("vcodec") == "none"
+
+
+def _last(formats, predicate):
+    """Format tốt nhất thỏa predicate (info["formats"] xếp từ kém tới tốt)"""
+    for fmt in reversed(formats):
+        if predicate(fmt):
+            return fmt
+    return None
+
+
+def _format_size(fmt, duration):
+    size = fmt.get("filesize") or fmt.get("filesize_approx")
+    if not size and fmt.get("tbr") and duration:
+        size = fmt["tbr"] * 125 * duration  # tbr tính bằng kbit/s
+    return int(size or 0)
+
+
+def _pick_formats(formats, policy, audio_only, keep_original_audio):
+    """Mô phỏng selector của format_args(), trả về danh sách format được chọn"""
+    if audio_only:
+        audio = None
+        if keep_original_audio and policy == FORMAT_POLICY_MP4:
+            audio = _last(formats, lambda f: _is_audio_only(f)
+                          and codec_name(f.get("acodec")) == "aac")
+        audio = audio or _last(formats, _is_audio_only)
+        return [audio or formats[-1]]
+
+    if policy == FORMAT_POLICY_MP4:
+        video = _last(formats, lambda f: _has_video(f)
+                      and codec_name(f.get("vcodec")) == "h264")
+        audio = _last(formats, lambda f: _is_audio_only(f)
+                      and codec_name(f.get("acodec")) == "aac")
+        if video and audio:
+            return [video, audio]
+    video = _last(formats, _has_video)
+    audio = _last(formats, _is_audio_only)
+    if video and audio:
+        return [video, audio]
+    return [formats[-1]]
+
+
+def plan_formats(info, policy=DEFAULT_FORMAT_POLICY, audio_only=False,
+                 keep_original_audio=False):
+    """
+    FormatPlan của một video theo metadata đã lấy trước, None nếu info không
+    có danh sách format (playlist, link chưa trích xuất...).
+    """
+    formats = info.get("formats")
+    if not formats:
+        return None
+    duration = info.get("duration") or 0
+    chosen = _pick_formats(formats, policy, audio_only, keep_original_audio)
+    format_id = "+".join(str(f.get("format_id", "?")) for f in chosen)
+    size = sum(_format_size(f, duration) for f in chosen)
+    copy_seconds = size / COPY_BYTES_PER_SECOND
+
+    if len(chosen) == 2:
+        video, audio = chosen
+        vcodec, acodec = video.get("vcodec"), audio.get("acodec")
+        return FormatPlan(format_id, codec_name(vcodec), codec_name(acodec),
+                          merge_container(vcodec, acodec), ACTION_COPY, size, copy_seconds)
+
+    fmt = chosen[0]
+    vcodec = codec_name(fmt.get("vcodec")) if not audio_only else None
+    acodec = codec_name(fmt.get("acodec"))
+    ext = fmt.get("ext") or "?"
+    if not audio_only:
+        return FormatPlan(format_id, vcodec, acodec, ext, ACTION_NONE, size, 0)
+
+    # Âm thanh: cùng cách xử lý với TranscodePool
+    steps = plan_audio(f"audio.{ext}", keep_original_audio)
+    if not steps:
+        return FormatPlan(format_id, None, acodec, ext, ACTION_NONE, size, 0)
+    target, mode = steps[0]
+    container = target.rsplit(".", 1)[-1]
+    if mode == MODE_COPY:
+        return FormatPlan(format_id, None, acodec, container, ACTION_COPY, size, copy_seconds)
+    return FormatPlan(format_id, None, acodec, container, ACTION_TRANSCODE, size,
+                      duration / MP3_REALTIME_FACTOR)
+
+
+def summarize_plans(plans):
+    """Dòng tổng kết chi phí của các FormatPlan (bỏ qua None)"""
+    counts = {ACTION_NONE: 0, ACTION_COPY: 0, ACTION_TRANSCODE: 0}
+    seconds = {ACTION_COPY: 0.0, ACTION_TRANSCODE: 0.0}
+    for plan in plans:
+        if plan is None:
+            continue
+        counts[plan.action] += 1
+        if plan.action in seconds:
+            seconds[plan.action] += plan.seconds
+    if not any(counts.values()):
+        return None
+    parts = []
+    if counts[ACTION_COPY]:
+        parts.append(f"{counts[ACTION_COPY]} copy "
+                     f"(≈ {_format_seconds(seconds[ACTION_COPY])})")
+    if counts[ACTION_TRANSCODE]:
+        parts.append(f"{counts[ACTION_TRANSCODE]} mã hóa lại "
+                     f"(≈ {_format_seconds(seconds[ACTION_TRANSCODE])} CPU)")
+    if counts[ACTION_NONE]:
+        parts.append(f"{counts[ACTION_NONE]} không cần ghép")
+    return "🧮 Dự kiến xử lý: " + ", ".join(parts)
+
+
+def _format_seconds(seconds):
+    if seconds < 1:
+        return "<1s"
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    return f"{seconds / 60:.1f} phút"
@@ -0,0 +1,70 @@
+"""
+Tự chọn số fragment tải song song (--concurrent-fragments) theo tốc độ đo
+được.
+
+Mỗi video tải xong cho một mẫu (số fragment, số byte, thời gian). Tuner giữ
+tốc độ trung bình của từng mức 1, 2, 4, 8, 16 và leo dần: thử mức cao hơn
+khi chưa có số liệu, giữ mức cao hơn chỉ khi nhanh hơn rõ rệt (GAIN), quay
+về mức thấp hơn khi thêm kết nối không còn giúp ích (máy chủ giới hạn tổng
+băng thông, hoặc đường truyền đã đầy).
+"""
+
+import threading
+
+
+FRAGMENT_LEVELS = (1, 2, 4, 8, 16)
+DEFAULT_FRAGMENTS = 4
+MAX_FRAGMENTS = FRAGMENT_LEVELS[-1]
+
+# Mức cao hơn phải nhanh hơn ít nhất 10% mới đáng dùng thêm kết nối
+GAIN = 1.1
+
+# Video quá nhỏ tải xong trước khi kịp tăng tốc, không dùng làm mẫu
+MIN_SAMPLE_BYTES = 2 * 1024 * 1024
+
+
+class FragmentTuner:
+    """Chọn số fragment song song cho video tiếp theo, an toàn đa luồng"""
+
+    def __init__(self, initial=DEFAULT_FRAGMENTS, max_fragments=MAX_FRAGMENTS):
+        self.levels = [n for n in FRAGMENT_LEVELS if n <= max_fragments] or [1]
+        self._current = min(self.levels, key=lambda n: abs(n - initial))
+        self._throughput = {}  # số fragment -> tốc độ trung bình (byte/s)
+        self._lock = threading.Lock()
+
+    def suggest(self):
+        """Số fragment nên dùng cho video tiếp theo"""
+        with self._lock:
+            return self._current
+
+    def throughput(self):
+        """Tốc độ trung bình đã đo theo từng mức (byte/s)"""
+        with self._lock:
+            return dict(self._throughput)
+
+    def record(self, fragments, num_bytes, seconds):
+        """Ghi nhận một video đã tải xong với `fragments` fragment song song"""
+        if fragments not in self.levels or seconds <= 0 or num_bytes < MIN_SAMPLE_BYTES:
+            return
+        speed = num_bytes / seconds
+        with self._lock:
+            previous = self._throughput.get(fragments)
+            # Trung bình trượt để một mẫu bất thường không làm lệch hẳn
+            self._throughput[fragments] = speed if previous is None else (previous + speed) / 2
+            self._current = self._next_level(fragments)
+
+    def _next_level(self, fragments):
+        i = self.levels.index(fragments)
+        speed = self._throughput[fragments]
+        lower = self.levels[i - 1] if i > 0 else None
+        higher = self.levels[i + 1] if i + 1 < len(self.levels) else None
+
+        if lower is not None and lower in self._throughput and \
+                self._throughput[lower] * GAIN >= speed:
+            return lower
+        if higher is not None:
+            if higher not in self._throughput:
+                return higher
+            if self._throughput[higher] >= speed * GAIN:
+                return higher
+        return fragments
@@ -0,0 +1,133 @@
+"""
+Nhật ký (journal) của lượt tải hiện tại, lưu trên đĩa để tải tiếp sau khi
+ứng dụng bị đóng hoặc crash.
+
+Journal ghi thư mục tải, tùy chọn tải và trạng thái của từng link. File là
+JSON lines: dòng đầu là ảnh chụp cả lượt tải (ghi nguyên khối bằng file tạm
++ os.replace), mỗi lần đổi trạng thái chỉ nối thêm một dòng ngắn, nên lô
+hàng chục nghìn link không phải ghi lại cả file mỗi lần. Khi đọc, các dòng
+trạng thái được áp vào ảnh chụp (dòng cuối ghi dở lúc crash bị bỏ qua) rồi
+gộp lại thành một ảnh chụp mới. Khi tải tiếp, các link chưa xong được tải
+lại vào đúng thư mục cũ với cùng số thứ tự, yt-dlp tiếp tục từ file .part
+có sẵn.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+
+
+JOURNAL_FILE = "download_journal.jsonl"
+
+# Trạng thái của một link trong journal
+STATE_QUEUED = "queued"
+STATE_DOWNLOADING = "downloading"
+STATE_POST_PROCESSING = "post_processing"
+STATE_DONE = "done"
+# Lỗi cố định hoặc hết lượt thử lại (đã ghi vào failed_links.txt), không tải tiếp
+STATE_FAILED = "failed"
+
+
+class JobJournal:
+    """Journal của một lượt tải, an toàn khi cập nhật từ nhiều thread"""
+
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = path
+        self.folder = None
+        self.options = {}
+        self.created = None
+        self.entries = []  # [{"index", "url", "state", "updated"}]
+        self._by_index = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=JOURNAL_FILE):
+        """Đọc journal từ đĩa (và gộp các dòng trạng thái), None nếu không có hoặc hỏng"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+            data = json.loads(lines[0]) if lines else None
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or not isinstance(data.get("jobs"), list):
+            return None
+
+        journal = cls(path)
+        journal.folder = data.get("folder")
+        journal.options = data.get("options") or {}
+        journal.created = data.get("created")
+        journal._set_entries([entry for entry in data["jobs"]
+                              if isinstance(entry, dict) and "index" in entry and "url" in entry])
+        for line in lines[1:]:
+            try:
+                change = json.loads(line)
+                entry = journal._by_index.get(change["index"])
+            except (ValueError, TypeError, KeyError):
+                continue  # Dòng ghi dở khi ứng dụng bị tắt đột ngột
+            if entry is not None:
+                entry["state"] = change.get("state", entry["state"])
+                entry["updated"] = change.get("updated", entry.get("updated"))
+        if len(lines) > 1:
+            journal._save()
+        return journal
+
+    def start(self, folder, options, jobs):
+        """Bắt đầu lượt tải mới: ghi thư mục, tùy chọn và danh sách job"""
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self.folder = folder
+            self.options = dict(options)
+            self.created = now
+            self._set_entries([{"index": job.index, "url": job.url,
+                                "state": STATE_QUEUED, "updated": now} for job in jobs])
+            self._save()
+
+    def set_state(self, index, state):
+        """Cập nhật trạng thái của link có số thứ tự index (nối một dòng vào file)"""
+        with self._lock:
+            entry = self._by_index.get(index)
+            if entry is None or entry["state"] == state:
+                return
+            entry["state"] = state
+            entry["updated"] = datetime.now().isoformat(timespec="seconds")
+            try:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({"index": index, "state": state,
+                                        "updated": entry["updated"]}) + "\n")
+            except OSError:
+                pass
+
+    def unfinished(self):
+        """
+        Các link cần tải tiếp (đang chờ hoặc đang tải dở). Link lỗi cố định
+        (STATE_FAILED) không tính: đã được ghi vào failed_links.txt.
+        """
+        with self._lock:
+            return [dict(entry) for entry in self.entries
+                    if entry["state"] not in (STATE_DONE, STATE_FAILED)]
+
+    def discard(self):
+        """Xóa journal khi lượt tải đã xong hoặc người dùng bỏ qua"""
+        with self._lock:
+            self._set_entries([])
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def _set_entries(self, entries):
+        self.entries = entries
+        self._by_index = {entry["index"]: entry for entry in entries}
+
+    def _save(self):
+        """Ghi ảnh chụp cả journal thành dòng duy nhất của file"""
+        data = {"folder": self.folder, "options": self.options,
+                "created": self.created, "jobs": self.entries}
+        tmp_file = self.path + ".tmp"
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(data, ensure_ascii=False) + "\n")
+            os.replace(tmp_file, self.path)
+        except OSError:
+            pass
@@ -0,0 +1,238 @@
+"""
+Lấy metadata (tiêu đề, thời lượng, danh sách format...) cho cả danh sách
+link trước khi tải, có cache info-json trên đĩa.
+
+Mỗi link được trích xuất một lần (playlist dùng extract_flat nên chỉ lấy
+danh sách mục, không mở từng video). Kết quả là info dict của yt-dlp, được
+lưu thành file .info.json trong METADATA_CACHE_DIR với thời hạn (TTL) và
+giới hạn số mục (bỏ mục lâu không dùng nhất). Lúc tải, file này được đưa
+cho yt-dlp bằng --load-info-json để không phải gọi extractor lần nữa.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from url_utils import video_key
+
+
+METADATA_CACHE_DIR = "metadata_cache"
+INDEX_FILE = "index.json"
+
+# URL format của một số trang (YouTube...) hết hạn sau vài giờ
+DEFAULT_TTL = 3 * 3600
+DEFAULT_MAX_ENTRIES = 500
+
+DEFAULT_RESOLVE_WORKERS = 4
+
+
+def cache_key(url):
+    """Khóa cache của link: extractor:id nếu nhận diện được, ngược lại URL"""
+    key = video_key(url)
+    if key:
+        return f"{key[0]}:{key[1]}"
+    return url.strip()
+
+
+def is_single_video(info):
+    """info dict là một video (không phải playlist/link cần trích xuất tiếp)"""
+    return info.get("_type", "video") == "video" and bool(info.get("formats") or info.get("url"))
+
+
+def format_duration(seconds):
+    """Định dạng thời lượng h:mm:ss hoặc m:ss"""
+    if not seconds:
+        return "?"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+
+def describe_info(info):
+    """Một dòng mô tả ngắn của info dict cho log"""
+    title = info.get("title") or info.get("id") or "?"
+    if info.get("_type") == "playlist":
+        count = info.get("playlist_count") or len(info.get("entries") or [])
+        return f"📃 {title} ({count} mục)"
+    parts = [f"🎬 {title}", f"⏱ {format_duration(info.get('duration'))}"]
+    formats = info.get("formats")
+    if formats:
+        parts.append(f"{len(formats)} format")
+    return " - ".join(parts)
+
+
+class MetadataCache:
+    """Cache info-json trên đĩa với TTL và bỏ mục lâu không dùng (LRU)"""
+
+    def __init__(self, cache_dir=METADATA_CACHE_DIR, ttl=DEFAULT_TTL,
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index_file = os.path.join(cache_dir, INDEX_FILE)
+        self._index = self._load_index()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._index)
+
+    def info_file(self, url):
+        """Đường dẫn file .info.json còn hạn của link, None nếu chưa có"""
+        key = cache_key(url)
+        with self._lock:
+            entry = self._index.get(key)
+            if not entry:
+                return None
+            path = os.path.join(self.cache_dir, entry["file"])
+            if time.time() - entry["created"] > self.ttl or not os.path.exists(path):
+                self._remove(key)
+                self._save_index()
+                return None
+            entry["accessed"] = time.time()
+            return path
+
+    def get(self, url):
+        """info dict còn hạn của link, None nếu chưa có"""
+        path = self.info_file(url)
+        if not path:
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self._remove(cache_key(url))
+            return None
+
+    def put(self, url, info):
+        """Lưu info dict của link, trả về đường dẫn file .info.json"""
+        key = cache_key(url)
+        filename = hashlib.sha1(key.encode('utf-8')).hexdigest() + ".info.json"
+        path = os.path.join(self.cache_dir, filename)
+
+        tmp_file = path + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(info, f, ensure_ascii=False)
+        os.replace(tmp_file, path)
+
+        now = time.time()
+        with self._lock:
+            self._index[key] = {"file": filename, "url": url,
+                                "created": now, "accessed": now}
+            self._evict()
+            self._save_index()
+        return path
+
+    def flush(self):
+        """Ghi lại index (thời điểm truy cập của các mục)"""
+        with self._lock:
+            self._save_index()
+
+    def clear(self):
+        """Xóa toàn bộ cache"""
+        with self._lock:
+            for key in list(self._index):
+                self._remove(key)
+            self._save_index()
+
+    def _evict(self):
+        """Bỏ mục hết hạn, rồi mục lâu không dùng nhất khi vượt giới hạn"""
+        now = time.time()
+        for key, entry in list(self._index.items()):
+            if now - entry["created"] > self.ttl:
+                self._remove(key)
+        if len(self._index) > self.max_entries:
+            by_access = sorted(self._index, key=lambda k: self._index[k]["accessed"])
+            for key in by_access[:len(self._index) - self.max_entries]:
+                self._remove(key)
+
+    def _remove(self, key):
+        entry = self._index.pop(key, None)
+        if entry:
+            try:
+                os.remove(os.path.join(self.cache_dir, entry["file"]))
+            except OSError:
+                pass
+
+    def _load_index(self):
+        try:
+            with open(self._index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        try:
+            tmp_file = self._index_file + ".tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f, ensure_ascii=False)
+            os.replace(tmp_file, self._index_file)
+        except OSError:
+            pass
+
+
+def extract_with_executable(ytdlp_path, url, timeout=120):
+    """Lấy info dict bằng "yt-dlp -J --flat-playlist" (chạy tiến trình riêng)"""
+    creation_flags = 0
+    if sys.platform == "win32":
+        creation_flags = subprocess.CREATE_NO_WINDOW
+    result = subprocess.run(
+        [ytdlp_path, "-J", "--flat-playlist", "--no-warnings", url],
+        capture_output=True, text=True, encoding='utf-8', timeout=timeout,
+        creationflags=creation_flags)
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"yt-dlp lỗi {result.returncode}")
+    return json.loads(result.stdout)
+
+
+def resolve_all(urls, cache, extract, max_workers=DEFAULT_RESOLVE_WORKERS,
+                on_result=None, should_stop=None):
+    """
+    Lấy metadata cho các link song song, link đã có trong cache không trích
+    xuất lại. extract(url) trả về info dict. on_result(url, info, cached,
+    error) được gọi khi xong mỗi link. Trả về dict url -> info (None nếu lỗi).
+    """
+    results = {}
+    pending = []
+    for url in dict.fromkeys(urls):
+        info = cache.get(url)
+        if info is not None:
+            results[url] = info
+            if on_result:
+                on_result(url, info, True, None)
+        else:
+            pending.append(url)
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as pool:
+            futures = {pool.submit(extract, url): url for url in pending}
+            for future in as_completed(futures):
+                url = futures[future]
+                if should_stop and should_stop():
+                    for other in futures:
+                        other.cancel()
+                    break
+                info, error = None, None
+                try:
+                    info = future.result()
+                    cache.put(url, info)
+                except Exception as e:
+                    error = e
+                results[url] = info
+                if on_result:
+                    on_result(url, info, False, error)
+
+    cache.flush()
+    return results
@@ -0,0 +1,131 @@
+"""
+Giai đoạn xử lý sau tải, tách khỏi luồng tải của DownloadScheduler.
+
+Khi yt-dlp của một link kết thúc, job được đưa vào PostProcessPipeline và
+luồng tải được trả lại ngay cho link tiếp theo. Các thread của pipeline lần
+lượt lấy job ra để đổi tên file, ghi archive... nên phần việc mạng (tải) và
+phần việc đĩa/CPU (xử lý file) của các job khác nhau chạy chồng lên nhau.
+Module không phụ thuộc Qt.
+
+Các hàm fixed_*_name chỉ tính tên đúng cho một đường dẫn cụ thể (do yt-dlp
+báo qua dòng [DLFILE]) nên mỗi job chỉ đụng tới file của chính nó, không
+quét cả thư mục tải.
+"""
+
+import os
+import threading
+from collections import deque
+
+
+DEFAULT_POST_WORKERS = 2
+
+MEDIA_EXTENSIONS = (".mp4", ".mp3", ".mkv", ".avi", ".mov", ".webm")
+SUBTITLE_EXTENSIONS = (".srt", ".vtt", ".ass")
+
+
+def fixed_media_name(path):
+    """Tên đúng của file media: "a..mp4" -> "a.mp4" (title kết thúc bằng dấu chấm)"""
+    folder, filename = os.path.split(path)
+    ext = os.path.splitext(filename)[1]
+    if ext.lower() not in MEDIA_EXTENSIONS or ".." not in filename:
+        return path
+    return os.path.join(folder, filename.replace(f"..{ext[1:]}", ext))
+
+
+def fixed_subtitle_name(path, sub_lang):
+    """
+    Tên đúng của file phụ đề ngôn ngữ sub_lang: "a..vi.srt" -> "a.vi.srt",
+    riêng tiếng Anh "a.en.srt" -> "a.srt". File khác giữ nguyên.
+    """
+    folder, filename = os.path.split(path)
+    ext = os.path.splitext(filename)[1]
+    if ext.lower() not in SUBTITLE_EXTENSIONS or not filename.endswith(f".{sub_lang}{ext}"):
+        return path
+    if sub_lang == "en" and ext == ".srt":
+        filename = filename.replace("..en.srt", ".srt").replace(".en.srt", ".srt")
+    else:
+        filename = filename.replace(f"..{sub_lang}.", f".{sub_lang}.")
+    return os.path.join(folder, filename)
+
+
+class PostProcessPipeline:
+    """Hàng đợi job đã tải xong, xử lý trên một pool thread riêng"""
+
+    def __init__(self, process, workers=DEFAULT_POST_WORKERS, on_done=None):
+        """
+        process(job) chạy trên thread của pipeline, trả về True nếu xử lý
+        thành công; on_done(job, success) được gọi ngay sau đó. process trả
+        về None khi đã chuyển job sang giai đoạn khác (vd. TranscodePool),
+        giai đoạn đó tự kết thúc job nên on_done không được gọi.
+        """
+        self.process = process
+        self.workers = max(1, int(workers))
+        self.on_done = on_done
+        self.stop_flag = False
+        self._pending = deque()
+        self._busy = 0
+        self._closed = False
+        self._threads = []
+        self._cond = threading.Condition()
+
+    def start(self):
+        """Khởi động các thread xử lý"""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, daemon=True,
+                                      name=f"post-process-{i + 1}")
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def submit(self, job):
+        """Đưa một job đã tải xong vào hàng đợi xử lý"""
+        with self._cond:
+            self._pending.append(job)
+            self._cond.notify()
+
+    def pending_count(self):
+        """Số job đang chờ hoặc đang được xử lý"""
+        with self._cond:
+            return len(self._pending) + self._busy
+
+    def close(self):
+        """Không nhận thêm job; các thread thoát khi xử lý hết hàng đợi"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def join(self):
+        """Chờ các thread xử lý xong (gọi sau close() hoặc stop())"""
+        for thread in self._threads:
+            thread.join()
+
+    def stop(self):
+        """Bỏ các job chưa xử lý, trả về danh sách job đã bỏ"""
+        with self._cond:
+            self.stop_flag = True
+            self._closed = True
+            dropped = list(self._pending)
+            self._pending.clear()
+            self._cond.notify_all()
+        return dropped
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                job = self._pending.popleft()
+                self._busy += 1
+
+            success = False
+            try:
+                success = self.process(job)
+            except Exception:
+                success = False
+            finally:
+                with self._cond:
+                    self._busy -= 1
+            if self.on_done and success is not None:
+                self.on_done(job, success)
@@ -0,0 +1,190 @@
+"""
+Kênh tiến trình dạng máy đọc được cho yt-dlp.
+
+yt-dlp được chạy với --newline và --progress-template để mỗi lần cập nhật
+tiến trình là một dòng JSON có tiền tố PROGRESS_PREFIX. Dòng đó (hoặc dict
+từ progress_hooks khi dùng engine trong tiến trình) được chuyển thành
+ProgressEvent với số byte đã tải, tổng dung lượng, tốc độ, ETA và fragment.
+"""
+
+import json
+import re
+
+
+PROGRESS_PREFIX = "[DLPROG]"
+# Giá trị cho --progress-template: toàn bộ dict tiến trình dưới dạng JSON
+PROGRESS_TEMPLATE = f"download:{PROGRESS_PREFIX}%(progress)j"
+
+# Các tham số thêm vào lệnh yt-dlp để bật kênh tiến trình
+PROGRESS_ARGS = ["--newline", "--progress-template", PROGRESS_TEMPLATE]
+
+FILE_PREFIX = "[DLFILE]"
+# Khi xử lý xong một video, in đường dẫn các file đã tạo dưới dạng JSON.
+# Dùng after_video vì after_move không chạy khi --skip-download (chỉ phụ đề).
+# --print ngầm bật --quiet nên cần --no-quiet để giữ log bình thường.
+_FILE_FIELDS = {
+    "requested_downloads.:.filepath": "files",
+    "requested_subtitles.:.filepath": "subtitles",
+    "thumbnails.:.filepath": "thumbnails",
+}
+FILE_ARGS = [
+    "--print",
+    f"after_video:{FILE_PREFIX}%(.{{extractor_key,id,webpage_url,"
+    f"{','.join(_FILE_FIELDS)}}})j",
+    "--no-quiet",
+]
+
+# Dòng tiến trình dạng text mặc định: "[download]  45.3% of ..."
+_TEXT_PERCENT_RE = re.compile(r"(\d+(?:\.\d+)?)%")
+
+
+def _number(value):
+    """Chuyển giá trị JSON sang số, None nếu không hợp lệ"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return None
+
+
+def format_bytes(num):
+    """Định dạng số byte dễ đọc (KiB, MiB, GiB)"""
+    if num is None:
+        return "?"
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(num) < 1024 or unit == "GiB":
+            return f"{num:.1f}{unit}" if unit != "B" else f"{int(num)}B"
+        num /= 1024.0
+
+
+def format_eta(seconds):
+    """Định dạng thời gian còn lại mm:ss hoặc hh:mm:ss"""
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours:d}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+class ProgressEvent:
+    """Một lần cập nhật tiến trình tải của yt-dlp"""
+
+    __slots__ = ("status", "downloaded_bytes", "total_bytes", "speed", "eta",
+                 "fragment_index", "fragment_count", "filename", "elapsed")
+
+    def __init__(self, status, downloaded_bytes=None, total_bytes=None,
+                 speed=None, eta=None, fragment_index=None, fragment_count=None,
+                 filename=None, elapsed=None):
+        self.status = status
+        self.downloaded_bytes = downloaded_bytes
+        self.total_bytes = total_bytes
+        self.speed = speed
+        self.eta = eta
+        self.fragment_index = fragment_index
+        self.fragment_count = fragment_count
+        self.filename = filename
+        self.elapsed = elapsed  # Số giây đã tải (yt-dlp báo khi tải xong)
+
+    @classmethod
+    def from_dict(cls, d):
+        """Tạo event từ dict của progress_hooks hoặc JSON của --progress-template"""
+        return cls(
+            status=d.get("status") or "downloading",
+            downloaded_bytes=_number(d.get("downloaded_bytes")),
+            total_bytes=_number(d.get("total_bytes")) or _number(d.get("total_bytes_estimate")),
+            speed=_number(d.get("speed")),
+            eta=_number(d.get("eta")),
+            fragment_index=_number(d.get("fragment_index")),
+            fragment_count=_number(d.get("fragment_count")),
+            filename=d.get("filename"),
+            elapsed=_number(d.get("elapsed")),
+        )
+
+    @property
+    def percent(self):
+        """% đã tải (float), None nếu chưa biết tổng dung lượng"""
+        if self.status == "finished":
+            return 100.0
+        if self.total_bytes and self.downloaded_bytes is not None:
+            return min(100.0, self.downloaded_bytes * 100.0 / self.total_bytes)
+        if self.fragment_count and self.fragment_index is not None:
+            return min(100.0, self.fragment_index * 100.0 / self.fragment_count)
+        return None
+
+    def as_dict(self):
+        """Dict các trường của event (kèm percent), dùng để xuất JSON"""
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data["percent"] = self.percent
+        return data
+
+    def format_line(self):
+        """Dòng mô tả tiến trình cho log"""
+        if self.status == "finished":
+            return f"✅ Đã tải xong {format_bytes(self.total_bytes or self.downloaded_bytes)}"
+        if self.status == "error":
+            return "❌ Lỗi khi tải"
+
+        percent = self.percent
+        parts = [f"⬇️ {percent:.1f}%" if percent is not None else "⬇️"]
+        if self.total_bytes:
+            parts.append(f"của {format_bytes(self.total_bytes)}")
+        elif self.downloaded_bytes is not None:
+            parts.append(f"đã tải {format_bytes(self.downloaded_bytes)}")
+        if self.speed:
+            parts.append(f"- {format_bytes(self.speed)}/s")
+        parts.append(f"- ETA {format_eta(self.eta)}")
+        if self.fragment_count:
+            parts.append(f"(fragment {self.fragment_index or 0}/{self.fragment_count})")
+        return " ".join(parts)
+
+    def __repr__(self):
+        return (f"ProgressEvent({self.status!r}, {self.downloaded_bytes}/{self.total_bytes}, "
+                f"speed={self.speed}, eta={self.eta}, "
+                f"fragment={self.fragment_index}/{self.fragment_count})")
+
+
+def parse_progress_line(line):
+    """Trả về ProgressEvent nếu line là dòng JSON tiến trình, ngược lại None"""
+    if not line.startswith(PROGRESS_PREFIX):
+        return None
+    try:
+        data = json.loads(line[len(PROGRESS_PREFIX):])
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    return ProgressEvent.from_dict(data)
+
+
+def parse_file_line(line):
+    """
+    Trả về dict {extractor_key, id, webpage_url, filepath, files, subtitles,
+    thumbnails} nếu line là dòng thông tin file của một video đã xử lý xong,
+    ngược lại None. files/subtitles/thumbnails là danh sách đường dẫn,
+    filepath là file media chính (None khi chỉ tải phụ đề).
+    """
+    if not line.startswith(FILE_PREFIX):
+        return None
+    try:
+        data = json.loads(line[len(FILE_PREFIX):])
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    for field, name in _FILE_FIELDS.items():
+        paths = data.pop(field, None)
+        data[name] = [p for p in paths if isinstance(p, str)] if isinstance(paths, list) else []
+    data["filepath"] = data["files"][0] if data["files"] else None
+    return data
+
+
+def parse_text_percent(line):
+    """Đọc % từ dòng tiến trình dạng text của yt-dlp ("45.3%" -> 45.3)"""
+    if not line.startswith("[download]"):
+        return None
+    match = _TEXT_PERCENT_RE.search(line)
+    if not match:
+        return None
+    percent = float(match.group(1))
+    return percent if 0 <= percent <= 100 else None
@@ -0,0 +1,63 @@
+"""
+Lớp đệm ghi settings cho QSettings.
+
+Thay vì ghi lại toàn bộ key và sync() mỗi lần người dùng gõ một ký tự, giao
+diện chỉ đánh dấu "có thay đổi" rồi hẹn giờ (debounce). Khi hết giờ, các giá
+trị hiện tại được đưa vào SettingsStore: key nào giống giá trị đã ghi lần
+trước thì bỏ qua, chỉ key thật sự đổi mới được setValue, và sync() chỉ chạy
+một lần cho cả đợt. Module không phụ thuộc Qt: backend là bất kỳ object nào
+có setValue(key, value) và sync() (QSettings trong App.py).
+"""
+
+SETTINGS_SAVE_DELAY_MS = 500
+
+_MISSING = object()
+
+
+class SettingsStore:
+    """Gom các thay đổi settings và chỉ ghi những key đã đổi"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._saved = {}  # key -> giá trị đã có trong backend
+        self._dirty = {}  # key -> giá trị chờ ghi
+        # Thống kê cho benchmark/debug
+        self.write_count = 0
+        self.sync_count = 0
+
+    def remember(self, values):
+        """Ghi nhận các giá trị đang có trong backend (sau khi load settings)"""
+        for key, value in values.items():
+            self._saved[key] = value
+            self._dirty.pop(key, None)
+
+    def forget(self):
+        """Quên các giá trị đã lưu (sau khi backend bị xóa), lần flush sau ghi lại hết"""
+        self._saved = {}
+
+    def set(self, key, value):
+        """Đặt giá trị, chỉ đánh dấu chờ ghi nếu khác giá trị đã lưu"""
+        if self._saved.get(key, _MISSING) == value:
+            self._dirty.pop(key, None)
+        else:
+            self._dirty[key] = value
+
+    def update(self, values):
+        for key, value in values.items():
+            self.set(key, value)
+
+    def is_dirty(self):
+        return bool(self._dirty)
+
+    def flush(self):
+        """Ghi các key đã đổi xuống backend, trả về danh sách key đã ghi"""
+        if not self._dirty:
+            return []
+        dirty, self._dirty = self._dirty, {}
+        for key, value in dirty.items():
+            self.backend.setValue(key, value)
+            self._saved[key] = value
+        self.backend.sync()
+        self.write_count += len(dirty)
+        self.sync_count += 1
+        return list(dirty)
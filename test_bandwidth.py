@@ -0,0 +1,64 @@
+from datetime import datetime
+
+import pytest
+
+from bandwidth import MIN_JOB_RATE, BandwidthBudget, format_rate, parse_rate, parse_schedule
+
+MiB = 1024 * 1024
+
+
+def test_parse_rate_and_schedule():
+    assert parse_rate("20M") == 20 * MiB
+    assert parse_rate("1.5MiB") == int(1.5 * MiB)
+    assert parse_rate("500k") == 500 * 1024
+    assert parse_rate("") == parse_rate("0") == parse_rate(None) == 0
+    with pytest.raises(ValueError):
+        parse_rate("nhanh")
+    assert parse_schedule("08:00-18:00=5M; 22:00-06:00=0") == [
+        (480, 1080, 5 * MiB), (1320, 360, 0)]
+    with pytest.raises(ValueError):
+        parse_schedule("25:00-06:00=1M")
+    assert format_rate(0) == "không giới hạn"
+    assert format_rate(int(2.5 * MiB)) == "2.5MiB/s"
+
+
+def test_rate_for_shares_limit_between_adjustable_jobs():
+    budget = BandwidthBudget(8 * MiB)
+    assert budget.start("a", adjustable=True) == 8 * MiB
+    budget.start("b", adjustable=True)
+    assert budget.rate_for("a") == budget.rate_for("b") == 4 * MiB
+
+    # Tiến trình yt-dlp.exe nhận phần cố định, job chia lại được dùng phần còn lại
+    assert budget.start("exe", concurrency=4) == 2 * MiB
+    assert budget.rate_for("exe") == 2 * MiB
+    assert budget.rate_for("a") == 3 * MiB
+
+    budget.finish("exe")
+    budget.finish("b")
+    assert budget.rate_for("a") == 8 * MiB
+    budget.finish("a")
+    assert budget.rate_for("a") is None
+
+
+def test_fixed_rates_never_exceed_limit():
+    budget = BandwidthBudget(4 * MiB)
+    rates = [budget.start(i, concurrency=3) for i in range(3)]
+    assert rates == [4 * MiB // 3] * 3
+    assert sum(rates) <= 4 * MiB
+    # Hết phần còn lại thì vẫn được mức tối thiểu
+    assert budget.start("late") == MIN_JOB_RATE
+
+
+def test_rate_for_follows_schedule():
+    now = [datetime(2024, 1, 1, 9, 0)]
+    budget = BandwidthBudget(0, parse_schedule("08:00-18:00=2M, 22:00-06:00=0"),
+                             clock=lambda: now[0])
+    budget.start("a", adjustable=True)
+    assert budget.rate_for("a") == 2 * MiB
+    now[0] = datetime(2024, 1, 1, 23, 30)  # Khung qua nửa đêm, không giới hạn
+    assert budget.rate_for("a") is None
+    now[0] = datetime(2024, 1, 1, 19, 0)  # Ngoài khung: dùng limit
+    assert budget.rate_for("a") is None
+    # Job tiến trình riêng khi không giới hạn
+    assert budget.start("exe") is None
+    assert budget.rate_for("exe") is None
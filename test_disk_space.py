@@ -0,0 +1,52 @@
+from disk_space import DiskGuard, estimate_batch, free_space, peak_bytes
+from format_policy import ACTION_COPY, ACTION_NONE, FormatPlan
+
+
+def _plan(size, action=ACTION_COPY, vcodec="h264"):
+    return FormatPlan("1", vcodec, "aac", "mp4", action, size, 0)
+
+
+def test_estimate_batch():
+    plans = [_plan(100), _plan(300, ACTION_NONE), _plan(50, vcodec=None), _plan(0), None]
+    # Video phải ghép: file riêng và file đã ghép cùng tồn tại
+    assert [peak_bytes(p) for p in plans] == [200, 300, 50, None, None]
+    estimate = estimate_batch(plans)
+    assert (estimate.total_bytes, estimate.peak_bytes) == (450, 300)
+    assert (estimate.known, estimate.unknown) == (3, 2)
+
+
+def test_free_space_of_missing_folder(tmp_path):
+    assert free_space(str(tmp_path / "chưa" / "tạo")) == free_space(str(tmp_path))
+
+
+def test_disk_guard_accounting():
+    free = [1000]
+    guard = DiskGuard("Video", min_free=100, free_space_func=lambda path: free[0])
+    assert guard.headroom() == 900
+
+    # Chưa có tiến trình: giữ chỗ theo dung lượng dự kiến
+    guard.expect("a", 500)
+    assert guard.pending_bytes() == 500
+
+    # Ghi được 200/300 byte của file video: còn 300 theo dự kiến
+    guard.update("a", "a.f137.mp4", 200, 300)
+    free[0] -= 200
+    assert guard.pending_bytes() == 300
+    # Tổng của các file vượt dự kiến thì tính theo tổng
+    guard.update("a", "a.f140.m4a", 0, 400)
+    assert guard.pending_bytes() == 500
+    assert guard.headroom() == 800 - 500 - 100
+    assert not guard.is_low()
+
+    guard.expect("b", 300)
+    assert guard.is_low()
+
+    # Chỉ cộng phần mới ghi thêm vào bytes_written
+    guard.update("a", "a.f137.mp4", 300, 300)
+    guard.update("a", "a.f137.mp4", None, None)
+    assert guard.bytes_written == 300
+
+    guard.release("a")
+    guard.release("b")
+    assert guard.pending_bytes() == 0
+    assert not guard.is_low()
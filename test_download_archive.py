@@ -0,0 +1,71 @@
+import os
+
+from download_archive import DownloadArchive, KIND_AUDIO, link_into_folder
+
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _archive_lines(archive):
+    with open(archive.ytdlp_archive, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def test_record_and_find_existing(tmp_path):
+    archive = DownloadArchive(str(tmp_path / "archive.db"))
+    video = str(tmp_path / "a.mp4")
+    _write(video, b"video data")
+    archive.record("Youtube", "abc", "https://youtu.be/abc", video)
+
+    assert archive.lookup("youtube", "abc")["size"] == 10
+    assert archive.find_existing("youtube", "abc") == os.path.abspath(video)
+    assert archive.find_existing("youtube", "zzz") is None
+    # Cùng loại tải mới được tính
+    audio = DownloadArchive(str(tmp_path / "archive.db"), kind=KIND_AUDIO)
+    assert audio.find_existing("youtube", "abc") is None
+
+    # Cùng kích thước nhưng nội dung khác: SHA-256 không khớp, tải lại
+    _write(video, b"VIDEO DATA")
+    assert archive.find_existing("youtube", "abc") is None
+    assert archive.count() == 0
+
+    # Không lưu SHA-256 thì chỉ so kích thước
+    archive.record("youtube", "abc", "https://youtu.be/abc", video, checksum=False)
+    assert archive.find_existing("youtube", "abc") == os.path.abspath(video)
+    archive.close()
+    audio.close()
+
+
+def test_text_archive_is_rebuilt_from_sqlite(tmp_path):
+    archive = DownloadArchive(str(tmp_path / "archive.db"))
+    kept = str(tmp_path / "kept.mp4")
+    gone = str(tmp_path / "gone.mp4")
+    _write(kept, b"1")
+    _write(gone, b"2")
+    archive.record("youtube", "kept", "", kept)
+    archive.record("youtube", "gone", "", gone)
+    os.remove(gone)
+    # yt-dlp ghi dòng ngay khi tải xong, nhưng xử lý file sau đó bị lỗi
+    with open(archive.ytdlp_archive, "a", encoding="utf-8") as f:
+        f.write("youtube failed\n")
+
+    assert archive.prune_missing() == 1
+    assert _archive_lines(archive) == ["youtube kept"]
+    # Lần chạy sau vẫn ghi lại dù không có mục nào bị gỡ
+    with open(archive.ytdlp_archive, "a", encoding="utf-8") as f:
+        f.write("youtube failed\n")
+    assert archive.prune_missing() == 0
+    assert _archive_lines(archive) == ["youtube kept"]
+    archive.close()
+
+
+def test_link_into_folder(tmp_path):
+    src = str(tmp_path / "a.mp4")
+    _write(src, b"x")
+    folder = tmp_path / "new"
+    folder.mkdir()
+    dst, _ = link_into_folder(src, str(folder))
+    assert open(dst, "rb").read() == b"x"
+    assert link_into_folder(src, str(folder)) == (dst, True)
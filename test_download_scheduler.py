@@ -0,0 +1,159 @@
+import threading
+import time
+
+import pytest
+
+from download_scheduler import (
+    DEFAULT_DOMAIN_LIMITS, JOB_DONE, JOB_FAILED, DomainLimits, DownloadJob, DownloadScheduler
+)
+
+
+def _jobs(urls):
+    return [DownloadJob(i + 1, url) for i, url in enumerate(urls)]
+
+
+def _run(scheduler, jobs):
+    for job in jobs:
+        scheduler.submit(job)
+    thread = threading.Thread(target=scheduler.run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_scheduler_caps_concurrency_and_reports_crashes():
+    lock = threading.Lock()
+    running = [0, 0]  # đang chạy, tối đa
+
+    def run_job(job):
+        with lock:
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        if job.index == 3:
+            raise RuntimeError("boom")
+        return job.index != 4
+
+    errors = []
+    jobs = _jobs([f"https://site{i}.example/v" for i in range(6)])
+    scheduler = DownloadScheduler(run_job, max_concurrent=2,
+                                  on_error=lambda job, trace: errors.append((job, trace)))
+    _run(scheduler, jobs).join(5)
+
+    assert running[1] == 2
+    assert [job.state for job in jobs] == [JOB_DONE, JOB_DONE, JOB_FAILED, JOB_FAILED,
+                                           JOB_DONE, JOB_DONE]
+    assert [job for job, _ in errors] == [jobs[2]]
+    assert "RuntimeError: boom" in errors[0][1]
+    assert jobs[2].output_tail[-1] == "RuntimeError: boom"
+
+
+def test_requeued_job_runs_again_after_delay():
+    started = []
+
+    def run_job(job):
+        started.append((job.index, time.monotonic()))
+        if job.attempt == 1:
+            scheduler.requeue(job, 0.2)
+            return False
+        return True
+
+    job = DownloadJob(1, "https://a.example/v")
+    scheduler = DownloadScheduler(run_job)
+    _run(scheduler, [job]).join(5)
+
+    assert job.state == JOB_DONE
+    assert job.attempt == 2
+    assert started[1][1] - started[0][1] >= 0.2
+
+
+def test_pause_holds_new_jobs_until_resume():
+    started = []
+    scheduler = DownloadScheduler(lambda job: started.append(job.index) or True)
+    scheduler.pause()
+    thread = _run(scheduler, _jobs(["https://a.example/1", "https://b.example/2"]))
+    time.sleep(0.2)
+    assert started == []
+    assert len(scheduler.pending_jobs()) == 2
+
+    scheduler.resume()
+    thread.join(5)
+    assert sorted(started) == [1, 2]
+
+
+def _record_starts(domain_limits, max_concurrent=1):
+    """Scheduler ghi lại [(tên miền, thời điểm bắt đầu)] của các job theo thứ tự chạy"""
+    starts = []
+    lock = threading.Lock()
+
+    def run_job(job):
+        with lock:
+            starts.append((job.domain, time.monotonic()))
+        return True
+
+    scheduler = DownloadScheduler(run_job, max_concurrent=max_concurrent,
+                                  domain_limits=domain_limits)
+    return scheduler, starts
+
+
+def test_domain_limits_parse():
+    assert DomainLimits.parse("youtube.com=2:1.5") == ("youtube.com", (2, 1.5))
+    assert DomainLimits.parse(" www.youtu.be = 1") == ("youtube.com", (1, 0.0))
+    assert DomainLimits.parse("127.0.0.1:8720=0:-1") == ("127.0.0.1:8720", (1, 0.0))
+    for spec in ["youtube.com", "=2", "youtube.com=two", "youtube.com=2:x"]:
+        with pytest.raises(ValueError):
+            DomainLimits.parse(spec)
+    limits = DomainLimits()
+    assert limits.limit("tiktok.com") == DEFAULT_DOMAIN_LIMITS["tiktok.com"]
+    assert limits.limit("example.com") == (None, 0.0)
+
+
+def test_jobs_interleave_between_domains():
+    urls = ["https://a.example/1", "https://a.example/2", "https://a.example/3",
+            "https://www.b.example/1", "https://m.b.example/2", "https://c.example/1"]
+    scheduler, starts = _record_starts(DomainLimits({}))
+    _run(scheduler, _jobs(urls)).join(5)
+    assert [domain for domain, _ in starts] == [
+        "a.example", "b.example", "c.example", "a.example", "b.example", "a.example"]
+
+
+def test_domain_cap_and_interval():
+    urls = [f"https://a.example/{i}" for i in range(3)] + ["https://b.example/1"]
+    limits = DomainLimits({"a.example": (1, 0.0), "b.example": (None, 0.0)})
+    active = {"a.example": 0}
+    peak = [0]
+    lock = threading.Lock()
+
+    def run_job(job):
+        with lock:
+            active[job.domain] = active.get(job.domain, 0) + 1
+            peak[0] = max(peak[0], active["a.example"])
+        time.sleep(0.05)
+        with lock:
+            active[job.domain] -= 1
+        return True
+
+    scheduler = DownloadScheduler(run_job, max_concurrent=4, domain_limits=limits)
+    _run(scheduler, _jobs(urls)).join(5)
+    assert peak[0] == 1
+
+    # Khoảng cách tối thiểu giữa hai lần bắt đầu job cùng trang
+    urls = [f"https://a.example/{i}" for i in range(3)]
+    scheduler, starts = _record_starts(DomainLimits({"a.example": (None, 0.15)}),
+                                       max_concurrent=3)
+    _run(scheduler, _jobs(urls)).join(5)
+    times = [t for _, t in starts]
+    # Thread của job bắt đầu chậm hơn lúc scheduler tính khoảng cách một chút
+    assert all(b - a >= 0.12 for a, b in zip(times, times[1:]))
+
+
+def test_hold_domain_delays_only_that_domain():
+    urls = ["https://a.example/1", "https://b.example/1"]
+    scheduler, starts = _record_starts(DomainLimits({}), max_concurrent=2)
+    began = time.monotonic()
+    scheduler.hold_domain("a.example", 0.3)
+    _run(scheduler, _jobs(urls)).join(5)
+    started = dict(starts)
+    assert started["b.example"] - began < 0.2
+    assert started["a.example"] - began >= 0.3
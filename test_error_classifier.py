@@ -0,0 +1,64 @@
+from error_classifier import (
+    ERR_DISK_FULL, ERR_FFMPEG, ERR_GEO_BLOCKED, ERR_NETWORK, ERR_PRIVATE, ERR_RATE_LIMITED,
+    ERR_UNAVAILABLE, ERR_UNKNOWN, ErrorInfo, RetryPolicy, classify
+)
+
+MERGE_TAIL = [
+    "[youtube] dQw4w9WgXcQ: Downloading webpage",
+    "[info] dQw4w9WgXcQ: Downloading 1 format(s): 137+140",
+    '[download] Destination: Video/x.f137.mp4',
+    '[Merger] Merging formats into "Video/x.mp4"',
+]
+
+
+def test_classify_realistic_ytdlp_tails():
+    cases = [
+        (["[youtube] abc: Downloading webpage",
+          "ERROR: [youtube] abc: Unable to download webpage: HTTP Error 429: Too Many Requests"],
+         ERR_RATE_LIMITED),
+        (["WARNING: [youtube] Falling back to generic n function search",
+          "ERROR: [youtube] abc: Video unavailable. This video has been removed by the uploader"],
+         ERR_UNAVAILABLE),
+        (["ERROR: [youtube] abc: Private video. Sign in if you've been granted access"],
+         ERR_PRIVATE),
+        (["ERROR: [youtube] abc: The uploader has not made this video available in your country"],
+         ERR_GEO_BLOCKED),
+        (["[download]  12.0% of 50.00MiB at 1.00MiB/s ETA 00:40",
+          "ERROR: unable to download video data: <urlopen error [Errno 104] Connection reset by peer>"],
+         ERR_NETWORK),
+        (MERGE_TAIL + ["ERROR: Postprocessing: Conversion failed!"], ERR_FFMPEG),
+        (["ERROR: You have requested merging of multiple formats but ffmpeg is not installed"],
+         ERR_FFMPEG),
+        (["ERROR: unable to write data: [Errno 28] No space left on device"], ERR_DISK_FULL),
+        (["ERROR: timed out"], ERR_NETWORK),
+    ]
+    for lines, category in cases:
+        assert classify(lines).category == category, lines
+
+
+def test_info_lines_do_not_decide_the_error():
+    error = classify(MERGE_TAIL + ["ERROR: Something weird happened"])
+    assert error.category == ERR_UNKNOWN
+    assert error.message == "ERROR: Something weird happened"
+    assert error.transient
+    # Không có dòng ERROR: không đoán nguyên nhân từ dòng thông tin
+    assert classify(MERGE_TAIL).category == ERR_UNKNOWN
+    assert classify([]).category == ERR_UNKNOWN
+
+
+def test_retry_policy():
+    policy = RetryPolicy(max_retries=2, base_delay=5.0, max_delay=60.0, jitter=0.0)
+    network = ErrorInfo(ERR_NETWORK, "")
+    assert policy.should_retry(network, 1)
+    assert policy.should_retry(network, 2)
+    assert not policy.should_retry(network, 3)
+    assert not policy.should_retry(ErrorInfo(ERR_PRIVATE, ""), 1)
+    # Ổ đĩa đầy để DiskGuard tạm dừng hàng đợi, không tốn lượt thử lại
+    assert not policy.should_retry(ErrorInfo(ERR_DISK_FULL, ""), 1)
+
+    assert [policy.delay(network, n) for n in (1, 2, 3)] == [5.0, 10.0, 20.0]
+    assert policy.delay(ErrorInfo(ERR_RATE_LIMITED, ""), 1) == 30.0
+    assert policy.delay(ErrorInfo(ERR_RATE_LIMITED, ""), 3) == 60.0
+
+    jittered = RetryPolicy(base_delay=10.0, jitter=0.3, rng=lambda: 1.0)
+    assert jittered.delay(network, 1) == 13.0
@@ -0,0 +1,74 @@
+from format_policy import (
+    ACTION_COPY, ACTION_NONE, ACTION_TRANSCODE, FORMAT_POLICY_BEST, FORMAT_POLICY_MP4,
+    codec_name, format_args, merge_container, plan_formats, summarize_plans
+)
+
+
+def test_codec_name():
+    assert codec_name("avc1.640028") == "h264"
+    assert codec_name("avc3.4D401F") == "h264"
+    assert codec_name("hev1.1.6.L93.B0") == "hevc"
+    assert codec_name("hvc1.2.4.L120") == "hevc"
+    assert codec_name("vp09.00.40.08") == "vp9"
+    assert codec_name("vp9") == "vp9"
+    assert codec_name("av01.0.08M.08") == "av1"
+    assert codec_name("mp4a.40.2") == "aac"
+    assert codec_name("opus") == "opus"
+    assert codec_name("vorbis") == "vorbis"
+    # Codec lạ giữ nguyên tiền tố, không bị sửa chữ số
+    assert codec_name("h100.1") == "h100"
+    assert codec_name("none") is None
+    assert codec_name(None) is None
+
+
+def test_merge_container():
+    assert merge_container("avc1.640028", "mp4a.40.2") == "mp4"
+    assert merge_container("av01.0.08M.08", "mp4a.40.2") == "mp4"
+    assert merge_container("vp09.00.40.08", "opus") == "webm"
+    assert merge_container("vp09.00.40.08", "mp4a.40.2") == "mkv"
+
+
+def test_format_args():
+    assert format_args(FORMAT_POLICY_MP4)[1].startswith("bv*[vcodec^=avc1]+ba[acodec^=mp4a]")
+    assert format_args("unknown") == format_args(FORMAT_POLICY_MP4)
+    assert format_args(FORMAT_POLICY_BEST, audio_only=True) == ["-f", "ba/b"]
+
+
+FORMATS = [
+    {"format_id": "18", "vcodec": "avc1.42001E", "acodec": "mp4a.40.2", "ext": "mp4",
+     "filesize": 1000},
+    {"format_id": "140", "vcodec": "none", "acodec": "mp4a.40.2", "ext": "m4a", "tbr": 128},
+    {"format_id": "251", "vcodec": "none", "acodec": "opus", "ext": "webm", "tbr": 160},
+    {"format_id": "137", "vcodec": "avc1.640028", "acodec": "none", "ext": "mp4", "tbr": 4000},
+    {"format_id": "248", "vcodec": "vp09.00.40.08", "acodec": "none", "ext": "webm",
+     "tbr": 3000},
+]
+
+
+def test_plan_formats():
+    info = {"formats": FORMATS, "duration": 60}
+    plan = plan_formats(info, FORMAT_POLICY_MP4)
+    assert (plan.format_id, plan.container, plan.action) == ("137+140", "mp4", ACTION_COPY)
+    assert (plan.vcodec, plan.acodec) == ("h264", "aac")
+    assert plan.size == (4000 + 128) * 125 * 60
+
+    plan = plan_formats(info, FORMAT_POLICY_BEST)
+    assert (plan.format_id, plan.container) == ("248+251", "webm")
+
+    # Chuyển MP3 là mã hóa lại, giữ âm thanh gốc thì chỉ copy/không làm gì
+    plan = plan_formats(info, FORMAT_POLICY_BEST, audio_only=True)
+    assert (plan.action, plan.container) == (ACTION_TRANSCODE, "mp3")
+    assert plan.seconds == 1
+    plan = plan_formats(info, FORMAT_POLICY_MP4, audio_only=True, keep_original_audio=True)
+    assert (plan.format_id, plan.action) == ("140", ACTION_NONE)
+    plan = plan_formats(info, FORMAT_POLICY_BEST, audio_only=True, keep_original_audio=True)
+    assert (plan.format_id, plan.action, plan.container) == ("251", ACTION_COPY, "opus")
+
+    assert plan_formats({"entries": []}) is None
+
+
+def test_summarize_plans():
+    info = {"formats": FORMATS, "duration": 60}
+    plans = [plan_formats(info), plan_formats(info, audio_only=True), None]
+    assert summarize_plans(plans) == "🧮 Dự kiến xử lý: 1 copy (≈ <1s), 1 mã hóa lại (≈ 1s CPU)"
+    assert summarize_plans([None]) is None
@@ -0,0 +1,53 @@
+from download_scheduler import DownloadJob
+from job_journal import (
+    STATE_DONE, STATE_DOWNLOADING, STATE_FAILED, STATE_QUEUED, JobJournal
+)
+
+
+def _lines(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def test_state_changes_are_appended_and_compacted_on_load(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = JobJournal(path)
+    jobs = [DownloadJob(i, f"https://a.com/{i}") for i in range(1, 5)]
+    journal.start("Video/2024-01-15", {"audio_only": True}, jobs)
+    snapshot = _lines(path)[0]
+
+    journal.set_state(1, STATE_DONE)
+    journal.set_state(2, STATE_DOWNLOADING)
+    journal.set_state(2, STATE_DOWNLOADING)  # Không đổi: không ghi
+    journal.set_state(3, STATE_FAILED)
+    journal.set_state(99, STATE_DONE)  # Không có trong journal
+    lines = _lines(path)
+    # Ảnh chụp không bị ghi lại, mỗi lần đổi trạng thái một dòng
+    assert lines[0] == snapshot and len(lines) == 4
+
+    # Crash khi đang ghi dòng cuối
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"index": 4, "sta')
+
+    loaded = JobJournal.load(path)
+    assert loaded.folder == "Video/2024-01-15"
+    assert loaded.options == {"audio_only": True}
+    states = {entry["index"]: entry["state"] for entry in loaded.entries}
+    assert states == {1: STATE_DONE, 2: STATE_DOWNLOADING, 3: STATE_FAILED, 4: STATE_QUEUED}
+    # Link lỗi cố định không được tải tiếp
+    assert [entry["index"] for entry in loaded.unfinished()] == [2, 4]
+    assert len(_lines(path)) == 1  # Đã gộp thành một ảnh chụp
+
+    loaded.set_state(2, STATE_DONE)
+    loaded.set_state(4, STATE_FAILED)
+    assert JobJournal.load(path).unfinished() == []
+
+    loaded.discard()
+    assert JobJournal.load(path) is None
+
+
+def test_load_rejects_broken_journal(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    assert JobJournal.load(str(path)) is None
+    path.write_text("not json\n", encoding="utf-8")
+    assert JobJournal.load(str(path)) is None
@@ -0,0 +1,46 @@
+import importlib
+
+import pytest
+
+
+@pytest.fixture
+def App(tmp_path, monkeypatch):
+    pytest.importorskip("PySide6")
+    monkeypatch.chdir(tmp_path)  # App ghi DownloadVID.log vào thư mục hiện tại
+    return importlib.import_module("App")
+
+
+def _lines(model):
+    return [model.data(model.index(row)) for row in range(model.rowCount())]
+
+
+def test_keyed_lines_are_replaced(App):
+    model = App.LogListModel(max_lines=100)
+    changed = []
+    model.dataChanged.connect(lambda first, last: changed.append(first.row()))
+
+    # Cùng khóa trong một lô chỉ thêm một dòng
+    model.apply([(None, "bắt đầu"), ("job1", "job1 10%"), ("job1", "job1 20%")])
+    assert _lines(model) == ["bắt đầu", "job1 20%"]
+
+    # Lô sau thay đúng dòng cũ thay vì thêm dòng
+    model.apply([("job1", "job1 50%"), (None, "xong")])
+    assert _lines(model) == ["bắt đầu", "job1 50%", "xong"]
+    assert changed == [1]
+
+
+def test_trim_keeps_last_lines(App):
+    model = App.LogListModel(max_lines=3)
+    model.apply([("job1", "job1 0%")] + [(None, f"dòng {i}") for i in range(3)])
+    assert _lines(model) == ["dòng 0", "dòng 1", "dòng 2"]
+
+    # Dòng của job1 đã bị đẩy ra: cập nhật mới là một dòng mới
+    model.apply([("job1", "job1 100%")])
+    assert _lines(model) == ["dòng 1", "dòng 2", "job1 100%"]
+
+    model.apply([(None, "dòng 3"), ("job1", "job1 xong")])
+    assert _lines(model) == ["dòng 2", "job1 xong", "dòng 3"]
+
+    model.clear()
+    model.apply([("job1", "mới")])
+    assert _lines(model) == ["mới"]
@@ -0,0 +1,112 @@
+import glob
+import json
+import os
+import threading
+
+from download_engine import BatchDownloader, SUB_MODE_AUTO
+from download_scheduler import DownloadJob
+from post_processing import PostProcessPipeline, fixed_media_name, fixed_subtitle_name
+from progress_events import FILE_PREFIX, parse_file_line
+
+
+def _touch(path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("x")
+
+
+def test_fixed_names():
+    assert fixed_media_name(os.path.join("d", "Title..mp4")) == os.path.join("d", "Title.mp4")
+    assert fixed_media_name(os.path.join("d", "Title.mp4")) == os.path.join("d", "Title.mp4")
+    assert fixed_media_name("a..txt") == "a..txt"
+    assert fixed_subtitle_name("a..vi.srt", "vi") == "a.vi.srt"
+    assert fixed_subtitle_name("a..en.srt", "en") == "a.srt"
+    assert fixed_subtitle_name("a.en.srt", "en") == "a.srt"
+    assert fixed_subtitle_name("a..fr.srt", "vi") == "a..fr.srt"
+
+
+def test_post_process_only_touches_job_files(tmp_path, monkeypatch):
+    """Thư mục có hàng nghìn file: chỉ file của job được đổi tên, không quét thư mục"""
+    folder = str(tmp_path)
+    # File của các job/lần tải khác, nhiều file cũng có tên cần sửa
+    for i in range(3000):
+        _touch(os.path.join(folder, f"other_{i}..mp4"))
+        _touch(os.path.join(folder, f"other_{i}..vi.srt"))
+
+    video = os.path.join(folder, "video_2_Title..mp4")
+    subtitle = os.path.join(folder, "video_2_Title..vi.srt")
+    _touch(video)
+    _touch(subtitle)
+
+    downloader = BatchDownloader(
+        [], video_mode=True, audio_only=False, sub_mode=SUB_MODE_AUTO, sub_lang="vi",
+        convert_srt=True, include_thumb=False, subtitle_only=False)
+    job = DownloadJob(2, "https://youtu.be/xxxxxxxxxxx")
+    line = FILE_PREFIX + json.dumps({
+        "extractor_key": "Youtube", "id": "xxxxxxxxxxx",
+        "requested_downloads.:.filepath": [video],
+        "requested_subtitles.:.filepath": [subtitle],
+    })
+    job.files.append(parse_file_line(line))
+
+    def no_scan(*args, **kwargs):
+        raise AssertionError("Không được quét cả thư mục")
+
+    monkeypatch.setattr(glob, "glob", no_scan)
+    monkeypatch.setattr(os, "listdir", no_scan)
+    monkeypatch.setattr(os, "scandir", no_scan)
+
+    downloader._post_process_files(job)
+    monkeypatch.undo()
+
+    assert job.files[0]["filepath"] == os.path.join(folder, "video_2_Title.mp4")
+    assert job.files[0]["subtitles"] == [os.path.join(folder, "video_2_Title.vi.srt")]
+    names = set(os.listdir(folder))
+    assert "video_2_Title.mp4" in names and "video_2_Title.vi.srt" in names
+    assert "other_0..mp4" in names and "other_2999..vi.srt" in names
+    assert len(names) == 6002
+
+
+def test_pipeline_reports_each_job():
+    done = []
+    lock = threading.Lock()
+
+    def process(job):
+        if job == "lỗi":
+            raise RuntimeError("hỏng")
+        if job == "chuyển tiếp":
+            return None  # Giai đoạn khác (TranscodePool) tự kết thúc job
+        return job != "thất bại"
+
+    def on_done(job, success):
+        with lock:
+            done.append((job, success))
+
+    pipeline = PostProcessPipeline(process, workers=2, on_done=on_done).start()
+    for job in ("a", "thất bại", "lỗi", "chuyển tiếp", "b"):
+        pipeline.submit(job)
+    pipeline.close()
+    pipeline.join()
+    assert sorted(done) == [("a", True), ("b", True), ("lỗi", False), ("thất bại", False)]
+    assert pipeline.pending_count() == 0
+
+
+def test_pipeline_overlaps_jobs_and_stop_drops_pending():
+    running = threading.Barrier(3, timeout=5)
+    release = threading.Event()
+    processed = []
+
+    def process(job):
+        if job in ("a", "b"):
+            running.wait()  # Cả hai job chạy cùng lúc trên hai thread
+            release.wait(5)
+        processed.append(job)
+        return True
+
+    pipeline = PostProcessPipeline(process, workers=2).start()
+    for job in ("a", "b", "c", "d"):
+        pipeline.submit(job)
+    running.wait()
+    assert pipeline.stop() == ["c", "d"]
+    release.set()
+    pipeline.join()
+    assert sorted(processed) == ["a", "b"]
@@ -0,0 +1,63 @@
+from settings_store import SettingsStore
+
+
+class FakeSettings:
+    """Backend giả thay cho QSettings, đếm số lần ghi"""
+
+    def __init__(self):
+        self.values = {}
+        self.writes = []
+        self.syncs = 0
+
+    def setValue(self, key, value):
+        self.values[key] = value
+        self.writes.append(key)
+
+    def sync(self):
+        self.syncs += 1
+
+
+def test_only_changed_keys_are_written():
+    backend = FakeSettings()
+    store = SettingsStore(backend)
+    store.remember({"urls": "", "audio_only": False})
+
+    # Giống giá trị đã lưu: không có gì để ghi
+    store.update({"urls": "", "audio_only": False})
+    assert not store.is_dirty()
+    assert store.flush() == []
+    assert backend.syncs == 0
+
+    # Gõ nhiều lần trước khi hết giờ: gom thành một lần ghi, một lần sync
+    for text in ("h", "ht", "htt", "https://a.com"):
+        store.update({"urls": text, "audio_only": False})
+    assert store.flush() == ["urls"]
+    assert backend.values == {"urls": "https://a.com"}
+    assert (backend.syncs, store.write_count, store.sync_count) == (1, 1, 1)
+
+
+def test_reverted_change_is_not_written():
+    backend = FakeSettings()
+    store = SettingsStore(backend)
+    store.remember({"max_concurrent": 3})
+    store.set("max_concurrent", 5)
+    assert store.is_dirty()
+    store.set("max_concurrent", 3)
+    assert not store.is_dirty()
+
+    # remember() sau khi load bỏ các thay đổi đang chờ của key đó
+    store.set("max_concurrent", 5)
+    store.remember({"max_concurrent": 5})
+    assert store.flush() == []
+
+
+def test_forget_writes_everything_again():
+    backend = FakeSettings()
+    store = SettingsStore(backend)
+    store.update({"a": 1, "b": 2})
+    store.flush()
+    store.forget()  # Backend đã bị xóa
+    store.update({"a": 1, "b": 2})
+    assert sorted(store.flush()) == ["a", "b"]
+    assert backend.writes == ["a", "b", "a", "b"]
+    assert backend.syncs == 2
@@ -0,0 +1,94 @@
+import os
+import stat
+import sys
+import threading
+
+import pytest
+
+from transcode_pool import (
+    MODE_COPY, MODE_MP3, TranscodePool, TranscodeTask, ffmpeg_command, plan_audio
+)
+
+
+def test_plan_audio():
+    assert plan_audio("a.webm") == [("a.mp3", MODE_MP3)]
+    assert plan_audio("a.mp3") == []
+    assert plan_audio("a.M4A", keep_original=True) == []
+    assert plan_audio("a.webm", keep_original=True) == [("a.opus", MODE_COPY), ("a.mp3", MODE_MP3)]
+    assert plan_audio("a.mp4", keep_original=True) == [("a.m4a", MODE_COPY), ("a.mp3", MODE_MP3)]
+
+
+def test_ffmpeg_command():
+    cmd = ffmpeg_command("ffmpeg", "a.webm", "a.opus", MODE_COPY)
+    assert cmd[-3:] == ["-c:a", "copy", "a.opus"]
+    cmd = ffmpeg_command("ffmpeg", "a.webm", "a.mp3", MODE_MP3)
+    assert "libmp3lame" in cmd and cmd[-1] == "a.mp3"
+
+
+# ffmpeg giả: copy file vào file đích, lỗi khi bị yêu cầu "-c:a copy"
+FAKE_FFMPEG = """
+import shutil, sys
+args = sys.argv[1:]
+if args[args.index("-c:a") + 1] == "copy":
+    sys.stderr.write("Could not find tag for codec\\n")
+    sys.exit(1)
+shutil.copyfile(args[args.index("-i") + 1], args[-1])
+"""
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path):
+    if sys.platform == "win32":
+        pytest.skip("ffmpeg giả là shell script")
+    script = tmp_path / "fake_ffmpeg.py"
+    script.write_text(FAKE_FFMPEG, encoding="utf-8")
+    wrapper = tmp_path / "ffmpeg"
+    wrapper.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n',
+                       encoding="utf-8")
+    wrapper.chmod(wrapper.stat().st_mode | stat.S_IEXEC)
+    return str(wrapper)
+
+
+def test_pool_falls_back_to_mp3(tmp_path, fake_ffmpeg):
+    done = []
+    lock = threading.Lock()
+
+    def on_done(task):
+        with lock:
+            done.append(task)
+
+    pool = TranscodePool(fake_ffmpeg, workers=2, max_pending=1).start()
+    sources = []
+    for i in range(4):
+        src = tmp_path / f"{i}.webm"
+        src.write_bytes(b"audio")
+        sources.append(str(src))
+        # Hàng đợi chỉ có một chỗ: submit() chờ thread lấy task ra
+        assert pool.submit(TranscodeTask(str(src), plan_audio(str(src), True), on_done))
+    pool.close()
+    pool.join()
+
+    assert len(done) == 4
+    for task in done:
+        # Copy sang .opus lỗi nên chuyển MP3, file gốc bị xóa, không còn file tạm
+        assert task.success and task.mode == MODE_MP3
+        assert task.output == os.path.splitext(task.src)[0] + ".mp3"
+        assert os.path.exists(task.output) and not os.path.exists(task.src)
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        ["ffmpeg", "fake_ffmpeg.py"] + [f"{i}.mp3" for i in range(4)])
+
+
+def test_pool_reports_error_and_refuses_after_stop(tmp_path, fake_ffmpeg):
+    src = tmp_path / "a.mp4"
+    src.write_bytes(b"audio")
+    pool = TranscodePool(fake_ffmpeg, workers=1).start()
+    task = TranscodeTask(str(src), [(str(tmp_path / "a.m4a"), MODE_COPY)])
+    pool.submit(task)
+    pool.close()
+    pool.join()
+    assert not task.success
+    assert task.error == "Could not find tag for codec"
+    assert os.path.exists(src)
+
+    pool.stop()
+    assert not pool.submit(TranscodeTask(str(src), []))
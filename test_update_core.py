@@ -0,0 +1,336 @@
+import functools
+import hashlib
+import http.server
+import json
+import os
+import re
+import threading
+import time
+import zipfile
+
+import pytest
+
+from update_core import (
+    CHECK_CACHED, CHECK_FETCHED, CHECK_NOT_MODIFIED, MANIFEST_FILE, MIN_PARALLEL_SIZE,
+    PART_INFO_SUFFIX, PART_SUFFIX, InstallStopped, UpdateCheckError, build_manifest,
+    check_update_info, download_file, install_delta, install_zip, plan_delta
+)
+
+requests = pytest.importorskip("requests")
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _release(root, version, files):
+    """Thư mục bản phát hành: <root>/<version>/files/... và manifest.json"""
+    release_dir = os.path.join(root, version)
+    for rel_path, data in files.items():
+        _write(os.path.join(release_dir, "files", *rel_path.split("/")), data)
+    manifest = build_manifest(os.path.join(release_dir, "files"), version)
+    with open(os.path.join(release_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+@pytest.fixture
+def server(tmp_path):
+    """HTTP server cục bộ phục vụ tmp_path/www, ghi lại các đường dẫn được tải"""
+    root = tmp_path / "www"
+    root.mkdir()
+    requested = []
+
+    class Handler(http.server.SimpleHTTPRequestHandler):
+        def do_GET(self):
+            requested.append(self.path)
+            super().do_GET()
+
+        def log_message(self, *args):
+            pass
+
+    httpd = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), functools.partial(Handler, directory=str(root)))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield str(root), f"http://127.0.0.1:{httpd.server_port}", requested
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+@pytest.fixture
+def range_server():
+    """
+    HTTP server cục bộ hỗ trợ Range/If-Range/If-None-Match theo ETag, ghi lại
+    (Range, status).
+    Đường dẫn trong no_range thì server bỏ qua Range (luôn trả 200).
+    """
+    files = {}
+    requested = []
+    no_range = set()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def _headers(self):
+            data = files[self.path]
+            etag = '"%s"' % hashlib.sha256(data).hexdigest()[:16]
+            match = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range", ""))
+            if_range = self.headers.get("If-Range")
+            if (match and self.path not in no_range
+                    and (if_range is None or if_range == etag)):
+                start = int(match.group(1))
+                end = int(match.group(2) or len(data) - 1)
+                status = 206
+            else:
+                start, end = 0, len(data) - 1
+                status = 200
+            self.send_response(status)
+            if status == 206:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+            if self.path not in no_range:
+                self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(end + 1 - start))
+            self.end_headers()
+            return data[start:end + 1], status
+
+        def do_HEAD(self):
+            self._headers()
+
+        def do_GET(self):
+            if self.path not in files:
+                self.send_error(404)
+                return
+            data = files[self.path]
+            if self.headers.get("If-None-Match") == '"%s"' % hashlib.sha256(data).hexdigest()[:16]:
+                requested.append((None, 304))
+                self.send_response(304)
+                self.end_headers()
+                return
+            body, status = self._headers()
+            requested.append((self.headers.get("Range"), status))
+            # Gửi chậm (~3 MB/s mỗi kết nối) để kịp dừng giữa chừng
+            for i in range(0, len(body), 64 * 1024):
+                self.wfile.write(body[i:i + 64 * 1024])
+                time.sleep(0.02)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield files, f"http://127.0.0.1:{httpd.server_port}", requested, no_range
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_download_resumes_part_file_and_verifies_sha256(range_server, tmp_path):
+    files, base_url, requested, _ = range_server
+    data = os.urandom(3 * 1024 * 1024 + 123)
+    files["/update.zip"] = data
+    sha256 = hashlib.sha256(data).hexdigest()
+    output_file = str(tmp_path / "update_v1.1.0.zip")
+
+    # Dừng sau MB đầu tiên: chỉ còn file .part, không có file zip dở
+    progress = []
+    with pytest.raises(InstallStopped):
+        download_file(f"{base_url}/update.zip", output_file, sha256=sha256,
+                      on_progress=lambda done, total: progress.append(done),
+                      should_stop=lambda: len(progress) > 1)
+    assert not os.path.exists(output_file)
+    partial = os.path.getsize(output_file + PART_SUFFIX)
+    assert 0 < partial < len(data)
+
+    assert download_file(f"{base_url}/update.zip", output_file, sha256=sha256) == len(data)
+    assert requested[-1] == (f"bytes={partial}-", 206)
+    with open(output_file, "rb") as f:
+        assert f.read() == data
+    assert os.listdir(tmp_path) == ["update_v1.1.0.zip"]
+
+    # File trên server đã đổi (ETag khác): If-Range làm server trả cả file
+    files["/update.zip"] = new_data = os.urandom(2000)
+    os.rename(output_file, output_file + PART_SUFFIX)
+    with open(output_file + ".part.json", "w", encoding="utf-8") as f:
+        json.dump({"url": f"{base_url}/update.zip", "validator": '"stale"'}, f)
+    download_file(f"{base_url}/update.zip", output_file)
+    assert requested[-1][1] == 200
+    with open(output_file, "rb") as f:
+        assert f.read() == new_data
+
+    # Sai SHA-256: không tạo file zip, xóa .part để lần sau tải lại từ đầu
+    os.remove(output_file)
+    with pytest.raises(ValueError):
+        download_file(f"{base_url}/update.zip", output_file, sha256="0" * 64)
+    assert os.listdir(tmp_path) == []
+
+
+def test_parallel_download_resumes_segments_and_falls_back(range_server, tmp_path):
+    files, base_url, requested, no_range = range_server
+    data = os.urandom(MIN_PARALLEL_SIZE * 2 + 321)
+    files["/update.zip"] = files["/plain.zip"] = data
+    no_range.add("/plain.zip")
+    sha256 = hashlib.sha256(data).hexdigest()
+    output_file = str(tmp_path / "update_v1.1.0.zip")
+
+    # Dừng giữa chừng: vị trí từng đoạn được lưu lại để tải tiếp
+    progress = []
+    with pytest.raises(InstallStopped):
+        download_file(f"{base_url}/update.zip", output_file, sha256=sha256, connections=4,
+                      on_progress=lambda done, total: progress.append(done),
+                      should_stop=lambda: progress[-1:] > [0])
+    with open(output_file + PART_INFO_SUFFIX, encoding="utf-8") as f:
+        segments = json.load(f)["segments"]
+    assert len(segments) == 4
+    assert os.path.getsize(output_file + PART_SUFFIX) == len(data)
+
+    del requested[:]
+    assert download_file(f"{base_url}/update.zip", output_file, sha256=sha256,
+                         connections=4) == len(data)
+    expected = sorted(f"bytes={pos}-{end}" for start, end, pos in segments if pos <= end)
+    assert expected
+    assert sorted(r for r, _ in requested) == expected
+    assert all(status == 206 for _, status in requested)
+    with open(output_file, "rb") as f:
+        assert f.read() == data
+    assert os.listdir(tmp_path) == ["update_v1.1.0.zip"]
+
+    # Server không hỗ trợ Range: tải một luồng
+    os.remove(output_file)
+    del requested[:]
+    download_file(f"{base_url}/plain.zip", output_file, sha256=sha256, connections=4)
+    assert requested == [(None, 200)]
+    with open(output_file, "rb") as f:
+        assert f.read() == data
+
+
+def test_parallel_download_falls_back_when_a_later_part_gets_200(range_server, tmp_path):
+    files, base_url, _, _ = range_server
+    data = os.urandom(MIN_PARALLEL_SIZE * 2)
+    files["/update.zip"] = data
+    session = requests.Session()
+
+    class FlakySession:
+        """Đoạn đầu mất kết nối, các đoạn sau được trả 200 thay vì 206"""
+
+        def head(self, url, **kwargs):
+            return session.head(url, **kwargs)
+
+        def get(self, url, headers=None, **kwargs):
+            headers = dict(headers or {})
+            if headers.get("Range", "").startswith("bytes=0-"):
+                raise requests.ConnectionError("mất kết nối")
+            if headers.get("Range"):
+                time.sleep(0.1)
+                headers.pop("Range")
+            return session.get(url, headers=headers, **kwargs)
+
+    output_file = str(tmp_path / "update.zip")
+    assert download_file(f"{base_url}/update.zip", output_file, http=FlakySession(),
+                         sha256=hashlib.sha256(data).hexdigest(), connections=4) == len(data)
+    with open(output_file, "rb") as f:
+        assert f.read() == data
+    session.close()
+
+
+def test_update_check_uses_interval_and_conditional_requests(range_server, tmp_path):
+    files, base_url, requested, _ = range_server
+    files["/update.json"] = json.dumps({"tag_name": "v1.1.0"}).encode()
+    cache_file = str(tmp_path / "update_check.json")
+    now = [1000.0]
+
+    def check(**kwargs):
+        return check_update_info(f"{base_url}/update.json", cache_file=cache_file,
+                                 interval=3600, clock=lambda: now[0], **kwargs)
+
+    assert check() == ({"tag_name": "v1.1.0"}, CHECK_FETCHED)
+    # Trong khoảng kiểm tra: không gửi request
+    now[0] += 1800
+    assert check() == ({"tag_name": "v1.1.0"}, CHECK_CACHED)
+    assert len(requested) == 1
+    # Kiểm tra thủ công: hỏi server, không đổi thì 304
+    assert check(force=True) == ({"tag_name": "v1.1.0"}, CHECK_NOT_MODIFIED)
+    assert requested[-1] == (None, 304)
+    # 304 cũng tính là một lần kiểm tra
+    now[0] += 1800
+    assert check()[1] == CHECK_CACHED
+    assert len(requested) == 2
+
+    now[0] += 3600
+    files["/update.json"] = json.dumps({"tag_name": "v1.2.0"}).encode()
+    assert check() == ({"tag_name": "v1.2.0"}, CHECK_FETCHED)
+    assert requested[-1] == (None, 200)
+
+    with pytest.raises(UpdateCheckError):
+        check_update_info(f"{base_url}/missing.json", cache_file=cache_file)
+
+
+def test_delta_update_downloads_only_changed_files(server, tmp_path):
+    root, base_url, requested = server
+    big = os.urandom(2 * 1024 * 1024)
+    v1 = {"DownloadVID.exe": b"exe v1", "_internal/ffmpeg.exe": big,
+          "_internal/lib dir/a.dll": b"a" * 1000}
+    v2 = dict(v1, **{"DownloadVID.exe": b"exe v2 (larger)", "_internal/new.pyd": b"new"})
+    _release(root, "1.0.0", v1)
+    _release(root, "1.1.0", v2)
+
+    app_dir = str(tmp_path / "app")
+    progress = []
+    result = install_delta(f"{base_url}/1.0.0/{MANIFEST_FILE}", app_dir)
+    assert sorted(result.installed) == sorted(v1)
+    _write(os.path.join(app_dir, "settings.json"), b"{}")  # File của người dùng
+
+    del requested[:]
+    result = install_delta(f"{base_url}/1.1.0/{MANIFEST_FILE}", app_dir,
+                           on_progress=lambda done, total: progress.append((done, total)))
+    assert sorted(result.installed) == ["DownloadVID.exe", "_internal/new.pyd"]
+    assert len(result.skipped) == 2
+    assert result.bytes_written == result.total_bytes == len(v2["DownloadVID.exe"]) + 3
+    assert progress[-1] == (result.total_bytes, result.total_bytes)
+    # Không tải lại ffmpeg
+    assert not any("ffmpeg" in path for path in requested)
+
+    for rel_path, data in v2.items():
+        with open(os.path.join(app_dir, *rel_path.split("/")), "rb") as f:
+            assert f.read() == data
+    assert os.path.exists(os.path.join(app_dir, "settings.json"))
+    manifest = requests.get(f"{base_url}/1.1.0/{MANIFEST_FILE}").json()
+    assert plan_delta(manifest, app_dir)[0] == []
+
+
+def test_delta_update_keeps_old_files_on_bad_download(server, tmp_path):
+    root, base_url, _ = server
+    _release(root, "1.0.0", {"a.txt": b"old a", "b.txt": b"old b"})
+    manifest = _release(root, "1.1.0", {"a.txt": b"new a", "b.txt": b"new b"})
+    app_dir = str(tmp_path / "app")
+    install_delta(f"{base_url}/1.0.0/{MANIFEST_FILE}", app_dir)
+
+    # File trên server bị hỏng sau khi tạo manifest
+    _write(os.path.join(root, "1.1.0", "files", "b.txt"), b"bad b")
+    with pytest.raises(ValueError):
+        install_delta(f"{base_url}/1.1.0/{MANIFEST_FILE}", app_dir, manifest=manifest)
+    with open(os.path.join(app_dir, "a.txt"), "rb") as f:
+        assert f.read() == b"old a"
+    assert sorted(os.listdir(app_dir)) == ["a.txt", "b.txt"]
+
+
+def test_install_zip_skips_unchanged_files(tmp_path):
+    app_dir = tmp_path / "app"
+    _write(str(app_dir / "same.txt"), b"same")
+    _write(str(app_dir / "old.txt"), b"old")
+    zip_file = str(tmp_path / "update_v1.1.0.zip")
+    with zipfile.ZipFile(zip_file, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("same.txt", b"same")
+        zf.writestr("old.txt", b"new content")
+        zf.writestr("sub/new.txt", b"new")
+
+    result = install_zip(zip_file, str(app_dir))
+    assert result.skipped == ["same.txt"]
+    assert sorted(result.installed) == ["old.txt", os.path.join("sub", "new.txt")]
+    assert (app_dir / "old.txt").read_bytes() == b"new content"
+    assert not [name for name in os.listdir(app_dir) if name.endswith(".update-tmp")]
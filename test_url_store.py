@@ -0,0 +1,42 @@
+import importlib
+
+import pytest
+
+from download_scheduler import DownloadJob
+from url_store import UrlStore
+
+
+def test_store_dedups_and_removes_by_normalized_url(tmp_path):
+    store = UrlStore(str(tmp_path / "url_queue.db"))
+    added, duplicates = store.add([
+        "# Link lỗi", "https://youtu.be/dQw4w9WgXcQ?si=x",
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ", "https://a.com/v?utm_source=x", ""])
+    assert (added, duplicates) == (2, 1)
+    assert store.page(1, 10) == ["https://a.com/v"]
+
+    assert store.remove(["https://a.com/v?fbclid=1"]) == 1
+    assert store.urls() == ["https://www.youtube.com/watch?v=dQw4w9WgXcQ"]
+    store.close()
+
+
+def test_finished_jobs_leave_the_store(tmp_path, monkeypatch):
+    pytest.importorskip("PySide6")
+    monkeypatch.chdir(tmp_path)  # App ghi DownloadVID.log vào thư mục hiện tại
+    App = importlib.import_module("App")
+    from download_engine import SUB_MODE_AUTO
+
+    store = UrlStore(str(tmp_path / "url_queue.db"))
+    urls = ["https://a.com/1", "https://a.com/2", "https://a.com/3"]
+    store.add(urls)
+    worker = App.DownloadWorker(urls, True, False, SUB_MODE_AUTO, "vi", False, False, False,
+                                url_store=store)
+
+    worker._on_job_finished(DownloadJob(1, urls[0]), True)
+    worker._on_job_finished(DownloadJob(2, urls[1]), False)  # Lỗi: đã ghi failed_links.txt
+    assert store.urls() == [urls[2]]
+
+    # Người dùng bấm Dừng: link chưa xong ở lại danh sách
+    worker.stop()
+    worker._on_job_finished(DownloadJob(3, urls[2]), False)
+    assert store.urls() == [urls[2]]
+    store.close()
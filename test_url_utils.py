@@ -0,0 +1,51 @@
+from url_utils import domain_key, normalize_url, unique_urls, video_key
+
+
+def test_normalize_url_strips_tracking_and_canonicalizes_youtube():
+    assert normalize_url(" https://youtu.be/dQw4w9WgXcQ?si=abc ") == \
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    assert normalize_url("HTTPS://Example.COM/a?utm_source=x&id=1#top") == \
+        "https://example.com/a?id=1"
+    assert normalize_url("ytsearch:cat video") == "ytsearch:cat video"
+
+
+def test_malformed_urls_pass_through_unchanged():
+    for url in ["https://a.com:abc/", "https://youtube.com:99999/watch?v=dQw4w9WgXcQ",
+                "http://[::1", "http://[::1/video", "https://[zz]/x"]:
+        assert normalize_url(f"  {url} ") == url
+        video_key(url)  # Không raise
+
+
+def test_unique_urls_skips_comments_and_keeps_bad_lines():
+    report = [
+        "# Link lỗi - 2024-01-15T10:00:00",
+        "# Lỗi mạng: ERROR: timed out",
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        "",
+        "https://youtu.be/dQw4w9WgXcQ",
+        "https://a.com:abc/",
+    ]
+    urls, duplicates = unique_urls(report)
+    assert urls == ["https://www.youtube.com/watch?v=dQw4w9WgXcQ", "https://a.com:abc/"]
+    assert duplicates == 1
+
+
+def test_domain_key_groups_sites_and_tolerates_bad_links():
+    assert domain_key("https://m.youtube.com/watch?v=x") == "youtube.com"
+    assert domain_key("https://youtu.be/x") == "youtube.com"
+    assert domain_key("https://vm.tiktok.com/abc") == "tiktok.com"
+    assert domain_key("https://news.bbc.co.uk/a") == "bbc.co.uk"
+    assert domain_key("ytsearch5:cats") == "youtube.com"
+    assert domain_key("http://127.0.0.1:8720/v.mp4") == "127.0.0.1:8720"
+    assert domain_key("http://[::1") == "invalid"
+    assert domain_key("http://127.0.0.1:abc/v.mp4") == "127.0.0.1"
+    assert domain_key("http://localhost:99999/v.mp4") == "localhost"
+
+
+def test_normalize_url_keeps_netloc_and_query_intact():
+    assert normalize_url("http://[::1]/video.mp4") == "http://[::1]/video.mp4"
+    assert normalize_url("http://[::1]:8080/x?utm_source=a") == "http://[::1]:8080/x"
+    assert normalize_url("https://user:pw@Example.com/a") == "https://user:pw@example.com/a"
+    assert normalize_url("https://a.com/s?q=a%20b&flag&utm_medium=x&b=+") == \
+        "https://a.com/s?q=a%20b&flag&b=+"
+    assert normalize_url("https://a.com/s?fbclid=1&si=2") == "https://a.com/s"
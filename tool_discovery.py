@@ -0,0 +1,131 @@
+"""
+Dò tìm ffmpeg và yt-dlp một lần, có cache trên đĩa.
+
+Việc chạy "ffmpeg -version" và "yt-dlp --version" tốn từ vài trăm ms tới
+vài giây, nên kết quả được lưu vào TOOL_CACHE_FILE theo đường dẫn, mtime và
+kích thước của file thực thi. Lần khởi động sau chỉ cần os.stat, chỉ chạy
+lại tiến trình khi file thực thi thay đổi. Module không phụ thuộc Qt, App.py
+gọi discover_tools() trên một QThread.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+
+TOOL_CACHE_FILE = "tool_cache.json"
+
+# Thứ tự tìm yt-dlp: trong thư mục hiện tại, rồi trong PATH
+YTDLP_CANDIDATES = ["yt-dlp.exe", "yt-dlp"]
+
+# Downloader ngoài tùy chọn để tải một file bằng nhiều kết nối
+ARIA2C_CANDIDATES = ["aria2c.exe", "aria2c"]
+
+
+def _resolve(path):
+    """Đường dẫn thật của file thực thi (tìm trong PATH nếu cần)"""
+    if os.path.isfile(path):
+        return os.path.abspath(path)
+    return shutil.which(path)
+
+
+def _fingerprint(resolved):
+    """Dấu vân tay của file thực thi dùng làm khóa cache"""
+    st = os.stat(resolved)
+    return {"path": resolved, "mtime": st.st_mtime_ns, "size": st.st_size}
+
+
+def _run_version(cmd):
+    """Chạy lệnh lấy phiên bản, trả về dòng đầu tiên của stdout"""
+    creation_flags = 0
+    if sys.platform == "win32":
+        creation_flags = subprocess.CREATE_NO_WINDOW
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=10,
+                            creationflags=creation_flags)
+    if result.returncode != 0:
+        return None
+    lines = result.stdout.strip().splitlines()
+    return lines[0] if lines else None
+
+
+def _load_cache(cache_file):
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache_file, cache):
+    try:
+        tmp_file = cache_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass
+
+
+def _probe(name, candidates, version_args, cache, log):
+    """Tìm công cụ đầu tiên chạy được trong candidates, dùng cache nếu có"""
+    for candidate in candidates:
+        resolved = _resolve(candidate)
+        if not resolved:
+            log(f"❌ Không tìm thấy {candidate}")
+            continue
+
+        fingerprint = _fingerprint(resolved)
+        cached = cache.get(name)
+        if cached and cached.get("fingerprint") == fingerprint and cached.get("version"):
+            return {"path": candidate, "version": cached["version"], "cached": True}
+
+        try:
+            version = _run_version([resolved] + version_args)
+        except subprocess.TimeoutExpired:
+            log(f"⏱️ Timeout khi kiểm tra {candidate}")
+            continue
+        except OSError as e:
+            log(f"⚠️ Lỗi khi kiểm tra {candidate}: {e}")
+            continue
+
+        if version:
+            cache[name] = {"fingerprint": fingerprint, "version": version}
+            return {"path": candidate, "version": version, "cached": False}
+
+    cache.pop(name, None)
+    return {"path": None, "version": None, "cached": False}
+
+
+def discover_tools(ffmpeg_path, ytdlp_candidates=None, cache_file=TOOL_CACHE_FILE,
+                   log=None):
+    """
+    Dò ffmpeg và yt-dlp, trả về dict:
+        {"ffmpeg": {"path", "version", "cached"},
+         "yt-dlp": {"path", "version", "cached"},
+         "aria2c": {"path", "version", "cached"},
+         "elapsed_ms": thời gian dò}
+    """
+    log = log or (lambda message: None)
+    start = time.perf_counter()
+
+    cache = _load_cache(cache_file)
+    old_cache = json.dumps(cache, sort_keys=True)
+
+    result = {
+        "ffmpeg": _probe("ffmpeg", [ffmpeg_path], ["-version"], cache, log),
+        "yt-dlp": _probe("yt-dlp", ytdlp_candidates or YTDLP_CANDIDATES,
+                         ["--version"], cache, log),
+        # aria2c là tùy chọn, không báo lỗi khi thiếu
+        "aria2c": _probe("aria2c", ARIA2C_CANDIDATES, ["--version"], cache,
+                         lambda message: None),
+    }
+
+    if json.dumps(cache, sort_keys=True) != old_cache:
+        _save_cache(cache_file, cache)
+
+    result["elapsed_ms"] = (time.perf_counter() - start) * 1000
+    return result
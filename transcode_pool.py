@@ -0,0 +1,197 @@
+"""
+Pool chạy ffmpeg song song để chuyển âm thanh đã tải sang MP3.
+
+Trước đây mỗi tiến trình yt-dlp tự gọi ffmpeg (--extract-audio) ngay sau
+khi tải, một link một lần, nên với playlist dài CPU phần lớn thời gian ngồi
+chờ mạng. Giờ yt-dlp chỉ tải luồng âm thanh gốc, còn việc chuyển đổi được
+đưa vào TranscodePool: số ffmpeg chạy cùng lúc bằng số nhân CPU, hàng đợi có
+giới hạn (submit() chờ khi đầy) để không dồn quá nhiều file tạm.
+
+Khi chọn giữ âm thanh gốc, file M4A/Opus... được giữ nguyên; chỉ file trong
+container không phải âm thanh (webm, mp4...) mới được tách luồng âm thanh
+bằng -c:a copy, không mã hóa lại (nếu copy lỗi mới chuyển MP3).
+"""
+
+import os
+import subprocess
+import sys
+import threading
+from collections import deque
+
+
+DEFAULT_TRANSCODE_WORKERS = os.cpu_count() or 2
+
+# Định dạng âm thanh giữ nguyên được khi không chuyển MP3
+AUDIO_EXTENSIONS = (".m4a", ".mp3", ".opus", ".ogg", ".aac", ".flac", ".wav")
+
+# Cách xử lý một file: mã hóa lại sang MP3 hoặc chỉ copy luồng âm thanh
+MODE_MP3 = "mp3"
+MODE_COPY = "copy"
+
+# -q:a của libmp3lame, giống --audio-quality mặc định của yt-dlp (VBR ~130 kbps)
+MP3_QUALITY = "5"
+
+
+def plan_audio(path, keep_original=False):
+    """
+    Các bước cần thử với file âm thanh vừa tải: danh sách (file đích, cách
+    xử lý), thử lần lượt tới khi thành công. [] nghĩa là giữ nguyên file.
+    """
+    base, ext = os.path.splitext(path)
+    ext = ext.lower()
+    if keep_original:
+        if ext in AUDIO_EXTENSIONS:
+            return []
+        # Luồng âm thanh của webm là Opus, của mp4 là AAC
+        copy_ext = ".opus" if ext == ".webm" else ".m4a"
+        return [(base + copy_ext, MODE_COPY), (base + ".mp3", MODE_MP3)]
+    if ext == ".mp3":
+        return []
+    return [(base + ".mp3", MODE_MP3)]
+
+
+def ffmpeg_command(ffmpeg_path, src, dst, mode):
+    """Lệnh ffmpeg chuyển src thành dst (chỉ lấy luồng âm thanh)"""
+    cmd = [ffmpeg_path, "-hide_banner", "-nostdin", "-loglevel", "error", "-y",
+           "-i", src, "-vn", "-map_metadata", "0"]
+    if mode == MODE_COPY:
+        cmd += ["-c:a", "copy"]
+    else:
+        cmd += ["-c:a", "libmp3lame", "-q:a", MP3_QUALITY]
+    return cmd + [dst]
+
+
+class TranscodeTask:
+    """Một file cần chuyển đổi, kết quả được ghi lại sau khi chạy"""
+
+    def __init__(self, src, steps, on_done=None):
+        self.src = src
+        self.steps = steps  # [(file đích, cách xử lý)] theo plan_audio
+        self.on_done = on_done  # on_done(task) gọi trên thread của pool
+        self.output = None  # File kết quả khi thành công
+        self.mode = None
+        self.error = None
+
+    @property
+    def success(self):
+        return self.output is not None
+
+
+class TranscodePool:
+    """Chạy tối đa `workers` tiến trình ffmpeg cùng lúc, hàng đợi có giới hạn"""
+
+    def __init__(self, ffmpeg_path, workers=DEFAULT_TRANSCODE_WORKERS, max_pending=None):
+        self.ffmpeg_path = ffmpeg_path
+        self.workers = max(1, int(workers or DEFAULT_TRANSCODE_WORKERS))
+        self.max_pending = max_pending or self.workers * 2
+        self.stop_flag = False
+        self._pending = deque()
+        self._processes = set()
+        self._closed = False
+        self._threads = []
+        self._cond = threading.Condition()
+
+    def start(self):
+        """Khởi động các thread chạy ffmpeg"""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, daemon=True,
+                                      name=f"transcode-{i + 1}")
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def submit(self, task):
+        """Thêm task, chờ nếu hàng đợi đã đầy. Trả về False nếu pool đã dừng"""
+        with self._cond:
+            while len(self._pending) >= self.max_pending and not self.stop_flag:
+                self._cond.wait()
+            if self.stop_flag:
+                return False
+            self._pending.append(task)
+            self._cond.notify_all()
+            return True
+
+    def close(self):
+        """Không nhận thêm task; các thread thoát khi chạy hết hàng đợi"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def stop(self):
+        """Bỏ các task đang chờ và dừng các ffmpeg đang chạy"""
+        with self._cond:
+            self.stop_flag = True
+            self._closed = True
+            self._pending.clear()
+            processes = list(self._processes)
+            self._cond.notify_all()
+        for process in processes:
+            if process.poll() is None:
+                try:
+                    process.terminate()
+                except OSError:
+                    pass
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                task = self._pending.popleft()
+                # Có chỗ trống trong hàng đợi cho submit() đang chờ
+                self._cond.notify_all()
+
+            try:
+                self._run(task)
+            except Exception as e:
+                task.error = str(e)
+            if task.on_done:
+                task.on_done(task)
+
+    def _run(self, task):
+        """Thử lần lượt các bước của task tới khi một bước thành công"""
+        for dst, mode in task.steps:
+            if self.stop_flag:
+                task.error = "Đã dừng"
+                return
+            base, ext = os.path.splitext(dst)
+            # Ghi ra file tạm, chỉ đổi tên khi ffmpeg chạy xong
+            tmp_file = f"{base}.tmp{ext}"
+            error = self._run_ffmpeg(ffmpeg_command(self.ffmpeg_path, task.src, tmp_file, mode))
+            if error is None:
+                os.replace(tmp_file, dst)
+                if os.path.abspath(dst) != os.path.abspath(task.src):
+                    os.remove(task.src)
+                task.output, task.mode, task.error = dst, mode, None
+                return
+            task.error = error
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
+
+    def _run_ffmpeg(self, cmd):
+        """Chạy ffmpeg, trả về None nếu thành công, ngược lại dòng lỗi cuối"""
+        creation_flags = 0
+        if sys.platform == "win32":
+            creation_flags = subprocess.CREATE_NO_WINDOW
+        process = subprocess.Popen(
+            cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            text=True, encoding='utf-8', errors='replace', creationflags=creation_flags)
+        with self._cond:
+            self._processes.add(process)
+        try:
+            _, stderr = process.communicate()
+        finally:
+            with self._cond:
+                self._processes.discard(process)
+        if process.returncode == 0:
+            return None
+        lines = stderr.strip().splitlines()
+        return lines[-1] if lines else f"ffmpeg lỗi {process.returncode}"
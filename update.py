@@ -1,10 +1,13 @@
-import requests
+import argparse
 import sys
 import time
-import zipfile
-import shutil
 import os
 
+from update_core import (
+    CHECK_CACHED, UPDATE_CHECK_INTERVAL, UPDATE_CONNECTIONS, check_update_info, download_file,
+    install_zip
+)
+
 VERSION_FILE = "version.bin"
 UPDATE_INFO_URL = "https://raw.githubusercontent.com/huynhtrancntt/DownloadVID/main/update_info.json"
 
@@ -34,83 +37,61 @@ def save_current_version(version):
         print(f"❌ Lỗi khi lưu version: {e}")
 
 
-def check_for_update():
+def check_for_update(force=False, interval=UPDATE_CHECK_INTERVAL):
+    """Chỉ hỏi server sau mỗi interval giây (force=True: luôn hỏi), 304 = không đổi"""
     current_version = get_current_version()
     try:
-        response = requests.get(UPDATE_INFO_URL, timeout=10)
-        data = response.json()
+        data, source = check_update_info(UPDATE_INFO_URL, interval=interval, force=force)
+        if source == CHECK_CACHED:
+            print("📦 Dùng kết quả kiểm tra gần nhất (--force để hỏi lại server)")
 
         latest_version = data.get("latest_version")
         download_url = data.get("download_url")
 
         if latest_version > current_version:
             print(f"🔔 Có phiên bản mới: {latest_version} (hiện tại: {current_version})")
-            return latest_version, download_url
+            return latest_version, download_url, data.get("sha256")
         else:
             print(f"✅ Bạn đang dùng phiên bản mới nhất: {current_version}")
-            return None, None
+            return None, None, None
 
     except Exception as e:
         print(f"❌ Lỗi khi kiểm tra phiên bản: {e}")
-        return None, None
-
-
-def download_with_progress(url, output_file):
-    response = requests.get(url, stream=True)
-    total_size = int(response.headers.get('content-length', 0))
-    total_mb = total_size / (1024 * 1024)
+        return None, None, None
 
-    downloaded = 0
-    chunk_size = 1024 * 1024  # 1MB
 
-    with open(output_file, 'wb') as f:
-        for chunk in response.iter_content(chunk_size=chunk_size):
-            if chunk:
-                f.write(chunk)
-                downloaded += len(chunk)
-                downloaded_mb = downloaded / (1024 * 1024)
-                percent = int((downloaded_mb / total_mb) * 100)
-                sys.stdout.write(f"\r⬇️ Tải xuống: {downloaded_mb:.1f}/{total_mb:.1f} MB ({percent}%)")
-                sys.stdout.flush()
+def download_with_progress(url, output_file, sha256=None):
+    """Tải file zip, tải tiếp file .part của lần trước (update_core.download_file)"""
+    def on_progress(done, total):
+        done_mb = done / (1024 * 1024)
+        if total:
+            percent = int(done * 100 / total)
+            sys.stdout.write(f"\r⬇️ Tải xuống: {done_mb:.1f}/{total / (1024 * 1024):.1f} MB ({percent}%)")
+        else:
+            sys.stdout.write(f"\r⬇️ Tải xuống: {done_mb:.1f} MB")
+        sys.stdout.flush()
 
+    download_file(url, output_file, sha256=sha256, on_progress=on_progress,
+                  connections=UPDATE_CONNECTIONS)
     print("\n✅ Tải hoàn tất.")
 
 
-def extract_and_install(zip_file, new_version, extract_to="temp_update"):
-    """Giải nén và cài đặt cập nhật vào thư mục gốc"""
+def extract_and_install(zip_file, new_version):
+    """Cài các file trong zip vào thư mục gốc (update_core.install_zip)"""
     try:
-        print(f"\n📦 Đang giải nén {zip_file}...")
-        
-        # Tạo thư mục tạm để giải nén
-        if os.path.exists(extract_to):
-            shutil.rmtree(extract_to)
-        os.makedirs(extract_to)
-        
-        # Giải nén file zip
-        with zipfile.ZipFile(zip_file, 'r') as zip_ref:
-            zip_ref.extractall(extract_to)
-        
-        print("✅ Giải nén hoàn tất.")
-        
-        # Copy tất cả file từ thư mục giải nén vào thư mục gốc
-        print("📋 Đang cập nhật file...")
-        current_dir = os.getcwd()
-        
-        for root, dirs, files in os.walk(extract_to):
-            for file in files:
-                src_file = os.path.join(root, file)
-                # Tính relative path từ thư mục giải nén
-                rel_path = os.path.relpath(src_file, extract_to)
-                dst_file = os.path.join(current_dir, rel_path)
-                
-                # Tạo thư mục đích nếu chưa tồn tại
-                dst_dir = os.path.dirname(dst_file)
-                if dst_dir and not os.path.exists(dst_dir):
-                    os.makedirs(dst_dir)
-                
-                # Copy file
-                shutil.copy2(src_file, dst_file)
-                print(f"   → {rel_path}")
+        print(f"\n📦 Đang cài đặt {zip_file}...")
+
+        def on_progress(done, total):
+            percent = int(done * 100 / total) if total else 100
+            sys.stdout.write(f"\r📋 Cập nhật file: {done / (1024 * 1024):.1f}/"
+                             f"{total / (1024 * 1024):.1f} MB ({percent}%)")
+            sys.stdout.flush()
+
+        result = install_zip(zip_file, os.getcwd(), on_progress=on_progress)
+        print()
+        for rel_path in result.installed:
+            print(f"   → {rel_path}")
+        print(result.describe())
         
         # Cập nhật version mới vào file .data
         save_current_version(new_version)
@@ -118,7 +99,6 @@ def extract_and_install(zip_file, new_version, extract_to="temp_update"):
         # Dọn dẹp file tạm
         print("🧹 Đang dọn dẹp...")
         os.remove(zip_file)
-        shutil.rmtree(extract_to)
         
         print(f"✅ Cập nhật hoàn tất! Phiên bản mới: {new_version}")
         print("🔄 Khởi động lại ứng dụng để áp dụng thay đổi.")
@@ -128,15 +108,24 @@ def extract_and_install(zip_file, new_version, extract_to="temp_update"):
         # Dọn dẹp trong trường hợp lỗi
         if os.path.exists(zip_file):
             os.remove(zip_file)
-        if os.path.exists(extract_to):
-            shutil.rmtree(extract_to)
 
 
 def main():
-    latest_version, download_url = check_for_update()
+    parser = argparse.ArgumentParser(description="Cập nhật DownloadVID")
+    parser.add_argument("--force", action="store_true",
+                        help="Kiểm tra phiên bản ngay, bỏ qua khoảng kiểm tra")
+    parser.add_argument("--interval", type=float, default=UPDATE_CHECK_INTERVAL / 3600,
+                        help="Khoảng giữa hai lần hỏi server (giờ)")
+    args = parser.parse_args()
+
+    latest_version, download_url, sha256 = check_for_update(args.force, args.interval * 3600)
     if latest_version and download_url:
         output_file = f"update_v{latest_version}.zip"
-        download_with_progress(download_url, output_file)
+        try:
+            download_with_progress(download_url, output_file, sha256)
+        except Exception as e:
+            print(f"\n❌ Lỗi khi tải: {e} (chạy lại để tải tiếp)")
+            return
         print(f"➡️ File cập nhật được lưu tại: {output_file}")
         
         # Giải nén và cài đặt cập nhật
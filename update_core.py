@@ -0,0 +1,753 @@
+"""
+Cài đặt bản cập nhật dùng chung cho App.py, UpdateDialog.py, update.py và
+update_ui.py.
+
+Trước đây file zip được giải nén hết vào thư mục tạm (temp_update,
+temp_extract) rồi os.walk + shutil.copy2 từng file vào thư mục ứng dụng:
+mỗi byte bị ghi hai lần và giao diện nhận một signal cho mỗi file.
+install_zip() đọc từng file trong zip và ghi thẳng vào file tạm nằm cạnh
+file đích rồi os.replace() vào chỗ, nên file đích luôn là bản cũ hoặc bản
+mới đầy đủ. File đã có cùng dung lượng và CRC32 với bản trong zip được bỏ
+qua. Tiến trình được báo theo byte.
+
+Bản phát hành có thể kèm manifest (MANIFEST_FILE, tạo bằng
+"python update_core.py <thư mục bản phát hành> <phiên bản>") liệt kê dung
+lượng và SHA-256 từng file. install_delta() so manifest với các file đã cài
+và chỉ tải những file khác (thường không gồm ffmpeg, yt-dlp...), thay vì tải
+lại cả file zip vài chục MB.
+
+Mọi request của trình cập nhật (kiểm tra phiên bản, manifest, tải file) đi
+qua một requests.Session dùng chung (get_session()) để giữ kết nối. File
+zip được tải bằng download_file(): ghi vào file PART_SUFFIX, tải tiếp bằng
+Range/If-Range sau khi dừng hoặc lỗi mạng, và chỉ đổi tên thành
+update_v*.zip sau khi khớp SHA-256 (nếu update.json có "sha256"), nên lúc
+khởi động không còn gặp file zip tải dở. Với connections > 1, file lớn được
+tải song song nhiều đoạn bằng Range trên đường truyền có độ trễ cao (đo bằng
+bench_update_download.py).
+
+Kiểm tra phiên bản (check_update_info()) không tải lại update.json mỗi lần
+khởi động: nội dung, ETag/Last-Modified và thời điểm kiểm tra được lưu vào
+UPDATE_CHECK_CACHE_FILE. Trong khoảng UPDATE_CHECK_INTERVAL thì dùng kết quả
+đã lưu mà không gửi request; hết khoảng đó thì gửi If-None-Match /
+If-Modified-Since, server trả 304 nghĩa là không đổi. Kiểm tra thủ công
+(force=True) luôn hỏi server. Module không phụ thuộc Qt.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+import zipfile
+from urllib.parse import quote, urljoin
+
+
+UPDATE_ZIP_PATTERN = "update_v*.zip"
+MANIFEST_FILE = "manifest.json"
+# Thư mục chứa các file của bản phát hành, tính từ vị trí manifest
+MANIFEST_FILES_DIR = "files/"
+
+CHUNK_SIZE = 1024 * 1024  # 1MB
+
+# Đuôi file tạm khi ghi, file cũ bị khóa (exe đang chạy) được đổi tên sang OLD_SUFFIX
+TMP_SUFFIX = ".update-tmp"
+OLD_SUFFIX = ".old"
+
+# File đang tải dở và file ghi ETag/Last-Modified của nó để tải tiếp
+PART_SUFFIX = ".part"
+PART_INFO_SUFFIX = ".part.json"
+
+# Tải file zip bằng nhiều kết nối: số kết nối mặc định của trình cập nhật,
+# file nhỏ hơn MIN_PARALLEL_SIZE thì tải một luồng, mỗi đoạn ít nhất MIN_SEGMENT_SIZE
+UPDATE_CONNECTIONS = 4
+MIN_PARALLEL_SIZE = 4 * 1024 * 1024
+MIN_SEGMENT_SIZE = 1024 * 1024
+SEGMENT_CHUNK_SIZE = 256 * 1024
+PARALLEL_REPORT_INTERVAL = 0.2
+
+# Kết quả kiểm tra phiên bản lần trước, theo URL
+UPDATE_CHECK_CACHE_FILE = "update_check.json"
+UPDATE_CHECK_INTERVAL = 6 * 3600  # giây
+
+# Nguồn dữ liệu của check_update_info()
+CHECK_CACHED = "cached"              # Trong khoảng kiểm tra, không gửi request
+CHECK_NOT_MODIFIED = "not_modified"  # Server trả 304
+CHECK_FETCHED = "fetched"            # Server trả nội dung mới
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """requests.Session dùng chung cho mọi request của trình cập nhật"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            _session = requests.Session()
+            _session.headers["User-Agent"] = "DownloadVID-Updater"
+        return _session
+
+
+class UpdateCheckError(Exception):
+    """Server trả mã HTTP khác 200/304 khi kiểm tra phiên bản"""
+
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}: Không thể kết nối đến server")
+        self.status_code = status_code
+
+
+def _load_check_cache(cache_file):
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_check_cache(cache_file, cache):
+    try:
+        tmp_file = cache_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass
+
+
+def check_update_info(url, cache_file=UPDATE_CHECK_CACHE_FILE, interval=UPDATE_CHECK_INTERVAL,
+                      force=False, http=None, timeout=10, clock=time.time):
+    """
+    JSON thông tin phiên bản tại url, trả về (data, nguồn) với nguồn là
+    CHECK_CACHED, CHECK_NOT_MODIFIED hoặc CHECK_FETCHED.
+
+    Lần kiểm tra trước (cùng url) chưa quá interval giây thì trả kết quả đã
+    lưu mà không gửi request, trừ khi force=True. Còn lại gửi request có
+    điều kiện theo ETag/Last-Modified đã lưu. Mã HTTP khác 200/304 thì raise
+    UpdateCheckError, lỗi mạng thì raise exception của requests.
+    """
+    cache = _load_check_cache(cache_file)
+    entry = cache.get(url)
+    if not isinstance(entry, dict) or "data" not in entry:
+        entry = None
+    now = clock()
+    if entry and not force and 0 <= now - entry.get("checked_at", 0) < interval:
+        return entry["data"], CHECK_CACHED
+
+    headers = {}
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = (http or get_session()).get(url, timeout=timeout, headers=headers)
+    if response.status_code == 304 and entry:
+        entry["checked_at"] = now
+        _save_check_cache(cache_file, cache)
+        return entry["data"], CHECK_NOT_MODIFIED
+    if response.status_code != 200:
+        raise UpdateCheckError(response.status_code)
+
+    data = response.json()
+    cache[url] = {
+        "etag": response.headers.get('etag'),
+        "last_modified": response.headers.get('last-modified'),
+        "checked_at": now,
+        "data": data,
+    }
+    _save_check_cache(cache_file, cache)
+    return data, CHECK_FETCHED
+
+
+class InstallStopped(Exception):
+    """Dừng cài đặt giữa chừng (should_stop() trả về True)"""
+
+
+class InstallResult:
+    """Kết quả cài đặt một file zip"""
+
+    def __init__(self, total_bytes=0):
+        self.installed = []  # Đường dẫn tương đối của các file đã ghi
+        self.skipped = []  # File đã trùng với bản trong zip
+        self.total_bytes = total_bytes  # Tổng dung lượng các file trong zip
+        self.bytes_written = 0
+
+    def describe(self):
+        """Một dòng tổng kết cho log"""
+        return (f"✅ Đã cập nhật {len(self.installed)} files "
+                f"({self.bytes_written / (1024 * 1024):.1f} MB), "
+                f"bỏ qua {len(self.skipped)} file không đổi")
+
+
+def file_crc32(path, chunk_size=CHUNK_SIZE):
+    """CRC32 của file (giống ZipInfo.CRC)"""
+    crc = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc & 0xFFFFFFFF
+
+
+def member_path(target_dir, name):
+    """
+    Đường dẫn đích của một file trong zip, ValueError nếu tên file thoát ra
+    ngoài target_dir (đường dẫn tuyệt đối, "..").
+    """
+    parts = [part for part in name.replace("\\", "/").split("/") if part not in ("", ".")]
+    if not parts or ".." in parts or ":" in parts[0]:
+        raise ValueError(f"Tên file không hợp lệ trong zip: {name!r}")
+    return os.path.join(target_dir, *parts)
+
+
+def is_unchanged(path, info):
+    """File đã cài trùng dung lượng và CRC32 với ZipInfo"""
+    try:
+        if os.path.getsize(path) != info.file_size:
+            return False
+        return file_crc32(path) == info.CRC
+    except OSError:
+        return False
+
+
+def _swap_in(tmp_file, path):
+    """
+    Thay file đích bằng file tạm. Windows không cho ghi đè exe/dll đang chạy
+    nhưng cho đổi tên: file cũ được đổi sang OLD_SUFFIX (xóa ở lần cài sau).
+    """
+    try:
+        os.replace(tmp_file, path)
+    except PermissionError:
+        old_file = path + OLD_SUFFIX
+        if os.path.exists(old_file):
+            os.remove(old_file)
+        os.replace(path, old_file)
+        os.replace(tmp_file, path)
+
+
+def remove_old_files(target_dir):
+    """Xóa các file OLD_SUFFIX còn lại của lần cài trước, trả về số file đã xóa"""
+    removed = 0
+    for root, _, files in os.walk(target_dir):
+        for name in files:
+            if name.endswith(OLD_SUFFIX):
+                try:
+                    os.remove(os.path.join(root, name))
+                    removed += 1
+                except OSError:
+                    pass  # Vẫn đang bị khóa
+    return removed
+
+
+def install_zip(zip_file, target_dir, on_progress=None, should_stop=None):
+    """
+    Cài các file trong zip_file vào target_dir, trả về InstallResult.
+
+    on_progress(done_bytes, total_bytes) được gọi sau mỗi CHUNK_SIZE byte
+    và sau mỗi file (kể cả file bỏ qua). should_stop() trả về True thì dừng
+    và raise InstallStopped; các file đã thay giữ bản mới, file đang ghi dở
+    giữ bản cũ. zipfile.BadZipFile nếu dữ liệu trong zip sai CRC.
+    """
+    with zipfile.ZipFile(zip_file, 'r') as zf:
+        members = [info for info in zf.infolist() if not info.is_dir()]
+        result = InstallResult(sum(info.file_size for info in members))
+        done = 0
+        for info in members:
+            if should_stop and should_stop():
+                raise InstallStopped()
+            path = member_path(target_dir, info.filename)
+            rel_path = os.path.relpath(path, target_dir)
+            if is_unchanged(path, info):
+                result.skipped.append(rel_path)
+                done += info.file_size
+                if on_progress:
+                    on_progress(done, result.total_bytes)
+                continue
+
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp_file = path + TMP_SUFFIX
+            try:
+                # ZipExtFile kiểm tra CRC khi đọc hết file
+                with zf.open(info) as src, open(tmp_file, 'wb') as dst:
+                    for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                        if should_stop and should_stop():
+                            raise InstallStopped()
+                        dst.write(chunk)
+                        done += len(chunk)
+                        result.bytes_written += len(chunk)
+                        if on_progress:
+                            on_progress(done, result.total_bytes)
+                _swap_in(tmp_file, path)
+            finally:
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+            result.installed.append(rel_path)
+        return result
+
+
+def file_sha256(path, chunk_size=CHUNK_SIZE):
+    """SHA-256 (hex) của file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_manifest(release_dir, version):
+    """
+    Manifest của thư mục bản phát hành:
+    {"version": ..., "files": {"đường/dẫn": {"size": ..., "sha256": ...}}}.
+    Đường dẫn dùng "/" và tương đối với release_dir, bỏ qua MANIFEST_FILE.
+    """
+    files = {}
+    for root, dirs, names in os.walk(release_dir):
+        dirs.sort()
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            rel_path = os.path.relpath(path, release_dir).replace(os.sep, "/")
+            if rel_path == MANIFEST_FILE:
+                continue
+            files[rel_path] = {"size": os.path.getsize(path), "sha256": file_sha256(path)}
+    return {"version": version, "files": files}
+
+
+def parse_manifest(data):
+    """Kiểm tra manifest (dict đã đọc từ JSON), ValueError nếu sai định dạng"""
+    files = data.get("files") if isinstance(data, dict) else None
+    if not isinstance(files, dict):
+        raise ValueError("Manifest không có danh sách files")
+    for rel_path, entry in files.items():
+        member_path(".", rel_path)
+        if (not isinstance(entry, dict) or not isinstance(entry.get("size"), int)
+                or not isinstance(entry.get("sha256"), str)):
+            raise ValueError(f"Manifest sai thông tin file: {rel_path!r}")
+    return data
+
+
+def plan_delta(manifest, target_dir):
+    """
+    Các file trong manifest cần tải: chưa có, khác dung lượng hoặc khác
+    SHA-256 so với file đã cài. Trả về ([(rel_path, entry)] cần tải, [rel_path] không đổi).
+    """
+    changed, unchanged = [], []
+    for rel_path, entry in manifest["files"].items():
+        path = member_path(target_dir, rel_path)
+        try:
+            same = (os.path.getsize(path) == entry["size"]
+                    and file_sha256(path) == entry["sha256"].lower())
+        except OSError:
+            same = False
+        if same:
+            unchanged.append(rel_path)
+        else:
+            changed.append((rel_path, entry))
+    return changed, unchanged
+
+
+def file_url(manifest_url, manifest, rel_path):
+    """URL tải một file của manifest (base_url trong manifest hoặc MANIFEST_FILES_DIR)"""
+    base_url = urljoin(manifest_url, manifest.get("base_url") or MANIFEST_FILES_DIR)
+    if not base_url.endswith("/"):
+        base_url += "/"
+    return urljoin(base_url, quote(rel_path))
+
+
+def fetch_manifest(manifest_url, http=None, timeout=30):
+    """Tải và kiểm tra manifest. http là requests.Session (mặc định get_session())"""
+    http = http or get_session()
+    response = http.get(manifest_url, timeout=timeout)
+    response.raise_for_status()
+    return parse_manifest(response.json())
+
+
+def install_delta(manifest_url, target_dir, http=None, on_progress=None,
+                  should_stop=None, manifest=None):
+    """
+    Cập nhật target_dir theo manifest ở manifest_url, chỉ tải các file đã
+    thay đổi. Trả về InstallResult (total_bytes là tổng dung lượng cần tải).
+
+    Các file được tải vào file tạm cạnh file đích và kiểm tra SHA-256; chỉ khi
+    tất cả đều đúng mới thay vào chỗ, nên lỗi mạng giữa chừng không để lại bản
+    cài nửa cũ nửa mới. ValueError nếu file tải về sai SHA-256,
+    InstallStopped nếu bị dừng.
+    """
+    http = http or get_session()
+    if manifest is None:
+        manifest = fetch_manifest(manifest_url, http)
+    changed, unchanged = plan_delta(manifest, target_dir)
+    result = InstallResult(sum(entry["size"] for _, entry in changed))
+    result.skipped = unchanged
+
+    staged = []  # [(file tạm, file đích, rel_path)]
+    try:
+        done = 0
+        for rel_path, entry in changed:
+            if should_stop and should_stop():
+                raise InstallStopped()
+            path = member_path(target_dir, rel_path)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp_file = path + TMP_SUFFIX
+            staged.append((tmp_file, path, rel_path))
+
+            digest = hashlib.sha256()
+            response = http.get(file_url(manifest_url, manifest, rel_path),
+                                stream=True, timeout=30)
+            try:
+                response.raise_for_status()
+                with open(tmp_file, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        if should_stop and should_stop():
+                            raise InstallStopped()
+                        if not chunk:
+                            continue
+                        f.write(chunk)
+                        digest.update(chunk)
+                        done += len(chunk)
+                        result.bytes_written += len(chunk)
+                        if on_progress:
+                            on_progress(done, result.total_bytes)
+            finally:
+                response.close()
+            if digest.hexdigest() != entry["sha256"].lower():
+                raise ValueError(f"File tải về sai SHA-256: {rel_path}")
+
+        for tmp_file, path, rel_path in staged:
+            _swap_in(tmp_file, path)
+            result.installed.append(rel_path)
+        return result
+    finally:
+        for tmp_file, _, _ in staged:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+
+def _read_part_info(info_file, url):
+    """Thông tin tải tiếp của file .part (dict) nếu cùng URL, None nếu không có"""
+    try:
+        with open(info_file, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return info if isinstance(info, dict) and info.get("url") == url else None
+
+
+def _write_part_info(info_file, info):
+    try:
+        with open(info_file, 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+    except OSError:
+        pass
+
+
+def _remove(*paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _strong_validator(headers):
+    """ETag (không phải weak) hoặc Last-Modified, dùng được cho If-Range"""
+    validator = headers.get('etag') or headers.get('last-modified')
+    if validator and not validator.startswith("W/"):
+        return validator
+    return None
+
+
+def _finish_part(part_file, info_file, output_file, sha256, actual_sha256):
+    """Kiểm tra SHA-256 rồi đổi file .part thành output_file"""
+    if sha256 and actual_sha256 != sha256.lower():
+        _remove(part_file, info_file)
+        raise ValueError("File tải về sai SHA-256, đã xóa để tải lại")
+    os.replace(part_file, output_file)
+    _remove(info_file)
+
+
+def download_file(url, output_file, sha256=None, http=None, on_progress=None,
+                  should_stop=None, timeout=30, connections=1):
+    """
+    Tải url về output_file, trả về số byte của file.
+
+    Dữ liệu được ghi vào output_file + PART_SUFFIX. Nếu file .part của lần
+    trước còn (cùng URL) thì gửi Range kèm If-Range (ETag hoặc Last-Modified):
+    server trả 206 thì ghi tiếp, trả 200 (file trên server đã đổi) thì tải
+    lại từ đầu. Tải xong mà sha256 không khớp thì xóa .part và raise
+    ValueError; khớp thì đổi tên thành output_file. should_stop() trả về
+    True thì raise InstallStopped và giữ .part để tải tiếp.
+    on_progress(done_bytes, total_bytes), total_bytes = 0 nếu server không báo.
+
+    connections > 1: nếu server hỗ trợ Range và file đủ lớn thì tải song
+    song nhiều đoạn (_download_parallel), không thì tải một luồng như trên.
+    """
+    http = http or get_session()
+    if connections > 1:
+        probe = _probe_ranges(http, url, timeout)
+        if probe and probe[1] >= MIN_PARALLEL_SIZE:
+            final_url, size, validator = probe
+            try:
+                return _download_parallel(http, url, final_url, output_file, size, validator,
+                                          connections, sha256, on_progress, should_stop,
+                                          timeout)
+            except _RangesUnsupported:
+                # Server báo hỗ trợ Range nhưng không trả 206: tải một luồng
+                _remove(output_file + PART_SUFFIX, output_file + PART_INFO_SUFFIX)
+    return _download_single(http, url, output_file, sha256, on_progress, should_stop, timeout)
+
+
+def _download_single(http, url, output_file, sha256, on_progress, should_stop, timeout):
+    """Tải một luồng, tải tiếp file .part của lần trước nếu được"""
+    part_file = output_file + PART_SUFFIX
+    info_file = output_file + PART_INFO_SUFFIX
+
+    offset = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+    info = _read_part_info(info_file, url) if offset else None
+    # File .part của lần tải song song có các đoạn chưa tải ở giữa, không nối tiếp được
+    validator = info.get("validator") if info and "segments" not in info else None
+    headers = {}
+    if offset and validator:
+        headers = {"Range": f"bytes={offset}-", "If-Range": validator}
+
+    response = http.get(url, stream=True, timeout=timeout, headers=headers)
+    try:
+        if response.status_code == 416:
+            # .part không còn khớp với file trên server
+            response.close()
+            _remove(part_file, info_file)
+            return _download_single(http, url, output_file, sha256, on_progress,
+                                    should_stop, timeout)
+        response.raise_for_status()
+
+        length = int(response.headers.get('content-length', 0) or 0)
+        if response.status_code == 206 and headers:
+            content_range = response.headers.get('content-range', '')
+            if not content_range.startswith(f"bytes {offset}-"):
+                raise ValueError(f"Server trả sai Content-Range: {content_range!r}")
+            total = int(content_range.rsplit("/", 1)[-1]) if "/*" not in content_range else 0
+            mode = 'ab'
+        else:
+            offset = 0
+            total = length
+            mode = 'wb'
+        new_validator = _strong_validator(response.headers)
+        if new_validator:
+            _write_part_info(info_file, {"url": url, "validator": new_validator})
+        else:
+            _remove(info_file)  # Không tải tiếp được nếu không có validator mạnh
+
+        digest = hashlib.sha256() if sha256 else None
+        if digest and offset:
+            with open(part_file, 'rb') as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+
+        done = offset
+        if on_progress:
+            on_progress(done, total)
+        with open(part_file, mode) as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if should_stop and should_stop():
+                    raise InstallStopped()
+                if not chunk:
+                    continue
+                f.write(chunk)
+                if digest:
+                    digest.update(chunk)
+                done += len(chunk)
+                if on_progress:
+                    on_progress(done, total)
+    finally:
+        response.close()
+
+    if total and done != total:
+        raise ValueError(f"Tải thiếu dữ liệu: {done}/{total} byte")
+    _finish_part(part_file, info_file, output_file, sha256,
+                 digest.hexdigest() if digest else None)
+    return done
+
+
+class _RangesUnsupported(Exception):
+    """Server không trả 206 cho request có Range"""
+
+
+def _probe_ranges(http, url, timeout):
+    """
+    HEAD để biết server có hỗ trợ Range không: (URL sau redirect, dung lượng,
+    validator) hoặc None nếu không tải song song được.
+    """
+    try:
+        response = http.head(url, allow_redirects=True, timeout=timeout)
+    except Exception:
+        return None
+    try:
+        size = int(response.headers.get('content-length', 0) or 0)
+    except ValueError:
+        size = 0
+    if (response.status_code != 200 or not size
+            or response.headers.get('accept-ranges', '').lower() != 'bytes'):
+        return None
+    return response.url, size, _strong_validator(response.headers)
+
+
+def _write_at(fd, data, offset):
+    """Ghi data vào vị trí offset (os.pwrite, Windows không có thì lseek + write)"""
+    view = memoryview(data)
+    while view:
+        if hasattr(os, "pwrite"):
+            written = os.pwrite(fd, view, offset)
+        else:
+            os.lseek(fd, offset, os.SEEK_SET)
+            written = os.write(fd, view)
+        view = view[written:]
+        offset += written
+
+
+def _split_segments(size, connections):
+    """Chia [0, size) thành các đoạn [start, end (gồm cả end), vị trí đã tải tới]"""
+    count = max(1, min(connections, size // MIN_SEGMENT_SIZE))
+    step = -(-size // count)
+    return [[start, min(start + step, size) - 1, start] for start in range(0, size, step)]
+
+
+def _fetch_segment(http, url, fd, segment, validator, lock, stop_event, timeout):
+    """Tải một đoạn vào file đã cấp phát sẵn, cập nhật segment[2] khi ghi"""
+    start, end, pos = segment
+    if pos > end:
+        return
+    headers = {"Range": f"bytes={pos}-{end}"}
+    if validator:
+        headers["If-Range"] = validator
+    response = http.get(url, stream=True, timeout=timeout, headers=headers)
+    try:
+        response.raise_for_status()
+        if (response.status_code != 206
+                or not response.headers.get('content-range', '').startswith(f"bytes {pos}-")):
+            raise _RangesUnsupported()
+        for chunk in response.iter_content(chunk_size=SEGMENT_CHUNK_SIZE):
+            if stop_event.is_set():
+                return
+            if not chunk:
+                continue
+            chunk = chunk[:end + 1 - pos]
+            _write_at(fd, chunk, pos)
+            pos += len(chunk)
+            with lock:
+                segment[2] = pos
+            if pos > end:
+                return
+    finally:
+        response.close()
+    if pos <= end:
+        raise ValueError(f"Tải thiếu dữ liệu đoạn {start}-{end}")
+
+
+def _download_parallel(http, url, final_url, output_file, size, validator, connections,
+                       sha256, on_progress, should_stop, timeout):
+    """
+    Tải song song nhiều đoạn vào file .part cấp phát sẵn dung lượng. Mỗi kết
+    nối có file descriptor riêng và ghi đúng vị trí của đoạn mình, nên không
+    cần khóa khi ghi. Vị trí đã tải của từng đoạn được lưu vào file
+    PART_INFO_SUFFIX để tải tiếp; tải xong mới kiểm tra cả file.
+    """
+    part_file = output_file + PART_SUFFIX
+    info_file = output_file + PART_INFO_SUFFIX
+
+    info = _read_part_info(info_file, url)
+    if (info and validator and info.get("validator") == validator
+            and info.get("size") == size and info.get("segments")
+            and os.path.exists(part_file) and os.path.getsize(part_file) == size):
+        segments = info["segments"]
+    else:
+        segments = _split_segments(size, connections)
+        with open(part_file, 'wb') as f:
+            f.truncate(size)
+
+    lock = threading.Lock()
+    stop_event = threading.Event()
+    errors = []
+
+    def save_info():
+        with lock:
+            state = [list(segment) for segment in segments]
+        if validator:
+            _write_part_info(info_file, {"url": url, "validator": validator,
+                                         "size": size, "segments": state})
+        else:
+            _remove(info_file)  # Không có validator thì không tải tiếp được
+
+    def done_bytes():
+        with lock:
+            return sum(segment[2] - segment[0] for segment in segments)
+
+    def worker(segment):
+        try:
+            fd = os.open(part_file, os.O_WRONLY | getattr(os, "O_BINARY", 0))
+            try:
+                _fetch_segment(http, final_url, fd, segment, validator, lock, stop_event,
+                               timeout)
+            finally:
+                os.close(fd)
+        except Exception as e:
+            errors.append(e)
+            stop_event.set()
+
+    threads = [threading.Thread(target=worker, args=(segment,), daemon=True,
+                                name=f"update-part-{i + 1}")
+               for i, segment in enumerate(segments)]
+    for thread in threads:
+        thread.start()
+    last_save = time.monotonic()
+    try:
+        while True:
+            alive = [thread for thread in threads if thread.is_alive()]
+            if not alive:
+                break
+            alive[0].join(PARALLEL_REPORT_INTERVAL)
+            if should_stop and should_stop():
+                stop_event.set()
+            if on_progress:
+                on_progress(done_bytes(), size)
+            if time.monotonic() - last_save >= 2.0:
+                save_info()
+                last_save = time.monotonic()
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+        save_info()
+
+    if errors:
+        # Một đoạn lỗi thì các đoạn khác dừng theo, nên lỗi đầu tiên có thể che
+        # mất việc server không trả 206 (cần tải lại một luồng)
+        unsupported = [e for e in errors if isinstance(e, _RangesUnsupported)]
+        raise (unsupported or errors)[0]
+    if should_stop and should_stop():
+        raise InstallStopped()
+    if done_bytes() != size:
+        raise ValueError(f"Tải thiếu dữ liệu: {done_bytes()}/{size} byte")
+    if on_progress:
+        on_progress(size, size)
+    _finish_part(part_file, info_file, output_file, sha256,
+                 file_sha256(part_file) if sha256 else None)
+    return size
+
+
+def main(argv=None):
+    """Tạo MANIFEST_FILE cho thư mục bản phát hành"""
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        print("Cách dùng: python update_core.py <thư mục bản phát hành> <phiên bản>")
+        return 2
+    release_dir, version = argv
+    manifest = build_manifest(release_dir, version)
+    path = os.path.join(release_dir, MANIFEST_FILE)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    total = sum(entry["size"] for entry in manifest["files"].values())
+    print(f"✅ {path}: {len(manifest['files'])} files, {total / (1024 * 1024):.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import threading
-import requests
-import zipfile
-import shutil
 import os
 import sys
 from datetime import datetime
 
+from update_core import UPDATE_CONNECTIONS, check_update_info, download_file, install_zip
+
 VERSION_FILE = "version.bin"
 UPDATE_INFO_URL = "https://raw.githubusercontent.com/huynhtrancntt/DownloadVID/main/update_info.json"
 
@@ -141,25 +140,25 @@ class UpdaterGUI:
         self.current_version_label.config(text=current_version)
         self.log(f"📱 Phiên bản hiện tại: {current_version}")
         
-        # Tự động kiểm tra update
+        # Tự động kiểm tra update (trong khoảng kiểm tra thì dùng kết quả đã lưu)
         threading.Thread(target=self.check_for_update, daemon=True).start()
     
     def check_for_update_thread(self):
-        """Chạy kiểm tra update trong thread riêng"""
-        threading.Thread(target=self.check_for_update, daemon=True).start()
+        """Chạy kiểm tra update trong thread riêng (nút bấm: luôn hỏi server)"""
+        threading.Thread(target=self.check_for_update, args=(True,), daemon=True).start()
     
-    def check_for_update(self):
+    def check_for_update(self, force=False):
         """Kiểm tra có phiên bản mới không"""
         self.log("🔍 Đang kiểm tra phiên bản mới...")
         self.check_button.config(state=tk.DISABLED)
         
         try:
             current_version = self.get_current_version()
-            response = requests.get(UPDATE_INFO_URL, timeout=10)
-            data = response.json()
+            data, _ = check_update_info(UPDATE_INFO_URL, force=force)
             
             latest_version = data.get("latest_version")
             self.download_url = data.get("download_url")
+            self.download_sha256 = data.get("sha256")
             
             self.latest_version_label.config(text=latest_version)
             
@@ -201,7 +200,8 @@ class UpdaterGUI:
             
             # Tải file
             self.log(f"⬇️ Đang tải {output_file}...")
-            self.download_with_progress(self.download_url, output_file)
+            self.download_with_progress(self.download_url, output_file,
+                                        getattr(self, 'download_sha256', None))
             
             # Giải nén và cài đặt
             self.extract_and_install(output_file, self.latest_version)
@@ -214,65 +214,35 @@ class UpdaterGUI:
             self.update_button.config(state=tk.NORMAL)
             self.check_button.config(state=tk.NORMAL)
     
-    def download_with_progress(self, url, output_file):
-        """Tải file với thanh tiến trình"""
-        response = requests.get(url, stream=True)
-        total_size = int(response.headers.get('content-length', 0))
-        total_mb = total_size / (1024 * 1024)
-        
-        downloaded = 0
-        chunk_size = 1024 * 1024  # 1MB
-        
+    def download_with_progress(self, url, output_file, sha256=None):
+        """Tải file với thanh tiến trình, tải tiếp file .part của lần trước"""
         self.progress_bar.config(maximum=100)
-        
-        with open(output_file, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=chunk_size):
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    downloaded_mb = downloaded / (1024 * 1024)
-                    percent = int((downloaded_mb / total_mb) * 100) if total_mb > 0 else 0
-                    
-                    self.progress_bar.config(value=percent)
-                    self.log_text.delete("end-2l", "end-1l")  # Xóa dòng cuối
-                    self.log(f"⬇️ Tải xuống: {downloaded_mb:.1f}/{total_mb:.1f} MB ({percent}%)")
-        
+        reported = [-1]
+
+        def on_progress(done, total):
+            percent = int(done * 100 / total) if total else 0
+            if percent == reported[0]:
+                return
+            reported[0] = percent
+            self.progress_bar.config(value=percent)
+            self.log_text.delete("end-2l", "end-1l")  # Xóa dòng cuối
+            self.log(f"⬇️ Tải xuống: {done / (1024 * 1024):.1f}/{total / (1024 * 1024):.1f} MB ({percent}%)")
+
+        download_file(url, output_file, sha256=sha256, on_progress=on_progress,
+                      connections=UPDATE_CONNECTIONS)
         self.log("✅ Tải hoàn tất!")
     
-    def extract_and_install(self, zip_file, new_version, extract_to="temp_update"):
-        """Giải nén và cài đặt cập nhật"""
+    def extract_and_install(self, zip_file, new_version):
+        """Cài các file trong zip vào thư mục ứng dụng (update_core.install_zip)"""
         try:
-            self.log(f"📦 Đang giải nén {zip_file}...")
-            self.progress_bar.config(value=0, maximum=0, mode='indeterminate')
-            self.progress_bar.start()
-            
-            # Tạo thư mục tạm
-            if os.path.exists(extract_to):
-                shutil.rmtree(extract_to)
-            os.makedirs(extract_to)
-            
-            # Giải nén
-            with zipfile.ZipFile(zip_file, 'r') as zip_ref:
-                zip_ref.extractall(extract_to)
-            
-            self.log("✅ Giải nén hoàn tất")
-            
-            # Copy files
-            self.log("📋 Đang cập nhật file...")
-            current_dir = os.getcwd()
-            
-            for root, dirs, files in os.walk(extract_to):
-                for file in files:
-                    src_file = os.path.join(root, file)
-                    rel_path = os.path.relpath(src_file, extract_to)
-                    dst_file = os.path.join(current_dir, rel_path)
-                    
-                    dst_dir = os.path.dirname(dst_file)
-                    if dst_dir and not os.path.exists(dst_dir):
-                        os.makedirs(dst_dir)
-                    
-                    shutil.copy2(src_file, dst_file)
-                    self.log(f"   → {rel_path}")
+            self.log(f"📦 Đang cài đặt {zip_file}...")
+            self.progress_bar.config(value=0, maximum=100, mode='determinate')
+
+            def on_progress(done, total):
+                self.progress_bar.config(value=int(done * 100 / total) if total else 100)
+
+            result = install_zip(zip_file, os.getcwd(), on_progress=on_progress)
+            self.log(result.describe())
             
             # Cập nhật version
             self.save_current_version(new_version)
@@ -281,10 +251,8 @@ class UpdaterGUI:
             # Dọn dẹp
             self.log("🧹 Đang dọn dẹp...")
             os.remove(zip_file)
-            shutil.rmtree(extract_to)
             
-            self.progress_bar.stop()
-            self.progress_bar.config(value=100, mode='determinate')
+            self.progress_bar.config(value=100)
             
             self.log(f"✅ Cập nhật hoàn tất! Phiên bản mới: {new_version}")
             self.status_label.config(text="Đã cập nhật", style='Success.TLabel')
@@ -297,13 +265,10 @@ class UpdaterGUI:
                                        f"Bạn có muốn đóng trình cập nhật không?")
             
         except Exception as e:
-            self.progress_bar.stop()
             self.log(f"❌ Lỗi khi cài đặt: {e}")
             # Dọn dẹp khi lỗi
             if os.path.exists(zip_file):
                 os.remove(zip_file)
-            if os.path.exists(extract_to):
-                shutil.rmtree(extract_to)
             raise
 
 def main():
@@ -0,0 +1,115 @@
+"""
+Danh sách link chờ tải lưu trong SQLite, dùng cho các lô rất lớn.
+
+Dán hàng chục nghìn link vào QTextEdit làm giao diện giật và mỗi lần lưu
+settings phải ghi lại cả khối text. UrlStore giữ danh sách trong file
+URL_STORE_DB: link được chuẩn hóa (url_utils.normalize_url) và bỏ trùng khi
+thêm, đếm số lượng bằng SQL và đọc từng trang để giao diện chỉ nạp phần
+đang hiển thị.
+"""
+
+import sqlite3
+import threading
+from datetime import datetime
+
+from url_utils import normalize_url
+
+
+URL_STORE_DB = "url_queue.db"
+
+# Số dòng insert mỗi lần khi nhập từ file
+IMPORT_BATCH_SIZE = 5000
+
+
+class UrlStore:
+    """Danh sách link (đã chuẩn hóa, không trùng), an toàn đa luồng"""
+
+    def __init__(self, db_path=URL_STORE_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL UNIQUE,
+                added_at TEXT
+            )
+        """)
+        self._conn.commit()
+
+    def add(self, urls):
+        """
+        Thêm các link (bỏ dòng trống và dòng #), trả về (số link mới, số
+        link trùng đã bỏ qua).
+        """
+        added = duplicates = 0
+        batch = []
+        for url in urls:
+            url = url.strip()
+            if not url or url.startswith("#"):
+                continue
+            batch.append(normalize_url(url))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                new = self._insert(batch)
+                added += new
+                duplicates += len(batch) - new
+                batch = []
+        if batch:
+            new = self._insert(batch)
+            added += new
+            duplicates += len(batch) - new
+        return added, duplicates
+
+    def import_file(self, path):
+        """Nhập link từ file text (mỗi dòng một link), đọc dần từng dòng"""
+        with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+            return self.add(f)
+
+    def count(self):
+        """Số link trong danh sách"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+
+    def page(self, offset, limit):
+        """Các link từ vị trí offset (theo thứ tự thêm vào), tối đa limit link"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url FROM urls ORDER BY id LIMIT ? OFFSET ?",
+                (limit, offset)).fetchall()
+        return [row[0] for row in rows]
+
+    def urls(self):
+        """Toàn bộ link theo thứ tự thêm vào"""
+        with self._lock:
+            rows = self._conn.execute("SELECT url FROM urls ORDER BY id").fetchall()
+        return [row[0] for row in rows]
+
+    def remove(self, urls):
+        """Gỡ các link khỏi danh sách, trả về số link đã gỡ"""
+        with self._lock:
+            cursor = self._conn.executemany(
+                "DELETE FROM urls WHERE url = ?",
+                [(normalize_url(url),) for url in urls])
+            self._conn.commit()
+            return cursor.rowcount
+
+    def clear(self):
+        """Xóa toàn bộ danh sách"""
+        with self._lock:
+            self._conn.execute("DELETE FROM urls")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _insert(self, batch):
+        """Insert một lô link, trả về số link mới thực sự được thêm"""
+        now = datetime.now().isoformat()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO urls (url, added_at) VALUES (?, ?)",
+                [(url, now) for url in batch])
+            self._conn.commit()
+            return self._conn.total_changes - before
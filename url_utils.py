@@ -0,0 +1,192 @@
+"""
+Tiện ích xử lý URL video (không phụ thuộc Qt, không cần mạng).
+"""
+
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qs, unquote_plus
+
+
+_YOUTUBE_HOSTS = ("youtube.com", "youtube-nocookie.com", "youtu.be")
+_YOUTUBE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+_YOUTUBE_PATH_PREFIXES = ("shorts", "embed", "live", "v")
+_TIKTOK_VIDEO_RE = re.compile(r"^/@[^/]+/video/(\d+)")
+
+# Tham số theo dõi/chia sẻ không ảnh hưởng tới video được tải
+_TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "igshid", "igsh", "mc_cid", "mc_eid",
+    "si", "feature", "pp", "ab_channel", "is_from_webapp", "sender_device",
+    "ref", "ref_src", "ref_url", "share_id", "_r", "_t",
+}
+_TRACKING_PREFIXES = ("utm_",)
+
+
+def _split(url):
+    """urlsplit, None nếu link sai cú pháp (vd. "http://[::1" thiếu "]")"""
+    try:
+        return urlsplit(url)
+    except ValueError:
+        return None
+
+
+def _port(parts):
+    """Port của link, None nếu không có hoặc sai (vd. ":abc", ":99999")"""
+    try:
+        return parts.port
+    except ValueError:
+        return None
+
+
+def _host(parts):
+    host = (parts.hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def _is_host(host, domain):
+    return host == domain or host.endswith("." + domain)
+
+
+def youtube_video_id(url):
+    """Lấy id video YouTube từ URL, None nếu không phải link một video"""
+    parts = _split(url.strip())
+    if parts is None:
+        return None
+    host = _host(parts)
+    if not any(_is_host(host, domain) for domain in _YOUTUBE_HOSTS):
+        return None
+
+    query = parse_qs(parts.query)
+    if "list" in query:
+        # Link kèm playlist: yt-dlp sẽ tải cả playlist
+        return None
+
+    segments = [seg for seg in parts.path.split("/") if seg]
+    video_id = None
+    if _is_host(host, "youtu.be"):
+        video_id = segments[0] if segments else None
+    elif segments[:1] == ["watch"]:
+        video_id = (query.get("v") or [None])[0]
+    elif len(segments) >= 2 and segments[0] in _YOUTUBE_PATH_PREFIXES:
+        video_id = segments[1]
+
+    if video_id and _YOUTUBE_ID_RE.match(video_id):
+        return video_id
+    return None
+
+
+def video_key(url):
+    """
+    Khóa (extractor, id) của một link video, giống cách yt-dlp ghi vào
+    --download-archive. Chỉ nhận diện được từ URL với một số trang phổ biến,
+    trả về None nếu cần gọi extractor mới biết.
+    """
+    video_id = youtube_video_id(url)
+    if video_id:
+        return "youtube", video_id
+
+    parts = _split(url.strip())
+    if parts is not None and _is_host(_host(parts), "tiktok.com"):
+        match = _TIKTOK_VIDEO_RE.match(parts.path)
+        if match:
+            return "tiktok", match.group(1)
+
+    return None
+
+
+# Tên miền khác nhau của cùng một trang (dùng chung giới hạn tải)
+_DOMAIN_ALIASES = {
+    "youtu.be": "youtube.com",
+    "youtube-nocookie.com": "youtube.com",
+    "fb.watch": "facebook.com",
+    "fb.com": "facebook.com",
+    "instagr.am": "instagram.com",
+}
+# Tên miền cấp hai phổ biến dưới mã quốc gia (vd. bbc.co.uk)
+_SECOND_LEVEL = {"co", "com", "net", "org", "gov", "edu", "ac"}
+_IP_RE = re.compile(r"^[\d.]+$|:")
+
+
+def domain_key(url):
+    """
+    Tên miền chính của link để gom các link cùng trang: "m.youtube.com",
+    "youtu.be" -> "youtube.com", "vm.tiktok.com" -> "tiktok.com". Dòng
+    "ytsearch:..." tính là youtube.com, địa chỉ IP giữ nguyên kèm port.
+    Link sai cú pháp tính là "invalid" (job vẫn chạy và lỗi riêng).
+    """
+    url = url.strip()
+    parts = _split(url)
+    if parts is None:
+        return "invalid"
+    if parts.scheme.lower() not in ("http", "https") or not parts.hostname:
+        return "youtube.com" if url.lower().startswith("ytsearch") else parts.scheme.lower()
+
+    host = parts.hostname.lower().rstrip(".")
+    if _IP_RE.search(host) or "." not in host:
+        port = _port(parts)
+        return f"{host}:{port}" if port else host
+    labels = host.split(".")
+    keep = 3 if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in _SECOND_LEVEL else 2
+    domain = ".".join(labels[-keep:])
+    return _DOMAIN_ALIASES.get(domain, domain)
+
+
+def _is_tracking_param(name):
+    name = name.lower()
+    return name in _TRACKING_PARAMS or name.startswith(_TRACKING_PREFIXES)
+
+
+def normalize_url(url):
+    """
+    Dạng chuẩn của một link để so trùng: video YouTube về
+    https://www.youtube.com/watch?v=<id>, các link khác được viết thường
+    scheme/host, bỏ #fragment và tham số theo dõi (utm_*, fbclid, si...).
+    Phần còn lại giữ nguyên: user:pass@, [IPv6], port và query (không mã
+    hóa lại) vì link chuẩn hóa là link được tải.
+    Dòng không phải link http(s) (vd. "ytsearch:...") hoặc sai cú pháp (port
+    không phải số, IPv6 thiếu "]") chỉ được cắt khoảng trắng, để yt-dlp báo
+    lỗi riêng cho link đó thay vì dừng cả danh sách.
+    """
+    url = url.strip()
+    parts = _split(url)
+    if parts is None or parts.scheme.lower() not in ("http", "https") or not parts.hostname:
+        return url
+    try:
+        port = parts.port
+    except ValueError:
+        return url
+
+    video_id = youtube_video_id(url)
+    if video_id:
+        return f"https://www.youtube.com/watch?v={video_id}"
+
+    query = "&".join(param for param in parts.query.split("&")
+                     if not _is_tracking_param(unquote_plus(param.partition("=")[0])))
+    userinfo, _, _ = parts.netloc.rpartition("@")
+    host = parts.hostname.lower()
+    if ":" in host:
+        host = f"[{host}]"  # IPv6
+    netloc = f"{userinfo}@{host}" if userinfo else host
+    if port is not None:
+        netloc = f"{netloc}:{port}"
+    return urlunsplit((parts.scheme.lower(), netloc, parts.path or "/", query, ""))
+
+
+def unique_urls(urls):
+    """
+    Chuẩn hóa và bỏ link trùng, giữ thứ tự xuất hiện đầu tiên. Bỏ dòng
+    trống và dòng "#" (chú thích, vd. nguyên nhân lỗi trong failed_links.txt).
+    Trả về (danh sách link đã chuẩn hóa, số link trùng đã bỏ).
+    """
+    seen = set()
+    result = []
+    count = 0
+    for url in urls:
+        url = url.strip()
+        if not url or url.startswith("#"):
+            continue
+        count += 1
+        url = normalize_url(url)
+        if url in seen:
+            continue
+        seen.add(url)
+        result.append(url)
+    return result, count - len(result)
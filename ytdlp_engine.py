@@ -0,0 +1,279 @@
+"""
+Engine tải bằng thư viện yt_dlp chạy ngay trong tiến trình của ứng dụng.
+
+Thay vì mở một tiến trình yt-dlp mới cho mỗi link (tốn thời gian khởi động
+interpreter, import extractor, dò ffmpeg...), engine giữ lại các instance
+YoutubeDL và dùng lại chúng cho các link tiếp theo. Tùy chọn được lấy từ
+chính lệnh mà DownloadWorker._build_command tạo ra, còn tiến trình được báo
+qua progress_hooks dưới dạng dict thay vì dòng text.
+
+Chỉ dùng API công khai của YoutubeDL: dòng --print (vd. [DLFILE]) được in
+bằng một PostProcessor gửi về callback thay vì ra stdout, còn link tải lỗi
+được nhận biết qua giá trị trả về của download() và lỗi ghi qua logger.
+YoutubeDL cộng dồn mã lỗi qua các lần tải, nên instance đã tải lỗi bị đóng
+chứ không dùng lại.
+"""
+
+import importlib.util
+import re
+import threading
+
+# yt_dlp là tùy chọn (khi thiếu sẽ dùng yt-dlp.exe) và import khá chậm,
+# nên chỉ import khi thực sự tạo engine
+yt_dlp = None
+DownloadCancelled = DownloadError = PostProcessor = None
+
+
+# Các tùy chọn thay đổi theo từng link, được áp lại lên instance dùng chung
+PER_URL_OPTIONS = ("outtmpl", "noplaylist", "concurrent_fragment_downloads", "ratelimit")
+
+# Tham số dòng lệnh (kèm giá trị) của các tùy chọn trên, bỏ khỏi khóa session
+_PER_URL_ARGS = ("-o", "--concurrent-fragments", "--limit-rate")
+
+# Tùy chọn của instance chỉ lấy metadata: playlist chỉ lấy danh sách mục
+EXTRACT_OPTIONS = {"skip_download": True, "extract_flat": "in_playlist"}
+_EXTRACT_KEY = ("--skip-download", "--flat-playlist")
+
+
+def is_available():
+    """Kiểm tra thư viện yt_dlp đã được cài đặt chưa (không import)"""
+    return yt_dlp is not None or importlib.util.find_spec("yt_dlp") is not None
+
+
+def _import_ytdlp():
+    """Import yt_dlp khi cần, trả về False nếu chưa cài"""
+    global yt_dlp, DownloadCancelled, DownloadError, PostProcessor
+    if yt_dlp is None:
+        try:
+            import yt_dlp as module
+            from yt_dlp.postprocessor import PostProcessor
+            from yt_dlp.utils import DownloadCancelled, DownloadError
+        except ImportError:
+            return False
+        yt_dlp = module
+    return True
+
+
+def ytdlp_module_version():
+    """Phiên bản của thư viện yt_dlp (None nếu chưa cài)"""
+    if not _import_ytdlp():
+        return None
+    return yt_dlp.version.__version__
+
+
+def _session_key(argv):
+    """Khóa nhận diện bộ tùy chọn chung, bỏ qua URL và phần thay đổi theo link"""
+    key = []
+    skip_next = False
+    for i, arg in enumerate(argv):
+        if skip_next:
+            skip_next = False
+            continue
+        if i == 0 or arg in ("--yes-playlist", "--no-playlist"):
+            # argv[0] là URL
+            continue
+        if arg in _PER_URL_ARGS:
+            skip_next = True
+            continue
+        key.append(arg)
+    return tuple(key)
+
+
+class _CallbackLogger:
+    """Logger cho YoutubeDL, chuyển mọi dòng log về callback của session"""
+
+    def __init__(self, session):
+        self.session = session
+
+    def debug(self, msg):
+        # yt-dlp gửi cả thông báo thường (to_screen) qua debug
+        if not msg.startswith("[debug] "):
+            self.session.emit_message(msg)
+
+    def info(self, msg):
+        self.session.emit_message(msg)
+
+    def warning(self, msg):
+        self.session.emit_message(f"WARNING: {msg}")
+
+    def error(self, msg):
+        self.session.errors += 1
+        self.session.emit_message(msg)
+
+
+def _print_template(template):
+    """
+    Template --print thành template đầy đủ: "title,id" -> "%(title)s" từng dòng
+    (như yt-dlp), template có "%(...)" giữ nguyên.
+    """
+    if re.fullmatch(r"[\w.:,]+", template):
+        return "\n".join(f"%({field})s" for field in template.split(","))
+    return template
+
+
+def _print_postprocessor(templates, emit):
+    """PostProcessor in các template --print qua emit thay vì ra stdout"""
+
+    class PrintPostProcessor(PostProcessor):
+        def run(self, info):
+            info_copy = dict(info)
+            info_copy.setdefault("filename", self._downloader.prepare_filename(info))
+            for template in templates:
+                emit(self._downloader.evaluate_outtmpl(_print_template(template), info_copy))
+            return [], info
+
+    return PrintPostProcessor()
+
+
+class _EngineSession:
+    """Một instance YoutubeDL cùng các callback của link đang tải"""
+
+    def __init__(self, key, ydl_opts):
+        self.key = key
+        self.on_message = None
+        self.on_progress = None
+        self.should_stop = None
+        self.rate_limit = None
+        self.errors = 0  # Số lỗi logger nhận được trong lần tải hiện tại
+
+        ydl_opts = dict(ydl_opts)
+        ydl_opts["logger"] = _CallbackLogger(self)
+        # Tiến trình đi qua progress_hooks, không in thanh tiến trình ra console
+        ydl_opts["noprogress"] = True
+        ydl_opts["progress_hooks"] = [self._progress_hook]
+        # --print ghi thẳng ra stdout, không qua logger: in bằng PostProcessor ở
+        # cùng thời điểm để dòng [DLFILE] về callback giống khi chạy yt-dlp.exe
+        forceprint = ydl_opts.pop("forceprint", None) or {}
+        self.ydl = yt_dlp.YoutubeDL(ydl_opts)
+        for when, templates in forceprint.items():
+            self.ydl.add_post_processor(
+                _print_postprocessor(list(templates), self.emit_message), when=when)
+
+    def emit_message(self, msg):
+        if self.on_message:
+            self.on_message(msg)
+
+    def _progress_hook(self, d):
+        if self.should_stop and self.should_stop():
+            raise DownloadCancelled("Người dùng đã dừng tải")
+        if self.rate_limit:
+            # Downloader đọc params["ratelimit"] ở mỗi đoạn dữ liệu, nên giới
+            # hạn được chia lại ngay khi có job bắt đầu/kết thúc
+            self.ydl.params["ratelimit"] = self.rate_limit()
+        if self.on_progress:
+            self.on_progress(d)
+
+    def download(self, url, ydl_opts, info_file=None):
+        """
+        Tải một link với instance hiện tại, trả về True nếu thành công
+        (download() trả về 0 và logger không nhận lỗi nào). Nếu có info_file (.info.json đã lấy trước) thì tải từ đó, không gọi
+        extractor; yt-dlp tự trích xuất lại khi URL format đã hết hạn.
+        """
+        for name in PER_URL_OPTIONS:
+            if name == "outtmpl":
+                self.ydl.params["outtmpl"].update(ydl_opts.get("outtmpl") or {})
+            else:
+                self.ydl.params[name] = ydl_opts.get(name)
+
+        self.errors = 0
+        try:
+            if info_file:
+                retcode = self.ydl.download_with_info_file(info_file)
+            else:
+                retcode = self.ydl.download([url])
+            return retcode == 0 and not self.errors
+        except DownloadCancelled:
+            self.emit_message("⏹ Đã hủy tải")
+            return False
+        except DownloadError:
+            # Lỗi đã được báo qua logger
+            return False
+
+    def close(self):
+        try:
+            self.ydl.close()
+        except Exception:
+            pass
+
+
+class YtDlpEngine:
+    """Quản lý và dùng lại các instance YoutubeDL cho nhiều link"""
+
+    def __init__(self, max_idle=4):
+        if not _import_ytdlp():
+            raise RuntimeError("Chưa cài đặt thư viện yt_dlp (pip install yt-dlp)")
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse_command(cmd):
+        """Chuyển lệnh yt-dlp (list) thành (url, ydl_opts) cho YoutubeDL"""
+        argv = list(cmd[1:])  # Bỏ đường dẫn yt-dlp
+        parsed = yt_dlp.parse_options(argv)
+        if len(parsed.urls) != 1:
+            raise ValueError(f"Lệnh phải có đúng 1 URL, nhận được {len(parsed.urls)}")
+        return parsed.urls[0], parsed.ydl_opts
+
+    def download(self, cmd, on_message=None, on_progress=None, should_stop=None,
+                 info_file=None, rate_limit=None):
+        """
+        Tải theo lệnh yt-dlp của _build_command.
+
+        on_message(str) nhận log, on_progress(dict) nhận dict của
+        progress_hooks, should_stop() trả về True để hủy tải. info_file là
+        file .info.json của link nếu đã lấy metadata trước. rate_limit() trả
+        về giới hạn tốc độ hiện tại (byte/giây, None = không giới hạn).
+        """
+        url, ydl_opts = self.parse_command(cmd)
+        session = self._acquire(_session_key(cmd[1:]), ydl_opts)
+        session.on_message = on_message
+        session.on_progress = on_progress
+        session.should_stop = should_stop
+        session.rate_limit = rate_limit
+        success = False
+        try:
+            success = session.download(url, ydl_opts, info_file)
+            return success
+        finally:
+            session.on_message = session.on_progress = session.should_stop = None
+            session.rate_limit = None
+            if success:
+                self._release(session)
+            else:
+                # Mã lỗi của YoutubeDL không reset được: link sau dùng instance mới
+                session.close()
+
+    def extract_info(self, url):
+        """Lấy info dict của link (không tải, playlist chỉ lấy danh sách mục)"""
+        session = self._acquire(_EXTRACT_KEY, EXTRACT_OPTIONS)
+        try:
+            info = session.ydl.extract_info(url, download=False)
+            # Chuyển về dạng JSON được, giống "yt-dlp -J"
+            return session.ydl.sanitize_info(info)
+        finally:
+            self._release(session)
+
+    def close(self):
+        """Đóng mọi instance đang giữ"""
+        with self._lock:
+            sessions, self._idle = self._idle, []
+        for session in sessions:
+            session.close()
+
+    def _acquire(self, key, ydl_opts):
+        """Lấy instance rảnh có cùng tùy chọn, hoặc tạo mới"""
+        with self._lock:
+            for i, session in enumerate(self._idle):
+                if session.key == key:
+                    return self._idle.pop(i)
+        return _EngineSession(key, ydl_opts)
+
+    def _release(self, session):
+        """Trả instance về để dùng lại cho link sau"""
+        with self._lock:
+            self._idle.append(session)
+            evicted = self._idle[:-self.max_idle] if len(self._idle) > self.max_idle else []
+            self._idle = self._idle[len(evicted):]
+        for old in evicted:
+            old.close()